@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import weakref
+from contextlib import suppress
+from typing import Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from redis import asyncio as aioredis
+from rq import Queue
+from rq.job import Job
+
+from .config import settings
+from .queue import DONE_CHANNEL, done_key, job_outcome, read_notice
+
+# redis.asyncio clients and tasks belong to the event loop that created them
+_LOOP_STATE: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+
+def _connect() -> aioredis.Redis:
+    return aioredis.from_url(settings.REDIS_URL)
+
+
+class _PipelineRecorder:
+    """Stands in for a Redis pipeline so RQ can lay out an enqueue without doing IO."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            # the replay pipeline is a transaction already
+            if name != "multi":
+                self.calls.append((name, args, kwargs))
+        return record
+
+
+class _LoopState:
+    def __init__(self, redis: aioredis.Redis):
+        self.redis = redis
+        # several waiters may share a job (single-flight followers)
+        self.waiters: Dict[str, List[asyncio.Future]] = {}
+        self.listener: Optional[asyncio.Task] = None
+        self.subscribed = asyncio.Event()
+
+    async def listen(self) -> None:
+        # one pub/sub connection wakes every pending evaluation in this process
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(DONE_CHANNEL)
+                    self.subscribed.set()
+                    async for msg in pubsub.listen():
+                        if msg["type"] != "message":
+                            continue
+                        for fut in self.waiters.get(msg["data"].decode(), ()):
+                            if not fut.done():
+                                fut.set_result(None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # waiters fall back to checking the done list when they time out
+                logging.warning(f"Done listener failed, reconnecting: {e}")
+                self.subscribed.clear()
+                await asyncio.sleep(0.5)
+
+
+def _state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _LOOP_STATE.get(loop)
+    if state is None:
+        state = _LOOP_STATE[loop] = _LoopState(_connect())
+    return state
+
+
+def get_async_redis() -> aioredis.Redis:
+    return _state().redis
+
+
+def _ensure_listener(state: _LoopState) -> None:
+    if state.listener is None or state.listener.done():
+        state.listener = asyncio.create_task(state.listen())
+
+
+async def enqueue_many_async(queue: Queue, func: str, args_list: List[tuple], **kwargs) -> List[Job]:
+    """queue.enqueue(func, *args, **kwargs) for each args, without blocking the event loop:
+    RQ builds the jobs and their writes, which then go out on one redis.asyncio transaction."""
+    jobs = [queue.create_job(func, args=args, **kwargs) for args in args_list]
+    if not queue.is_async:
+        # runs the jobs on the spot, on the queue's own connection
+        return [await run_in_threadpool(queue.enqueue_job, job) for job in jobs]
+    if queue.redis_server_version is None:
+        await run_in_threadpool(queue.get_redis_server_version)
+    recorder = _PipelineRecorder()
+    for job in jobs:
+        queue.enqueue_job(job, pipeline=recorder)
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        for name, a, kw in recorder.calls:
+            getattr(pipe, name)(*a, **kw)
+        await pipe.execute()
+    return jobs
+
+
+async def enqueue_async(queue: Queue, func: str, *args, **kwargs) -> Job:
+    return (await enqueue_many_async(queue, func, [args], **kwargs))[0]
+
+
+async def _pop_done(redis: aioredis.Redis, job_ids: List[str], out: Dict[str, dict], consume: bool) -> None:
+    if not job_ids:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            if consume:
+                pipe.lpop(done_key(job_id))
+            else:
+                pipe.lindex(done_key(job_id), 0)
+        for job_id, got in zip(job_ids, await pipe.execute()):
+            if got is not None:
+                out[job_id] = read_notice(got)
+
+
+async def wait_for_jobs_async(jobs: List[Job], timeout: float, consume: bool = True) -> List[Optional[dict]]:
+    """{"status": "finished", "result": ...} or {"status": "failed"} per job, None on timeout.
+
+    Waits on the done channel and pops the notices of all jobs woken together in one round trip.
+
+    consume=False leaves the notices for other waiters on the same job (single-flight).
+    """
+    state = _state()
+    _ensure_listener(state)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    futs = {job.id: loop.create_future() for job in jobs}
+    for job_id, fut in futs.items():
+        state.waiters.setdefault(job_id, []).append(fut)
+    out: Dict[str, dict] = {}
+    try:
+        # subscribed first, then a look at the lists: a notice pushed before that is not missed
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(state.subscribed.wait(), timeout)
+        await _pop_done(state.redis, list(futs), out, consume)
+        pending = {futs[job_id] for job_id in futs if job_id not in out}
+        while pending:
+            woken, pending = await asyncio.wait(
+                pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+            if not woken:
+                break
+            await _pop_done(state.redis, [job_id for job_id, fut in futs.items() if fut in woken], out, consume)
+        # last look for notices whose wakeup was missed
+        await _pop_done(state.redis, [job_id for job_id in futs if job_id not in out], out, consume)
+    finally:
+        for job_id, fut in futs.items():
+            waiters = state.waiters.get(job_id, [])
+            if fut in waiters:
+                waiters.remove(fut)
+            if not waiters:
+                state.waiters.pop(job_id, None)
+    missing = [job for job in jobs if job.id not in out]
+    if missing:
+        outcomes = await run_in_threadpool(lambda: [job_outcome(job) for job in missing])
+        out.update((job.id, o) for job, o in zip(missing, outcomes) if o is not None)
+    return [out.get(job.id) for job in jobs]
+
+
+async def wait_for_job_async(job: Job, timeout: float, consume: bool = True) -> Optional[dict]:
+    return (await wait_for_jobs_async([job], timeout, consume))[0]
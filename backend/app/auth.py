@@ -5,6 +5,7 @@ from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 from redis import Redis
 
+from .async_queue import get_async_redis
 from .config import settings
 
 REQUIRED_API_KEY = os.getenv("GUARDRAIL_API_KEY", "demo-key-change-in-production")
@@ -14,6 +15,9 @@ RATE_LIMIT_REQUESTS = int(
     os.getenv("RATE_LIMIT_REQUESTS", "100"))
 RATE_LIMIT_WINDOW_SEC = int(
     os.getenv("RATE_LIMIT_WINDOW_SEC", "60"))
+# /evaluate/batch counts as one request per this many items
+RATE_LIMIT_BATCH_ITEMS = int(
+    os.getenv("RATE_LIMIT_BATCH_ITEMS", "100"))
 
 
 def verify_api_key(api_key: str = None) -> None:
@@ -27,6 +31,20 @@ def verify_api_key(api_key: str = None) -> None:
         )
 
 
+def _limit_exceeded(retry_after: int, reset_epoch: int) -> JSONResponse:
+    headers = {
+        "Retry-After": str(retry_after),
+        "X-RateLimit-Limit": str(RATE_LIMIT_REQUESTS),
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": str(reset_epoch),
+    }
+    return JSONResponse(
+        {"detail": f"Rate limit exceeded: {RATE_LIMIT_REQUESTS} requests per {RATE_LIMIT_WINDOW_SEC}s"},
+        status_code=429,
+        headers=headers
+    )
+
+
 def rate_limit(identifier: str) -> Optional[JSONResponse]:
     if not identifier:
         return None
@@ -52,17 +70,7 @@ def rate_limit(identifier: str) -> Optional[JSONResponse]:
         retry_after = max(1, ttl if ttl > 0 else RATE_LIMIT_WINDOW_SEC)
 
         if count >= RATE_LIMIT_REQUESTS:
-            headers = {
-                "Retry-After": str(retry_after),
-                "X-RateLimit-Limit": str(RATE_LIMIT_REQUESTS),
-                "X-RateLimit-Remaining": "0",
-                "X-RateLimit-Reset": str(reset_epoch),
-            }
-            return JSONResponse(
-                {"detail": f"Rate limit exceeded: {RATE_LIMIT_REQUESTS} requests per {RATE_LIMIT_WINDOW_SEC}s"},
-                status_code=429,
-                headers=headers
-            )
+            return _limit_exceeded(retry_after, reset_epoch)
 
         redis.incr(key)
         return None
@@ -71,3 +79,41 @@ def rate_limit(identifier: str) -> Optional[JSONResponse]:
         import logging
         logging.warning(f"Rate limit check failed: {e}")
         return None
+
+
+async def rate_limit_async(identifier: str, cost: int = 1) -> Optional[JSONResponse]:
+    """rate_limit() on the event loop's redis.asyncio client; `cost` requests are counted at once."""
+    if not identifier:
+        return None
+
+    try:
+        redis = get_async_redis()
+        key = f"{RATE_LIMIT_REDIS_KEY_PREFIX}{identifier}"
+        ttl_key = f"{key}:ttl"
+
+        async with redis.pipeline(transaction=False) as pipe:
+            current, ttl, reset_time = await pipe.get(key).ttl(key).get(ttl_key).execute()
+
+        if current is None:
+            reset_epoch = int(time.time()) + RATE_LIMIT_WINDOW_SEC
+            if cost > RATE_LIMIT_REQUESTS:
+                return _limit_exceeded(RATE_LIMIT_WINDOW_SEC, reset_epoch)
+            async with redis.pipeline(transaction=False) as pipe:
+                await pipe.setex(key, RATE_LIMIT_WINDOW_SEC, str(cost)).setex(
+                    ttl_key, RATE_LIMIT_WINDOW_SEC, str(reset_epoch)).execute()
+            return None
+
+        count = int(current)
+        reset_epoch = int(reset_time) if reset_time else int(time.time()) + RATE_LIMIT_WINDOW_SEC
+        retry_after = max(1, ttl if ttl > 0 else RATE_LIMIT_WINDOW_SEC)
+
+        if count + cost > RATE_LIMIT_REQUESTS:
+            return _limit_exceeded(retry_after, reset_epoch)
+
+        await redis.incrby(key, cost)
+        return None
+
+    except Exception as e:
+        import logging
+        logging.warning(f"Rate limit check failed: {e}")
+        return None
@@ -0,0 +1,78 @@
+from bisect import bisect_right
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+
+class SuffixAutomaton:
+    """Suffix automaton over the passages' token ids, one separator between passages.
+
+    Separators are negative ids that never occur in a query, so matches never span two
+    passages. match() walks a query once, so it is linear in the query length.
+    """
+
+    def __init__(self, docs: Sequence[np.ndarray]):
+        nxt: List[Dict[int, int]] = [{}]
+        link = [-1]
+        length = [0]
+        end = [-1]          # end position (in the concatenation) of the first occurrence
+        last = 0
+        pos = 0
+        starts: List[int] = []
+
+        for d, ids in enumerate(docs):
+            starts.append(pos)
+            for c in list(map(int, ids)) + [-1 - d]:
+                cur = len(length)
+                nxt.append({})
+                length.append(length[last] + 1)
+                link.append(-1)
+                end.append(pos)
+                p = last
+                while p != -1 and c not in nxt[p]:
+                    nxt[p][c] = cur
+                    p = link[p]
+                if p == -1:
+                    link[cur] = 0
+                else:
+                    q = nxt[p][c]
+                    if length[p] + 1 == length[q]:
+                        link[cur] = q
+                    else:
+                        clone = len(length)
+                        nxt.append(dict(nxt[q]))
+                        length.append(length[p] + 1)
+                        link.append(link[q])
+                        end.append(end[q])
+                        while p != -1 and nxt[p].get(c) == q:
+                            nxt[p][c] = clone
+                            p = link[p]
+                        link[q] = clone
+                        link[cur] = clone
+                last = cur
+                pos += 1
+
+        self._next = nxt
+        self._link = link
+        self._len = length
+        self._end = end
+        self._starts = starts
+
+    def match(self, ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Matching statistics: for each query position i, the length of the longest
+        passage span ending at i, and the passage it first occurs in (-1 when length is 0).
+        """
+        nxt, link, length, end = self._next, self._link, self._len, self._end
+        lens = np.zeros(len(ids), dtype=np.int64)
+        docs = np.full(len(ids), -1, dtype=np.int64)
+        state, cur = 0, 0
+        for i, c in enumerate(map(int, ids)):
+            while state and c not in nxt[state]:
+                state = link[state]
+                cur = length[state]
+            if c in nxt[state]:
+                state = nxt[state][c]
+                cur += 1
+            if cur:
+                lens[i] = cur
+                docs[i] = bisect_right(self._starts, end[state]) - 1
+        return lens, docs
@@ -0,0 +1,124 @@
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class SparseBM25:
+    """BM25Okapi scoring over a precomputed sparse term-document weight matrix.
+
+    Mirrors rank_bm25.BM25Okapi (same idf floor and length normalization) but
+    folds idf and length normalization into W once, so a query is one W @ q.
+    """
+
+    def __init__(self, corpus: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75,
+                 epsilon: float = 0.25):
+        term_freqs = []
+        for doc in corpus:
+            freqs: Dict[str, int] = {}
+            for word in doc:
+                freqs[word] = freqs.get(word, 0) + 1
+            term_freqs.append((tuple(freqs), list(freqs.values())))
+        self._fit(term_freqs, k1, b, epsilon)
+
+    @classmethod
+    def from_term_freqs(cls, term_freqs: Sequence[Tuple[Sequence[str], Sequence[int]]],
+                        k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                        stats=None) -> "SparseBM25":
+        """Build from per-document (terms, counts), e.g. cached PassageAnalysis vectors.
+
+        stats (corpus.CorpusStats) swaps the per-request idf/avgdl for corpus-wide ones.
+        """
+        bm = cls.__new__(cls)
+        bm._fit(term_freqs, k1, b, epsilon, stats)
+        return bm
+
+    @classmethod
+    def from_matrix(cls, matrix: csr_matrix, vocab, idf: np.ndarray, doc_len: np.ndarray,
+                    avgdl: float, average_idf: float, k1: float = 1.5, b: float = 0.75,
+                    epsilon: float = 0.25) -> "SparseBM25":
+        """Wrap an already weighted matrix (e.g. memory-mapped from a corpus index)."""
+        bm = cls.__new__(cls)
+        bm.k1, bm.b, bm.epsilon = k1, b, epsilon
+        bm.vocab = vocab
+        bm.corpus_size = matrix.shape[0]
+        bm.matrix = matrix
+        bm.idf = idf
+        bm.doc_len = doc_len
+        bm.avgdl = avgdl
+        bm.average_idf = average_idf
+        return bm
+
+    def select(self, rows: Sequence[int]) -> "SparseBM25":
+        """Scorer over a subset of documents, keeping this corpus's idf and avgdl."""
+        rows = np.asarray(rows, dtype=np.int64)
+        return SparseBM25.from_matrix(
+            self.matrix[rows], self.vocab, self.idf, self.doc_len[rows], self.avgdl,
+            self.average_idf, self.k1, self.b, self.epsilon)
+
+    def _fit(self, term_freqs, k1: float, b: float, epsilon: float, stats=None) -> None:
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        tfs: List[float] = []
+        for d, (terms, counts) in enumerate(term_freqs):
+            for word in terms:
+                cols.append(vocab.setdefault(word, len(vocab)))
+            rows.extend([d] * len(terms))
+            tfs.extend(counts)
+
+        self.vocab = vocab
+        self.corpus_size = len(term_freqs)
+        n_terms = len(vocab)
+        rows_a = np.asarray(rows, dtype=np.int32)
+        cols_a = np.asarray(cols, dtype=np.int32)
+        tf_a = np.asarray(tfs, dtype=np.float64)
+
+        self.doc_len = np.bincount(rows_a, weights=tf_a, minlength=self.corpus_size)
+        if stats is None:
+            self.avgdl = self.doc_len.sum() / self.corpus_size
+            df = np.bincount(cols_a, minlength=n_terms).astype(np.float64)
+            idf = np.log(self.corpus_size - df + 0.5) - np.log(df + 0.5)
+            self.average_idf = float(idf.sum() / n_terms)
+        else:
+            self.avgdl = stats.avgdl
+            df = np.fromiter((stats.df.get(w, 1) for w in vocab), dtype=np.float64, count=n_terms)
+            idf = np.log(stats.n_docs - df + 0.5) - np.log(df + 0.5)
+            self.average_idf = stats.average_idf
+        idf[idf < 0] = self.epsilon * self.average_idf
+        self.idf = idf
+
+        norm = k1 * (1 - b + b * self.doc_len / self.avgdl)
+        weights = idf[cols_a] * (tf_a * (k1 + 1) / (tf_a + norm[rows_a]))
+        self.matrix = csr_matrix(
+            (weights, (rows_a, cols_a)), shape=(self.corpus_size, n_terms))
+
+    def query_vector(self, query: Sequence[str]) -> np.ndarray:
+        qv = np.zeros(len(self.vocab))
+        for word in query:
+            col = self.vocab.get(word)
+            if col is not None:
+                qv[col] += 1.0
+        return qv
+
+    def query_matrix(self, queries: Sequence[Sequence[str]]) -> csr_matrix:
+        rows: List[int] = []
+        cols: List[int] = []
+        for r, query in enumerate(queries):
+            for word in query:
+                col = self.vocab.get(word)
+                if col is not None:
+                    rows.append(r)
+                    cols.append(col)
+        return csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(len(queries), len(self.vocab)))
+
+    def get_scores(self, query: Sequence[str]) -> np.ndarray:
+        return self.matrix @ self.query_vector(query)
+
+    def get_score_matrix(self, queries: Sequence[Sequence[str]]) -> np.ndarray:
+        """Scores for many queries at once: (n_queries, n_docs)."""
+        return (self.query_matrix(queries) @ self.matrix.T).toarray()
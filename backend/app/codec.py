@@ -0,0 +1,39 @@
+import os
+from typing import Any
+
+import msgpack
+
+try:
+    import zstandard
+except ImportError:
+    # the "zstd" extra; without it frames are never compressed
+    zstandard = None
+
+# Job payloads, results and done notices between the API and the workers: a version
+# byte, a flags byte, then msgpack. Bodies past JOB_CODEC_COMPRESS_MIN_BYTES are
+# zstd-compressed when zstandard is installed.
+CODEC_VERSION = 1
+JOB_CODEC_COMPRESS_MIN_BYTES = int(os.getenv("JOB_CODEC_COMPRESS_MIN_BYTES", "16384"))
+JOB_CODEC_ZSTD_LEVEL = int(os.getenv("JOB_CODEC_ZSTD_LEVEL", "3"))
+
+_FLAG_ZSTD = 0x01
+
+
+def encode(obj: Any, compress: bool = True) -> bytes:
+    body = msgpack.packb(obj, use_bin_type=True)
+    flags = 0
+    if compress and zstandard is not None and len(body) >= JOB_CODEC_COMPRESS_MIN_BYTES:
+        body = zstandard.ZstdCompressor(level=JOB_CODEC_ZSTD_LEVEL).compress(body)
+        flags |= _FLAG_ZSTD
+    return bytes((CODEC_VERSION, flags)) + body
+
+
+def decode(blob: bytes) -> Any:
+    if len(blob) < 2 or blob[0] != CODEC_VERSION:
+        raise ValueError(f"Unsupported job encoding version: {blob[:1]!r}")
+    body = memoryview(blob)[2:]
+    if blob[1] & _FLAG_ZSTD:
+        if zstandard is None:
+            raise ValueError("Job frame is zstd-compressed but zstandard is not installed")
+        body = zstandard.ZstdDecompressor().decompress(body)
+    return msgpack.unpackb(body, raw=False)
@@ -10,6 +10,7 @@ class Settings:
     COVERAGE_MIN = float(os.getenv("COVERAGE_MIN", "0.70"))
     TOXICITY_MAX = float(os.getenv("TOXICITY_MAX", "0.05"))
     EVAL_TIMEOUT_SEC = int(os.getenv("EVAL_TIMEOUT_SEC", "5"))
+    EVAL_BATCH_TIMEOUT_SEC = int(os.getenv("EVAL_BATCH_TIMEOUT_SEC", "60"))
 
 
 settings = Settings()
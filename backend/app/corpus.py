@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from redis import Redis
+
+from .corpus_index import (CORPUS_INDEX_DIR, CorpusIndex, index_path, open_corpus_index,
+                           remove_corpus_index, write_corpus_index)
+from .text_utils import tokens
+
+CORPUS_KEY_PREFIX = "guardrail:corpus:"
+CORPUS_CACHE_SIZE = int(os.getenv("CORPUS_CACHE_SIZE", "4"))
+
+logger = logging.getLogger(__name__)
+
+
+class CorpusNotFound(LookupError):
+    pass
+
+
+@dataclass(frozen=True, eq=False)
+class CorpusStats:
+    """Corpus-wide BM25 statistics; SparseBM25 can score against these instead of per-request ones."""
+    n_docs: int
+    avgdl: float
+    average_idf: float
+    df: Dict[str, int]
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CorpusStats":
+        return cls(
+            n_docs=int(data["n_docs"]),
+            avgdl=float(data["avgdl"]),
+            average_idf=float(data["average_idf"]),
+            df=data["df"],
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "n_docs": self.n_docs,
+            "avgdl": self.avgdl,
+            "average_idf": self.average_idf,
+            "df": self.df,
+        }
+
+
+def build_corpus_stats(passages: List[Dict]) -> CorpusStats:
+    df: Dict[str, int] = {}
+    total_len = 0
+    for p in passages:
+        toks = tokens(p.get("text", ""))
+        total_len += len(toks)
+        for t in dict.fromkeys(toks):
+            df[t] = df.get(t, 0) + 1
+    n_docs = len(passages)
+    if df:
+        dfs = np.fromiter(df.values(), dtype=np.float64, count=len(df))
+        average_idf = float((np.log(n_docs - dfs + 0.5) - np.log(dfs + 0.5)).sum() / len(df))
+    else:
+        average_idf = 0.0
+    return CorpusStats(
+        n_docs=n_docs,
+        avgdl=total_len / n_docs if n_docs else 0.0,
+        average_idf=average_idf,
+        df=df,
+    )
+
+
+@dataclass(frozen=True, eq=False)
+class LoadedCorpus:
+    """A corpus loaded from Redis (passages + stats) or opened from its mmapped index."""
+    corpus_id: str
+    passages: Dict[str, Dict]
+    stats: Optional[CorpusStats]
+    index: Optional[CorpusIndex] = None
+
+    def rows(self, passage_ids: List[str]) -> List[int]:
+        known = self.index.rows if self.index is not None else self.passages
+        missing = [pid for pid in passage_ids if pid not in known]
+        if missing:
+            raise CorpusNotFound(f"Unknown passage ids in corpus {self.corpus_id}: {missing[:5]}")
+        if self.index is None:
+            return []
+        return [known[pid] for pid in passage_ids]
+
+    def pick(self, passage_ids: List[str]) -> List[Dict]:
+        rows = self.rows(passage_ids)
+        if self.index is not None:
+            return [self.index.passage(r) for r in rows]
+        return [self.passages[pid] for pid in passage_ids]
+
+
+class CorpusStore:
+    """Registered corpora in Redis. Corpora are immutable: re-upload to change one."""
+
+    def __init__(self, redis: Redis, index_dir: str = CORPUS_INDEX_DIR):
+        self.redis = redis
+        self.index_dir = index_dir
+
+    @staticmethod
+    def key(corpus_id: str, part: str) -> str:
+        return f"{CORPUS_KEY_PREFIX}{corpus_id}:{part}"
+
+    def create(self, passages: List[Dict], name: Optional[str] = None) -> Dict:
+        corpus_id = uuid.uuid4().hex
+        stats = build_corpus_stats(passages)
+        meta = {
+            "corpus_id": corpus_id,
+            "name": name or "",
+            "passage_count": len(passages),
+            "size_bytes": sum(len(p.get("text", "").encode("utf-8")) for p in passages),
+            "created_at": datetime.utcnow().isoformat() + "Z",
+        }
+        if self.index_dir:
+            # before meta, so no worker sees the corpus without its index
+            try:
+                write_corpus_index(index_path(corpus_id, self.index_dir), passages)
+            except OSError as e:
+                logger.warning(f"Corpus index write failed for {corpus_id}, workers will load from Redis: {e}")
+        pipe = self.redis.pipeline()
+        pipe.hset(self.key(corpus_id, "passages"),
+                  mapping={p["id"]: json.dumps(p) for p in passages})
+        pipe.sadd(self.key(corpus_id, "ids"), *[p["id"] for p in passages])
+        pipe.set(self.key(corpus_id, "stats"), json.dumps(stats.to_dict()))
+        # meta last: its presence marks the corpus as complete
+        pipe.hset(self.key(corpus_id, "meta"), mapping=meta)
+        pipe.execute()
+        return meta
+
+    def get_meta(self, corpus_id: str) -> Optional[Dict]:
+        raw = self.redis.hgetall(self.key(corpus_id, "meta"))
+        if not raw:
+            return None
+        meta = {k.decode(): v.decode() for k, v in raw.items()}
+        meta["passage_count"] = int(meta["passage_count"])
+        meta["size_bytes"] = int(meta["size_bytes"])
+        return meta
+
+    def missing_ids(self, corpus_id: str, passage_ids: List[str]) -> Optional[List[str]]:
+        """Ids not in the corpus, or None when the corpus itself is unknown."""
+        pipe = self.redis.pipeline()
+        pipe.exists(self.key(corpus_id, "meta"))
+        pipe.smismember(self.key(corpus_id, "ids"), passage_ids)
+        exists, found = pipe.execute()
+        if not exists:
+            return None
+        return [pid for pid, ok in zip(passage_ids, found) if not ok]
+
+    def delete(self, corpus_id: str) -> bool:
+        if self.index_dir:
+            remove_corpus_index(corpus_id, self.index_dir)
+        return bool(self.redis.delete(*[self.key(corpus_id, part)
+                                        for part in ("meta", "passages", "ids", "stats")]))
+
+    def load(self, corpus_id: str) -> LoadedCorpus:
+        pipe = self.redis.pipeline()
+        pipe.exists(self.key(corpus_id, "meta"))
+        pipe.hgetall(self.key(corpus_id, "passages"))
+        pipe.get(self.key(corpus_id, "stats"))
+        exists, raw_passages, raw_stats = pipe.execute()
+        if not exists or raw_stats is None:
+            raise CorpusNotFound(f"Unknown corpus: {corpus_id}")
+        return LoadedCorpus(
+            corpus_id=corpus_id,
+            passages={k.decode(): json.loads(v) for k, v in raw_passages.items()},
+            stats=CorpusStats.from_dict(json.loads(raw_stats)),
+        )
+
+
+_loaded: "OrderedDict[str, LoadedCorpus]" = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def get_corpus(corpus_id: str, store: CorpusStore) -> LoadedCorpus:
+    """Process-local LRU over the mmapped index (or CorpusStore.load without one).
+
+    Safe because corpora never change.
+    """
+    with _loaded_lock:
+        hit = _loaded.get(corpus_id)
+        if hit is not None:
+            _loaded.move_to_end(corpus_id)
+            return hit
+    index = open_corpus_index(corpus_id, store.index_dir)
+    if index is not None:
+        corpus = LoadedCorpus(corpus_id=corpus_id, passages={}, stats=None, index=index)
+    else:
+        corpus = store.load(corpus_id)
+    with _loaded_lock:
+        _loaded[corpus_id] = corpus
+        while len(_loaded) > CORPUS_CACHE_SIZE:
+            _loaded.popitem(last=False)
+    return corpus
@@ -0,0 +1,182 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .bm25 import SparseBM25
+from .text_utils import normalize
+
+# Shared directory (e.g. a docker volume) holding one sub-directory per corpus;
+# unset disables the on-disk format and workers fall back to CorpusStore.load.
+CORPUS_INDEX_DIR = os.getenv("CORPUS_INDEX_DIR", "")
+FORMAT_VERSION = 1
+
+# array name -> dtype; every array is a plain .npy so it can be opened with mmap_mode="r"
+_ARRAYS = {
+    "vocab": None,                  # sorted fixed-width bytes (S<n>), column order of bm25
+    "doc_len": np.float64,
+    "idf": np.float64,
+    "bm25_data": np.float64,        # CSR rows of the corpus-idf BM25 weight matrix
+    "bm25_indices": np.int32,
+    "bm25_indptr": np.int64,
+    "text_blob": np.uint8,          # utf-8 passage texts back to back
+    "text_offsets": np.int64,
+}
+
+
+class SortedVocab:
+    """Read-only term -> column lookup over a sorted bytes array (no dict to rebuild)."""
+
+    def __init__(self, terms: np.ndarray):
+        self.terms = terms
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def get(self, word: str, default=None):
+        key = word.encode("utf-8")
+        if not self.terms.size or len(key) > self.terms.dtype.itemsize:
+            return default
+        i = int(np.searchsorted(self.terms, key))
+        if i < len(self.terms) and self.terms[i] == key:
+            return i
+        return default
+
+    def __contains__(self, word: str) -> bool:
+        return self.get(word) is not None
+
+
+def index_path(corpus_id: str, root: str = None) -> str:
+    return os.path.join(root or CORPUS_INDEX_DIR, corpus_id)
+
+
+def write_corpus_index(path: str, passages: List[Dict], k1: float = 1.5, b: float = 0.75,
+                       epsilon: float = 0.25) -> None:
+    """Write passages and their precomputed BM25 arrays under path.
+
+    Written to a temp dir and renamed into place, so readers never see a partial index.
+    """
+    docs = [normalize(p.get("text", "")).split() for p in passages]
+    terms = sorted({t for toks in docs for t in toks})
+    col = {t: i for i, t in enumerate(terms)}
+    vocab = np.array([t.encode("utf-8") for t in terms], dtype=bytes) if terms else np.array([], dtype="S1")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # an all-empty corpus has no terms; its stats are zeroed in meta below
+        bm25 = SparseBM25(docs, k1=k1, b=b, epsilon=epsilon)
+    # remap the engine's first-appearance columns onto the sorted vocab
+    perm = np.empty(len(bm25.vocab), dtype=np.int32)
+    for t, c in bm25.vocab.items():
+        perm[c] = col[t]
+    W = bm25.matrix.tocoo()
+    W = csr_matrix((W.data, (W.row, perm[W.col])), shape=(len(docs), len(terms)))
+    W.sort_indices()
+    idf = np.zeros(len(terms))
+    idf[perm] = bm25.idf
+
+    blobs, text_offsets = [], [0]
+    for p in passages:
+        raw = p.get("text", "").encode("utf-8")
+        blobs.append(raw)
+        text_offsets.append(text_offsets[-1] + len(raw))
+
+    arrays = {
+        "vocab": vocab,
+        "doc_len": bm25.doc_len,
+        "idf": idf,
+        "bm25_data": W.data,
+        "bm25_indices": W.indices,
+        "bm25_indptr": W.indptr,
+        "text_blob": np.frombuffer(b"".join(blobs), dtype=np.uint8),
+        "text_offsets": np.asarray(text_offsets),
+    }
+    meta = {
+        "format": FORMAT_VERSION,
+        "n_docs": len(passages),
+        "k1": k1, "b": b, "epsilon": epsilon,
+        "avgdl": float(bm25.avgdl) if docs else 0.0,
+        "average_idf": float(bm25.average_idf) if terms else 0.0,
+        "ids": [p["id"] for p in passages],
+        "sources": [p.get("source") for p in passages],
+    }
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        for name, dtype in _ARRAYS.items():
+            arr = arrays[name]
+            np.save(os.path.join(tmp, f"{name}.npy"), arr if dtype is None else arr.astype(dtype, copy=False))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+class CorpusIndex:
+    """A corpus index opened with mmap: arrays are read-only views onto the page cache."""
+
+    def __init__(self, path: str, meta: Dict, arrays: Dict[str, np.ndarray]):
+        self.path = path
+        self.meta = meta
+        self.arrays = arrays
+        self.ids: List[str] = meta["ids"]
+        self.rows: Dict[str, int] = {pid: i for i, pid in enumerate(self.ids)}
+        self.vocab = SortedVocab(arrays["vocab"])
+        self._bm25: Optional[SparseBM25] = None
+
+    @classmethod
+    def open(cls, path: str) -> "CorpusIndex":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus index format {meta.get('format')} at {path}")
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                  for name in _ARRAYS}
+        return cls(path, meta, arrays)
+
+    def __len__(self) -> int:
+        return self.meta["n_docs"]
+
+    def doc_text(self, row: int) -> str:
+        off = self.arrays["text_offsets"]
+        return bytes(self.arrays["text_blob"][off[row]:off[row + 1]]).decode("utf-8")
+
+    def passage(self, row: int) -> Dict:
+        return {"id": self.ids[row], "text": self.doc_text(row), "source": self.meta["sources"][row]}
+
+    @property
+    def bm25(self) -> SparseBM25:
+        """Corpus-idf BM25 over every document; the CSR arrays stay memory-mapped."""
+        if self._bm25 is None:
+            a = self.arrays
+            matrix = csr_matrix((a["bm25_data"], a["bm25_indices"], a["bm25_indptr"]),
+                                shape=(len(self), len(self.vocab)), copy=False)
+            self._bm25 = SparseBM25.from_matrix(
+                matrix, self.vocab, a["idf"], a["doc_len"], avgdl=self.meta["avgdl"],
+                average_idf=self.meta["average_idf"], k1=self.meta["k1"], b=self.meta["b"],
+                epsilon=self.meta["epsilon"])
+        return self._bm25
+
+    def bm25_for(self, rows: Sequence[int]) -> SparseBM25:
+        return self.bm25.select(rows)
+
+
+def open_corpus_index(corpus_id: str, root: str = None) -> Optional[CorpusIndex]:
+    """The mmapped index for corpus_id, or None when the on-disk format is off or absent."""
+    if not (root or CORPUS_INDEX_DIR):
+        return None
+    path = index_path(corpus_id, root)
+    if not os.path.isfile(os.path.join(path, "meta.json")):
+        return None
+    return CorpusIndex.open(path)
+
+
+def remove_corpus_index(corpus_id: str, root: str = None) -> None:
+    if root or CORPUS_INDEX_DIR:
+        shutil.rmtree(index_path(corpus_id, root), ignore_errors=True)
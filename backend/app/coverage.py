@@ -1,13 +1,49 @@
-from typing import List, Dict, Tuple
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 import re
+import numpy as np
+from .index import PassageIndex, build_index
+from .metrics import COVERAGE_SUBQUESTIONS
 from .text_utils import normalize, tokens
-from .retrieval import fused_rank
+from .retrieval import fused_rank, fused_rank_many
+
+# the prefilter counts overlaps per passage only below this many passages per top_k
+_PREFILTER_COUNT_MAX_K = 2
 
 _SPLIT = re.compile(
     r"[;,.?]| and | or | & | versus | vs | with | without ", re.I)
 
 
+@dataclass(frozen=True)
+class SubQuestion:
+    text: str
+    covered: bool
+    top_ids: Optional[List[int]] = None   # fused top-k, None when the prefilter decided it
+
+
+@dataclass(frozen=True)
+class CoveragePlan:
+    """Everything coverage_score worked out, so repair can reuse it."""
+    question: str
+    subquestions: List[SubQuestion]
+    score: float
+    top_k: int = 3
+    missing: List[str] = field(default_factory=list)
+
+    def ranked_ids(self, depth: int) -> Dict[str, List[int]]:
+        """Fused top ids coverage ranked at least `depth` deep, by sub-question text."""
+        if self.top_k < depth:
+            return {}
+        return {sq.text: sq.top_ids for sq in self.subquestions if sq.top_ids is not None}
+
+
 def decompose(question: str) -> List[str]:
+    return list(_decompose(question))
+
+
+@lru_cache(maxsize=1024)
+def _decompose(question: str) -> Tuple[str, ...]:
     q = normalize(question)
     parts = [p.strip() for p in _SPLIT.split(q)]
     parts = [p for p in parts if len(p.split()) >= 2]
@@ -17,40 +53,100 @@ def decompose(question: str) -> List[str]:
         if p not in seen:
             seen.add(p)
             uniq.append(p)
-    return uniq or [q]
+    return tuple(uniq or [q])
 
 
-def subq_supported(subq: str, passages: List[Dict], min_overlap_tokens: int = 1) -> Tuple[bool, int]:
+def subq_supported(subq: str, passages: List[Dict], min_overlap_tokens: int = 1,
+                   index: PassageIndex = None) -> Tuple[bool, int]:
     if not passages:
         return False, 0
-    top_ids = fused_rank(subq, passages, top_k=3)
+    if index is None:
+        index = build_index(passages)
+    if not any(t in index.terms() for t in tokens(subq)):
+        # nothing to rank toward: every passage overlaps 0 tokens
+        return False, 0
+    top_ids = fused_rank(subq, passages, top_k=3, index=index)
+    return _ranked_support(subq, top_ids, index, min_overlap_tokens)
+
+
+def _prefilter(subq: str, index: PassageIndex, min_overlap_tokens: int = 1,
+               top_k: int = 3) -> Optional[bool]:
+    """The _ranked_support verdict when it doesn't depend on the ranking, else None.
+
+    The top_k ranked passages hold a passage with >= min_overlap_tokens shared tokens
+    for sure if fewer than top_k passages lack one, and for sure not if none has one.
+    """
+    present = [t for t in set(tokens(subq)) if t in index.terms()]
+    if len(present) < min_overlap_tokens:
+        return False
+    if min_overlap_tokens == 1 and len(index) <= top_k:
+        # every passage is in the top_k and one of them holds a token
+        return True
+    if len(index) >= _PREFILTER_COUNT_MAX_K * top_k:
+        # a sure yes needs nearly every passage to share a token; counting costs more
+        # than it saves here (eval/coverage_prefilter_bench.py)
+        return None
+    lists = index.posting_lists(present)
+    if min_overlap_tokens == 1 and sum(len(p) for p in lists) <= len(index) - top_k:
+        return None
+    counts = np.bincount(np.concatenate(lists), minlength=len(index))
+    hits = int(np.count_nonzero(counts >= min_overlap_tokens))
+    if hits == 0:
+        return False
+    if len(index) - hits < top_k:
+        return True
+    return None
+
+
+def _ranked_support(subq: str, top_ids: List[int], index: PassageIndex,
+                    min_overlap_tokens: int = 1) -> Tuple[bool, int]:
     subq_toks = set(tokens(subq))
     best_overlap = 0
     for idx in top_ids:
-        if idx >= len(passages):
+        if idx >= len(index):
             continue
-        pas = passages[idx].get("text", "")
-        tok = set(tokens(pas))
-        overlap = len(subq_toks & tok)
+        overlap = len(subq_toks & index.tok_sets[idx])
         best_overlap = max(best_overlap, overlap)
         if overlap >= min_overlap_tokens:
             return True, overlap
     return False, best_overlap
 
 
-def coverage_score(question: str, passages: List[Dict]) -> Tuple[float, List[str]]:
+def coverage_plan(question: str, passages: List[Dict], index: PassageIndex = None,
+                  top_k: int = 3) -> CoveragePlan:
     subs = decompose(question)
     if not subs:
-        return 1.0, []
-
-    covered = 0
-    missing: List[str] = []
-    for s in subs:
-        ok, _ = subq_supported(s, passages)
-        if ok:
-            covered += 1
-        else:
-            missing.append(s)
-
-    score = round(covered / max(1, len(subs)), 4)
-    return score, missing
+        return CoveragePlan(question=question, subquestions=[], score=1.0, top_k=top_k)
+    if index is None:
+        index = build_index(passages)
+
+    verdicts = [_prefilter(s, index, top_k=top_k) for s in subs]
+    ambiguous = [s for s, v in zip(subs, verdicts) if v is None]
+    COVERAGE_SUBQUESTIONS.labels(decided="prefilter").inc(len(subs) - len(ambiguous))
+    ranked = {}
+    if ambiguous:
+        COVERAGE_SUBQUESTIONS.labels(decided="ranked").inc(len(ambiguous))
+        ranked = dict(zip(ambiguous, fused_rank_many(ambiguous, index, top_k=top_k)))
+
+    plan: List[SubQuestion] = []
+    for s, v in zip(subs, verdicts):
+        ids = ranked.get(s)
+        plan.append(SubQuestion(
+            text=s,
+            covered=v if v is not None else _ranked_support(s, ids, index)[0],
+            top_ids=ids,
+        ))
+
+    covered = sum(sq.covered for sq in plan)
+    return CoveragePlan(
+        question=question,
+        subquestions=plan,
+        score=round(covered / max(1, len(subs)), 4),
+        top_k=top_k,
+        missing=[sq.text for sq in plan if not sq.covered],
+    )
+
+
+def coverage_score(question: str, passages: List[Dict], index: PassageIndex = None) -> Tuple[float, List[str]]:
+    plan = coverage_plan(question, passages, index)
+    return plan.score, list(plan.missing)
@@ -0,0 +1,108 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Tuple, Union
+import numpy as np
+
+# "sentence-transformers" (PyTorch, float32) or "onnx" (ONNX Runtime, optionally int8-quantized)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers").lower()
+# directory holding model.onnx (or model_quantized.onnx) and tokenizer.json, e.g. from
+# `optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 <dir>`
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "")
+# how cached passage vectors are held: float32 | float16 | int8
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float16").lower()
+EMBEDDING_MAX_SEQ_LEN = 256
+
+
+class EmbeddingBackend(ABC):
+    """Maps texts to (n, dim) float32 sentence embeddings."""
+    name = "base"
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        ...
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """MiniLM-style encoder on ONNX Runtime: tokenize, run, mean-pool over the attention mask."""
+    name = "onnx"
+
+    def __init__(self, model_dir: str, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, "model.onnx")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(EMBEDDING_MAX_SEQ_LEN)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer.encode_batch(list(texts))
+        ids = np.array([e.ids for e in enc], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]
+        m = mask[..., None].astype(np.float32)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+
+def load_backend(name: str, model_name: str) -> EmbeddingBackend:
+    if name == "onnx":
+        if not EMBEDDING_ONNX_PATH:
+            raise ValueError("EMBEDDING_BACKEND=onnx requires EMBEDDING_ONNX_PATH")
+        return OnnxBackend(EMBEDDING_ONNX_PATH)
+    return SentenceTransformerBackend(model_name)
+
+
+def quantize_onnx(model_dir: str) -> str:
+    """Write model_quantized.onnx (dynamic int8 weights) next to model.onnx."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    dst = os.path.join(model_dir, "model_quantized.onnx")
+    quantize_dynamic(os.path.join(model_dir, "model.onnx"), dst, weight_type=QuantType.QInt8)
+    return dst
+
+
+StoredVector = Union[np.ndarray, Tuple[np.ndarray, np.float32]]
+
+
+def pack_vector(vec: np.ndarray, dtype: str = EMBEDDING_STORE_DTYPE) -> StoredVector:
+    """Compact form of a unit vector: float16, or int8 with a per-vector scale."""
+    if dtype == "int8":
+        scale = np.float32(np.abs(vec).max() / 127.0) or np.float32(1.0)
+        return np.round(vec / scale).astype(np.int8), scale
+    if dtype == "float16":
+        return vec.astype(np.float16)
+    return vec.astype(np.float32)
+
+
+def unpack_vector(stored: StoredVector) -> np.ndarray:
+    if isinstance(stored, tuple):
+        q, scale = stored
+        return q.astype(np.float32) * scale
+    return stored.astype(np.float32)
+
+
+def stored_nbytes(stored: StoredVector) -> int:
+    if isinstance(stored, tuple):
+        return stored[0].nbytes + 4
+    return stored.nbytes
@@ -0,0 +1,206 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+
+from .embedding_backends import (EMBEDDING_BACKEND, EMBEDDING_STORE_DTYPE, EmbeddingBackend, StoredVector,
+                                 load_backend, pack_vector, unpack_vector)
+from .metrics import EMBEDDING_CACHE_LOOKUPS, EMBEDDING_CACHE_EVICTIONS, EMBEDDING_CACHE_ENTRIES, EMBEDDING_MODEL_LOAD_SECONDS
+from .passage_cache import text_key
+
+USE_SEMANTIC_FAITHFULNESS = os.getenv("USE_SEMANTIC_FAITHFULNESS", "false").lower() == "true"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# 384-dim vectors stored as float16 (EMBEDDING_STORE_DTYPE): 20000 entries is ~15 MiB
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+# "local" encodes in the worker process; "redis" sends encodes to the batching
+# sidecar (worker/embedder.py) so texts from concurrent jobs share one model call
+EMBEDDER_MODE = os.getenv("EMBEDDER_MODE", "local").lower()
+EMBED_TIMEOUT_SEC = float(os.getenv("EMBED_TIMEOUT_SEC", "2"))
+EMBED_REQUEST_KEY = "guardrail:embed:requests"
+EMBED_REPLY_TTL_SEC = 30
+
+logger = logging.getLogger(__name__)
+
+Encoder = Callable[[List[str]], np.ndarray]
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingCache:
+    """Bounded LRU of unit-length passage embeddings keyed by a hash of the text.
+
+    Vectors are held in store_dtype (float32, float16 or int8 + scale) and widened on read.
+    """
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, store_dtype: str = EMBEDDING_STORE_DTYPE):
+        self.max_entries = max_entries
+        self.store_dtype = store_dtype
+        self._entries: "OrderedDict[bytes, StoredVector]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, texts: Sequence[str], encode: Encoder, prefix: Sequence[str] = ()) -> np.ndarray:
+        """(len(prefix) + len(texts), dim) embeddings; only cache misses are passed to encode.
+
+        prefix texts (e.g. the answer) are never cached but ride along in the same encode call.
+        """
+        keys = [text_key(t) for t in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                stored = self._entries.get(key)
+                if stored is not None:
+                    self._entries.move_to_end(key)
+                    found[i] = unpack_vector(stored)
+
+        misses = {}
+        for i, vec in enumerate(found):
+            if vec is None:
+                misses.setdefault(keys[i], []).append(i)
+        EMBEDDING_CACHE_LOOKUPS.labels(result="hit").inc(len(texts) - sum(map(len, misses.values())))
+        head: List[np.ndarray] = []
+        if misses or prefix:
+            EMBEDDING_CACHE_LOOKUPS.labels(result="miss").inc(sum(map(len, misses.values())))
+            slots = list(misses.values())
+            encoded = _unit_rows(encode(list(prefix) + [texts[idx[0]] for idx in slots]))
+            head = list(encoded[:len(prefix)])
+            for key, idx, vec in zip(misses, slots, encoded[len(prefix):]):
+                stored = pack_vector(vec, self.store_dtype)
+                # serve what later hits will see, so scores don't depend on cache state
+                vec = unpack_vector(stored)
+                for i in idx:
+                    found[i] = vec
+                self._put(key, stored)
+        rows = head + found
+        return np.stack(rows) if rows else np.empty((0, 0), dtype=np.float32)
+
+    def _put(self, key: bytes, vec: StoredVector) -> None:
+        if self.max_entries <= 0:
+            return
+        evicted = 0
+        with self._lock:
+            self._entries[key] = vec
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            EMBEDDING_CACHE_ENTRIES.set(len(self._entries))
+        if evicted:
+            EMBEDDING_CACHE_EVICTIONS.inc(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            EMBEDDING_CACHE_ENTRIES.set(0)
+
+
+_backend: Optional[EmbeddingBackend] = None
+_backend_failed = False
+_backend_lock = threading.Lock()
+_embedding_cache = EmbeddingCache()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    return _embedding_cache
+
+
+def get_backend() -> Optional[EmbeddingBackend]:
+    """The process-wide embedding backend, or None when its dependencies are not installed."""
+    global _backend, _backend_failed
+    if _backend is None and not _backend_failed:
+        with _backend_lock:
+            if _backend is None and not _backend_failed:
+                try:
+                    _backend = load_backend(EMBEDDING_BACKEND, EMBEDDING_MODEL)
+                except ImportError as e:
+                    _backend_failed = True
+                    logger.warning(f"Embedding backend {EMBEDDING_BACKEND} unavailable ({e}); semantic faithfulness disabled")
+                except Exception as e:
+                    # e.g. the model download failed; don't retry on every job
+                    _backend_failed = True
+                    logger.warning(f"Failed to load embedding backend {EMBEDDING_BACKEND}: {e}")
+    return _backend
+
+
+def warm_up() -> bool:
+    """Load the model and run one encode so the first request pays neither cost."""
+    t0 = time.perf_counter()
+    backend = get_backend()
+    if backend is None:
+        return False
+    backend.encode(["warm up"])
+    EMBEDDING_MODEL_LOAD_SECONDS.set(time.perf_counter() - t0)
+    return True
+
+
+def encode_local(texts: List[str]) -> np.ndarray:
+    return get_backend().encode(texts)
+
+
+def reply_key(request_id: str) -> str:
+    return f"guardrail:embed:reply:{request_id}"
+
+
+def pack_vectors(vectors: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    np.save(buf, np.asarray(vectors, dtype=np.float32), allow_pickle=False)
+    return b"V" + buf.getvalue()
+
+
+def pack_error(message: str) -> bytes:
+    return b"E" + message.encode("utf-8")
+
+
+def unpack_reply(payload: bytes) -> np.ndarray:
+    if payload[:1] == b"E":
+        raise RuntimeError(f"Embedder error: {payload[1:].decode('utf-8', 'replace')}")
+    return np.load(io.BytesIO(payload[1:]), allow_pickle=False)
+
+
+class RemoteEncoder:
+    """Encoder that hands texts to the batching sidecar over Redis and waits for the vectors."""
+
+    def __init__(self, redis, timeout: float = EMBED_TIMEOUT_SEC):
+        self.redis = redis
+        self.timeout = timeout
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        request_id = uuid.uuid4().hex
+        self.redis.rpush(EMBED_REQUEST_KEY, json.dumps(
+            {"id": request_id, "texts": list(texts), "ts": time.time()}))
+        got = self.redis.blpop(reply_key(request_id), timeout=self.timeout)
+        if got is None:
+            raise TimeoutError(f"No embedder reply within {self.timeout}s")
+        return unpack_reply(got[1])
+
+
+_remote_encoder: Optional[RemoteEncoder] = None
+
+
+def get_encoder() -> Optional[Encoder]:
+    """The encoder for this process per EMBEDDER_MODE, or None when semantic scoring is unavailable."""
+    global _remote_encoder
+    if EMBEDDER_MODE == "redis":
+        if _remote_encoder is None:
+            from .queue import get_redis
+            _remote_encoder = RemoteEncoder(get_redis())
+        return _remote_encoder
+    return encode_local if get_backend() is not None else None
+
+
+def answer_and_passage_embeddings(answer: str, texts: Sequence[str], encoder: Encoder):
+    """(answer vector, passage matrix) from one encode call covering the answer and cache misses."""
+    vecs = get_embedding_cache().get_many(texts, encoder, prefix=[answer])
+    return vecs[0], vecs[1:]
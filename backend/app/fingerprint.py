@@ -0,0 +1,56 @@
+from typing import Sequence
+import numpy as np
+
+from .vocab import Vocabulary
+
+# Odd 64-bit multiplier for the polynomial rolling hash; arithmetic wraps mod 2**64.
+_BASE = np.uint64(0x9E3779B97F4A7C15)
+# Answer tokens unseen in any passage get ids from here up, so they never match the
+# context and distinct unknown tokens stay distinct.
+_UNKNOWN_BASE = 1 << 40
+
+
+def _mix64(ids: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads small sequential token ids over all 64 bits."""
+    x = ids.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def ngram_hashes(ids: np.ndarray, n: int) -> np.ndarray:
+    """One uint64 per n-gram window of ids; n == 1 returns the ids themselves."""
+    ids = np.asarray(ids)
+    if n <= 1:
+        return ids.astype(np.uint64)
+    count = len(ids) - n + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    mixed = _mix64(ids)
+    h = mixed[:count].copy()
+    for j in range(1, n):
+        h *= _BASE
+        h += mixed[j:j + count]
+    return h
+
+
+def ngram_fingerprints(ids: np.ndarray, n: int) -> np.ndarray:
+    """Sorted unique n-gram hashes: the array form of set(ngrams(tokens, n))."""
+    return np.unique(ngram_hashes(ids, n))
+
+
+def query_ids(vocab: Vocabulary, toks: Sequence[str]) -> np.ndarray:
+    """Ids for query/answer tokens without growing the vocabulary."""
+    ids = np.asarray(vocab.lookup(toks), dtype=np.int64)
+    unknown = ids < 0
+    if unknown.any():
+        _, local = np.unique(np.asarray(toks, dtype=object)[unknown], return_inverse=True)
+        ids[unknown] = _UNKNOWN_BASE + local
+    return ids
+
+
+def overlap_count(a: np.ndarray, b: np.ndarray) -> int:
+    """|a & b| for sorted unique arrays."""
+    if not len(a) or not len(b):
+        return 0
+    return int(np.count_nonzero(np.isin(a, b, assume_unique=True)))
@@ -0,0 +1,158 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
+import numpy as np
+from rank_bm25 import BM25Okapi
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .automaton import SuffixAutomaton
+from .bm25 import SparseBM25
+from .fingerprint import ngram_fingerprints
+from .passage_cache import NGRAM_SIZES, PassageAnalysis, PassageCache, analyze_text, get_passage_cache
+from .text_utils import ngrams
+from .vocab import Vocabulary
+
+
+@dataclass(frozen=True, eq=False)
+class PassageIndex:
+    """Per-job view of the passages: normalized once, shared by every scorer."""
+    passages: Tuple[Dict, ...]
+    analyses: Tuple[PassageAnalysis, ...]
+    docs: Tuple[str, ...]
+    tok_docs: Tuple[Tuple[str, ...], ...]
+    tok_sets: Tuple[FrozenSet[str], ...]
+    ctx_tokens: Tuple[str, ...]
+    ctx_ngrams: Mapping[int, FrozenSet[str]]
+    ctx_token_ids: np.ndarray
+    vocab: Vocabulary           # ctx_token_ids and every analysis' token_ids index into it
+    bm25: Optional[Any]
+    tfidf: Optional[TfidfVectorizer]
+    tfidf_matrix: Optional[Any]
+    _derived: Dict[Any, Any] = field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def context_ngrams(self, n: int) -> FrozenSet[str]:
+        got = self.ctx_ngrams.get(n)
+        if got is None:
+            got = frozenset(ngrams(list(self.ctx_tokens), n))
+        return got
+
+    def context_fingerprints(self, n: int) -> np.ndarray:
+        """Sorted unique n-gram hashes of the concatenated passages (see app.fingerprint)."""
+        got = self._derived.get(("fp", n))
+        if got is None:
+            got = self._derived[("fp", n)] = ngram_fingerprints(self.ctx_token_ids, n)
+        return got
+
+    def postings(self):
+        """Inverted index: the tf-idf matrix as CSC, so a term's column lists its passages."""
+        got = self._derived.get("postings")
+        if got is None:
+            got = self._derived["postings"] = (
+                self.tfidf_matrix.tocsc() if self.tfidf_matrix is not None else None)
+        return got
+
+    def terms(self) -> Mapping[str, int]:
+        """Every token found in some passage -> its postings column."""
+        return self.tfidf.vocabulary_ if self.tfidf is not None else {}
+
+    def posting_lists(self, toks) -> List[np.ndarray]:
+        """Passages holding each distinct tok, for the toks found in any passage."""
+        postings = self.postings()
+        if postings is None:
+            return []
+        terms = self.terms()
+        cols = [terms[t] for t in set(toks) if t in terms]
+        return [postings.indices[postings.indptr[c]:postings.indptr[c + 1]] for c in cols]
+
+    def automaton(self) -> SuffixAutomaton:
+        """Suffix automaton over the passages' token ids, built on first use."""
+        got = self._derived.get("sam")
+        if got is None:
+            got = self._derived["sam"] = SuffixAutomaton([a.token_ids for a in self.analyses])
+        return got
+
+
+def _fit_tfidf(docs: List[str]):
+    vec = TfidfVectorizer(
+        lowercase=False, preprocessor=lambda x: x, tokenizer=lambda x: x.split(),
+        token_pattern=None)
+    try:
+        X = vec.fit_transform(docs)
+    except ValueError:
+        # empty vocabulary: every passage normalized to nothing
+        return None, None
+    return vec, X
+
+
+def _context_ngrams(analyses: List[PassageAnalysis], n: int) -> FrozenSet[str]:
+    """n-grams of the concatenated passages: per-passage sets plus boundary-crossing ones."""
+    grams: Set[str] = set()
+    seen: Set[bytes] = set()
+    tail: List[str] = []
+    for a in analyses:
+        if a.key not in seen:
+            seen.add(a.key)
+            grams |= a.ngrams[n]
+        if n > 1:
+            grams.update(ngrams(tail + list(a.tokens[:n - 1]), n))
+            tail = (tail + list(a.tokens[-(n - 1):]))[-(n - 1):]
+    return frozenset(grams)
+
+
+def build_index(passages: List[Dict], bm25_engine: str = "okapi", cache: PassageCache = None,
+                corpus_stats=None, bm25=None, retrieval: bool = True) -> PassageIndex:
+    """bm25 is a prebuilt scorer over exactly these passages, e.g. CorpusIndex.bm25_for(rows).
+
+    retrieval=False skips the BM25 and TF-IDF scorers, for callers that never rank passages.
+    """
+    passages = list(passages or [])
+    if cache is None:
+        cache = get_passage_cache()
+
+    # duplicate texts within the request resolve to one analysis
+    by_text: Dict[str, PassageAnalysis] = {}
+    analyses: List[PassageAnalysis] = []
+    for p in passages:
+        text = p.get("text", "")
+        a = by_text.get(text)
+        if a is None:
+            a = by_text[text] = cache.get(text)
+        analyses.append(a)
+    vocab = analyses[0].vocab if analyses else cache.vocab
+    if any(a.vocab is not vocab for a in analyses):
+        # the cache swapped its vocabulary mid-request; ids from the two don't mix
+        vocab = Vocabulary()
+        by_text = {text: analyze_text(text, a.key, vocab) for text, a in by_text.items()}
+        analyses = [by_text[p.get("text", "")] for p in passages]
+
+    docs = [a.normalized for a in analyses]
+    tok_docs = [a.tokens for a in analyses]
+    ctx_tokens = tuple(t for toks in tok_docs for t in toks)
+
+    # "okapi" is rank_bm25.BM25Okapi, "sparse" the in-house matrix engine (app.bm25)
+    if retrieval and bm25 is None and ctx_tokens:
+        if bm25_engine == "sparse":
+            bm25 = SparseBM25.from_term_freqs(
+                [(a.terms, a.term_counts) for a in analyses], stats=corpus_stats)
+        else:
+            bm25 = BM25Okapi(tok_docs)
+    tfidf, X = _fit_tfidf(docs) if retrieval and docs else (None, None)
+
+    return PassageIndex(
+        passages=tuple(passages),
+        analyses=tuple(analyses),
+        docs=tuple(docs),
+        tok_docs=tuple(tok_docs),
+        tok_sets=tuple(a.token_set for a in analyses),
+        ctx_tokens=ctx_tokens,
+        ctx_ngrams=MappingProxyType({n: _context_ngrams(analyses, n) for n in NGRAM_SIZES}),
+        ctx_token_ids=(np.concatenate([a.token_ids for a in analyses])
+                       if analyses else np.empty(0, dtype=np.int64)),
+        vocab=vocab,
+        bm25=bm25,
+        tfidf=tfidf,
+        tfidf_matrix=X,
+    )
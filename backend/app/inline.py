@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from .metrics import apply_counter_deltas, counter_deltas, counter_values
+from .schemas import EvaluateRequest
+from .validation import request_size
+
+# Small payloads score in a few ms, less than the enqueue/Redis round trip around them,
+# so /evaluate can run them in a process pool inside the API. 0 workers turns this off.
+INLINE_EVAL_WORKERS = int(os.getenv("INLINE_EVAL_WORKERS", "0"))
+INLINE_EVAL_MAX_BYTES = int(os.getenv("INLINE_EVAL_MAX_BYTES", "16384"))
+INLINE_EVAL_MAX_PASSAGES = int(os.getenv("INLINE_EVAL_MAX_PASSAGES", "5"))
+# evaluations allowed in or waiting for the pool; past that, requests spill to the queue
+INLINE_EVAL_MAX_PENDING = int(os.getenv("INLINE_EVAL_MAX_PENDING", str(2 * INLINE_EVAL_WORKERS)))
+
+
+def _warm_up() -> None:
+    # policy, lexicon and models load once per pool process, not on its first request
+    import worker.worker  # noqa: F401
+
+
+def _evaluate(payload: dict, deadline: float) -> Tuple[Optional[dict], List]:
+    # counters incremented here live in the pool process; return them so /metrics sees them
+    from worker.worker import evaluate_payload
+    before = counter_values()
+    result = evaluate_payload(payload, deadline=deadline)
+    return result, counter_deltas(before)
+
+
+class InlineEvaluator:
+    """Runs worker.evaluate_payload in a bounded pool of API-side processes."""
+
+    def __init__(self, workers: int, max_bytes: int, max_passages: int, max_pending: int):
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.max_passages = max_passages
+        self.max_pending = max_pending
+        self.pending = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking the API would copy its event loop and exporter threads
+            self._pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_warm_up)
+        return self._pool
+
+    def accepts(self, req: EvaluateRequest) -> bool:
+        # registered corpora stay with the queue workers, which hold their indexes
+        return (not req.corpus_id
+                and len(req.passages) <= self.max_passages
+                and self.pending < self.max_pending
+                and request_size(req.passages, req.question, req.answer) <= self.max_bytes)
+
+    def _release(self, fut) -> None:
+        self.pending -= 1
+        # also for evaluations the request stopped waiting for: deadline shedding happens there
+        if not fut.cancelled() and fut.exception() is None:
+            apply_counter_deltas(fut.result()[1])
+
+    async def evaluate(self, payload: dict, timeout: float) -> Optional[dict]:
+        """Same outcomes as wait_for_job_async(): finished with result, failed, or None on timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = time.time() + timeout
+        try:
+            fut = loop.run_in_executor(self._get_pool(), _evaluate, payload, deadline)
+        except BrokenProcessPool:
+            self._pool = None
+            fut = loop.run_in_executor(self._get_pool(), _evaluate, payload, deadline)
+        # a timed-out evaluation still occupies its process until it returns
+        self.pending += 1
+        fut.add_done_callback(self._release)
+        try:
+            result, _ = await asyncio.wait_for(asyncio.shield(fut), timeout)
+            return {"status": "finished", "result": result}
+        except asyncio.TimeoutError:
+            return None
+        except BrokenProcessPool as e:
+            logging.warning(f"Inline evaluation pool broke, restarting it: {e}")
+            self._pool = None
+            return {"status": "failed"}
+        except Exception as e:
+            logging.warning(f"Inline evaluation failed: {e}")
+            return {"status": "failed"}
+
+
+_INLINE: Optional[InlineEvaluator] = None
+
+
+def get_inline_evaluator() -> Optional[InlineEvaluator]:
+    global _INLINE
+    if INLINE_EVAL_WORKERS <= 0:
+        return None
+    if _INLINE is None:
+        _INLINE = InlineEvaluator(INLINE_EVAL_WORKERS, INLINE_EVAL_MAX_BYTES,
+                                  INLINE_EVAL_MAX_PASSAGES, INLINE_EVAL_MAX_PENDING)
+    return _INLINE
@@ -0,0 +1,111 @@
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class LexiconMatch:
+    start: int
+    end: int
+    term: str
+    category: str
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class Lexicon:
+    """Aho-Corasick automaton over lowercase terms; one pass over the text finds every term.
+
+    Matches must sit on word boundaries (the characters around them are not \\w), so
+    "damn" does not fire inside "damnation".
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]], weights: Dict[str, float] = None):
+        self.weights = dict(weights or {})
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        self.terms: List[Tuple[str, str]] = []
+        seen = set()
+        for term, category in entries:
+            term = term.strip().lower()
+            if not term or (term, category) in seen:
+                continue
+            seen.add((term, category))
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(len(self.terms))
+            self.terms.append((term, category))
+
+        # fail links by BFS; out[] gains the outputs of the fail target (dictionary suffixes)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f][ch] if ch in goto[f] and goto[f][ch] != nxt else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    @classmethod
+    def from_file(cls, path: str, weights: Dict[str, float] = None) -> "Lexicon":
+        """Tab-separated `term<TAB>category` lines; `#` comments and blank lines are skipped."""
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                term, _, category = line.partition("\t")
+                entries.append((term, category.strip() or "default"))
+        return cls(entries, weights)
+
+    def scan(self, text: str, start: int = 0) -> List[LexiconMatch]:
+        """Matches starting at or after `start`; text before it only decides word boundaries."""
+        lowered = text.lower()
+        # lower() can change length for a few characters; map spans back to text
+        pos: Optional[List[int]] = None
+        if len(lowered) != len(text):
+            pos = [i for i, ch in enumerate(text) for _ in ch.lower()] + [len(text)]
+            start = bisect_left(pos, start)
+
+        goto, fail, out, terms = self._goto, self._fail, self._out, self.terms
+        matches: List[LexiconMatch] = []
+        state = 0
+        for i, ch in enumerate(lowered[start:], start):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for t in out[state]:
+                term, category = terms[t]
+                start, end = i + 1 - len(term), i + 1
+                if start > 0 and _is_word_char(lowered[start - 1]):
+                    continue
+                if end < len(lowered) and _is_word_char(lowered[end]):
+                    continue
+                if pos is not None:
+                    start, end = pos[start], pos[end - 1] + 1
+                matches.append(LexiconMatch(start, end, text[start:end], category))
+        matches.sort(key=lambda m: (m.start, m.end))
+        return matches
+
+    def categories(self, matches: List[LexiconMatch]) -> Dict[str, float]:
+        """Weight of every category that matched (weights default to 0)."""
+        return {m.category: self.weights.get(m.category, 0.0) for m in matches}
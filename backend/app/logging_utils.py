@@ -1,17 +1,10 @@
-import re
 from typing import Any, Dict
 
-EMAIL_RE = re.compile(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", re.I)
-PHONE_RE = re.compile(
-    r"\b(?:\+?1[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)?\d{3}[-.\s]?\d{4}\b")
-SSN_RE = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
+from .pii import redact
 
 
 def redact_pii(text: str) -> str:
-    text = EMAIL_RE.sub("[EMAIL_REDACTED]", text)
-    text = PHONE_RE.sub("[PHONE_REDACTED]", text)
-    text = SSN_RE.sub("[SSN_REDACTED]", text)
-    return text
+    return redact(text)
 
 
 def safe_log_data(data: Dict[str, Any]) -> Dict[str, Any]:
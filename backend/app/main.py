@@ -1,20 +1,38 @@
-from fastapi import FastAPI, HTTPException, Request, Header, Depends
-from rq.job import Job
-from .schemas import EvaluateRequest, EvaluateResponse
+from fastapi import FastAPI, HTTPException, Request, Header, Depends, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from rq.exceptions import NoSuchJobError
+from rq.job import Callback, Job, JobStatus
+from .schemas import EvaluateRequest, EvaluateResponse, CorpusCreateRequest, CorpusInfo, RepairResult, EvaluateBatchRequest, EvaluateBatchResponse, BatchItemResult
+from .codec import encode
 from .config import settings
-from .queue import q
-from .metrics import LATENCY, REQUESTS, FAILURES, SHADOW_REQUESTS, SHADOW_LATENCY, SHADOW_DISAGREEMENT, metrics_endpoint, LatencyTimer, sample_rq_gauges
+from .corpus import CorpusStore, get_corpus
+from .index import build_index
+from .queue import REPAIR_QUEUE, q, get_redis, notify_failure, notify_success
+from .async_queue import enqueue_async, enqueue_many_async, wait_for_job_async, wait_for_jobs_async
+from .inline import get_inline_evaluator
+from .result_cache import get_result_cache
+from .single_flight import get_single_flight
+from .metrics import LATENCY, REQUESTS, FAILURES, SHADOW_REQUESTS, SHADOW_LATENCY, SHADOW_DISAGREEMENT, STREAM_SESSIONS, BATCH_ITEMS, BATCH_LATENCY, metrics_endpoint, LatencyTimer, sample_rq_gauges
 from .tracing import setup_tracer
-from .validation import validate_request
-from .auth import verify_api_key, rate_limit
+from .validation import MAX_TOTAL_SIZE_BYTES, validate_request, validate_passage_refs, validate_corpus, validate_callback, validate_batch
+from .auth import RATE_LIMIT_BATCH_ITEMS, verify_api_key, rate_limit, rate_limit_async
 from .logging_utils import safe_log_data
 from .version import get_version_info
 from .shadow_analytics import get_shadow_tracker
+from .policy import load_policy
+from .retrieval import split_mode
+from .safety import get_lexicon
+from .stream import StreamState
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry import trace
+import json
 import logging
 import os
+import time
 import uuid
+from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +41,9 @@ tracer = setup_tracer("guardrail-api")
 FastAPIInstrumentor.instrument_app(app)
 
 GUARDRAIL_MODE = os.getenv("GUARDRAIL_MODE", "enforce").lower()
+# /evaluate/batch items per worker job
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "25"))
+_POLICY = load_policy()
 
 
 @app.get("/health")
@@ -48,101 +69,423 @@ def metrics():
     return metrics_endpoint()
 
 
+def _corpus_store() -> CorpusStore:
+    return CorpusStore(get_redis())
+
+
+@app.post("/corpora", response_model=CorpusInfo, status_code=201)
+def create_corpus(
+    req: CorpusCreateRequest,
+    request: Request,
+    api_key: str = Header(None, alias="X-API-Key"),
+):
+    verify_api_key(api_key)
+    rate_limit_result = rate_limit(request.client.host if request.client else "unknown")
+    if rate_limit_result:
+        return rate_limit_result
+    validate_corpus(req.passages)
+
+    with tracer.start_as_current_span("corpus.create") as span:
+        span.set_attribute("passages.count", len(req.passages))
+        try:
+            meta = _corpus_store().create([p.model_dump() for p in req.passages], name=req.name)
+        except Exception:
+            FAILURES.labels(reason="corpus_store_error").inc()
+            raise HTTPException(status_code=500, detail="Failed to store corpus")
+    return CorpusInfo(**meta)
+
+
+@app.get("/corpora/{corpus_id}", response_model=CorpusInfo)
+def get_corpus_info(corpus_id: str, api_key: str = Header(None, alias="X-API-Key")):
+    verify_api_key(api_key)
+    meta = _corpus_store().get_meta(corpus_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Corpus not found")
+    return CorpusInfo(**meta)
+
+
+@app.delete("/corpora/{corpus_id}")
+def delete_corpus(corpus_id: str, api_key: str = Header(None, alias="X-API-Key")):
+    verify_api_key(api_key)
+    if not _corpus_store().delete(corpus_id):
+        raise HTTPException(status_code=404, detail="Corpus not found")
+    return {"deleted": True, "corpus_id": corpus_id}
+
+
+def _check_passage_refs(req: EvaluateRequest) -> None:
+    validate_passage_refs(req.corpus_id, req.passage_ids, req.passages)
+    if not req.corpus_id:
+        return
+    missing = _corpus_store().missing_ids(req.corpus_id, req.passage_ids)
+    if missing is None:
+        raise HTTPException(status_code=404, detail="Corpus not found")
+    if missing:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown passage ids: {', '.join(missing[:5])}{'…' if len(missing) > 5 else ''}"
+        )
+
+
 @app.post("/evaluate", response_model=EvaluateResponse)
-def evaluate(
+async def evaluate(
     req: EvaluateRequest,
     request: Request,
     api_key: str = Header(None, alias="X-API-Key"),
-    x_request_id: str = Header(None, alias="X-Request-ID")
+    x_request_id: str = Header(None, alias="X-Request-ID"),
+    idempotency_key: str = Header(None, alias="Idempotency-Key")
 ):
     request_id = x_request_id or str(uuid.uuid4())
     
     verify_api_key(api_key)
-    rate_limit_result = rate_limit(request.client.host if request.client else "unknown")
+    rate_limit_result = await rate_limit_async(request.client.host if request.client else "unknown")
     if rate_limit_result:
         return rate_limit_result
     validate_request(req.passages, req.question, req.answer)
+    validate_callback(req.defer_repair, req.callback_url)
+    if req.corpus_id:
+        await run_in_threadpool(_check_passage_refs, req)
+    else:
+        _check_passage_refs(req)
+    return await _run_evaluation(req, request_id, idempotency_key=idempotency_key)
 
+
+async def _run_evaluation(req: EvaluateRequest, request_id: str,
+                          idempotency_key: Optional[str] = None) -> EvaluateResponse:
     with LatencyTimer() as T, tracer.start_as_current_span("evaluate.request") as span:
         span.set_attribute("request.id", request_id)
         span.set_attribute("question.len", len(req.question or ""))
         span.set_attribute("answer.len", len(req.answer or ""))
-        span.set_attribute("passages.count", len(req.passages or []))
+        span.set_attribute("passages.count", len(req.passages or req.passage_ids or []))
+        if req.corpus_id:
+            span.set_attribute("corpus.id", req.corpus_id)
         span.set_attribute("mode", GUARDRAIL_MODE)
 
-        try:
-            with tracer.start_as_current_span("evaluate.enqueue"):
-                job: Job = q.enqueue(
-                    "worker.worker.evaluate_payload", req.model_dump())
-        except Exception:
-            FAILURES.labels(reason="enqueue_error").inc()
-            span.record_exception(Exception("enqueue_error"))
-            raise HTTPException(status_code=500, detail="Failed to enqueue")
-
-        timeout = settings.EVAL_TIMEOUT_SEC
-        import time
-        for _ in range(timeout * 10):
-            job.refresh()
-            if job.is_finished:
-                result = job.result
-                resp = EvaluateResponse(**result)
-                
-                original_decision = resp.decision
-                if GUARDRAIL_MODE == "shadow":
-                    SHADOW_REQUESTS.labels(decision=original_decision).inc()
-                    SHADOW_LATENCY.observe(T.duration)
-                    tracker = get_shadow_tracker()
-                    tracker.record(
-                        question=req.question,
-                        answer=req.answer,
-                        shadow_decision=original_decision,
-                        scores=resp.scores.model_dump(),
-                        question_len=len(req.question),
-                        answer_len=len(req.answer),
-                    )
-                    if original_decision != "allow":
-                        SHADOW_DISAGREEMENT.labels(
-                            shadow_decision=original_decision,
-                            enforce_decision="allow"
-                        ).inc()
-                    logger.info(f"Shadow mode: would have returned {original_decision}, but allowing")
-                    resp.decision = "allow"
-                else:
-                    REQUESTS.labels(decision=resp.decision).inc()
-                    LATENCY.observe(T.duration)
-
-                safe_data = safe_log_data({
-                    "decision": resp.decision,
-                    "original_decision": original_decision if GUARDRAIL_MODE == "shadow" else None,
-                    "scores": resp.scores.model_dump(),
-                    "question_len": len(req.question),
-                    "answer_len": len(req.answer),
-                    "mode": GUARDRAIL_MODE,
-                    "request_id": request_id,
-                })
-                logger.info(f"Evaluation complete: {safe_data}")
-
-                with tracer.start_as_current_span("evaluate.finish") as s2:
-                    s2.set_attribute("decision", resp.decision)
-                    s2.set_attribute("faithfulness", resp.scores.faithfulness)
-                    s2.set_attribute("coverage", resp.scores.coverage)
-                    s2.set_attribute("toxicity", resp.scores.toxicity)
-                    s2.set_attribute("mode", GUARDRAIL_MODE)
-                    if GUARDRAIL_MODE == "shadow":
-                        s2.set_attribute("shadow_decision", original_decision)
-                
+        cache = get_result_cache()
+        payload_key = cache.key(req)
+        if cache.enabled:
+            with tracer.start_as_current_span("evaluate.cache"):
+                cached = await cache.get(payload_key, idempotency_key)
+            if cached is not None:
+                span.set_attribute("path", "cache")
+                resp = _complete(req, cached, "cache", request_id, T.duration)
+                resp.meta["cache"] = "hit"
                 return resp
-            if job.is_failed:
-                FAILURES.labels(reason="worker_job_failed").inc()
-                span.record_exception(Exception("worker_job_failed"))
-                if GUARDRAIL_MODE != "shadow":
-                    LATENCY.observe(T.duration)
-                raise HTTPException(
-                    status_code=500, detail="Worker job failed")
-            time.sleep(0.1)
+
+        inline = get_inline_evaluator()
+        path = "inline" if inline is not None and inline.accepts(req) else "queue"
+
+        async def evaluate_once(job_id: Optional[str]) -> Optional[dict]:
+            if path == "inline":
+                with tracer.start_as_current_span("evaluate.inline"):
+                    return await inline.evaluate(req.model_dump(), settings.EVAL_TIMEOUT_SEC)
+            try:
+                with tracer.start_as_current_span("evaluate.enqueue"):
+                    # the worker sheds work as this nears and drops the job past it
+                    deadline = time.time() + settings.EVAL_TIMEOUT_SEC
+                    job: Job = await enqueue_async(
+                        q, "worker.worker.evaluate_encoded", encode(req.model_dump()), deadline, job_id=job_id,
+                        on_success=Callback(notify_success), on_failure=Callback(notify_failure))
+            except Exception:
+                FAILURES.labels(reason="enqueue_error").inc()
+                span.record_exception(Exception("enqueue_error"))
+                raise HTTPException(status_code=500, detail="Failed to enqueue")
+
+            with tracer.start_as_current_span("evaluate.wait"):
+                # a shared job's notice is left for its followers in other processes
+                return await wait_for_job_async(job, settings.EVAL_TIMEOUT_SEC, consume=job_id is None)
+
+        coalesced, done = await get_single_flight().run(
+            payload_key, settings.EVAL_TIMEOUT_SEC, evaluate_once, q if path == "queue" else None)
+        if coalesced:
+            path = "coalesced"
+        span.set_attribute("path", path)
+        if done is not None and done["status"] == "finished" and done["result"] is None:
+            # the worker gave up at the deadline (a follower can outwait its leader's)
+            done = None
+        if done is not None and done["status"] == "finished":
+            if cache.enabled and (not coalesced or idempotency_key) and _cacheable(done["result"]):
+                await cache.put(payload_key, done["result"], idempotency_key)
+            return _complete(req, done["result"], path, request_id, T.duration)
+        if done is not None:
+            FAILURES.labels(reason="worker_job_failed").inc()
+            span.record_exception(Exception("worker_job_failed"))
+            if GUARDRAIL_MODE != "shadow":
+                LATENCY.labels(path=path).observe(T.duration)
+            raise HTTPException(
+                status_code=500, detail="Worker job failed")
 
     FAILURES.labels(reason="timeout").inc()
     span.record_exception(Exception("timeout"))
     if GUARDRAIL_MODE != "shadow":
-        LATENCY.observe(T.duration)
+        LATENCY.labels(path=path).observe(T.duration)
     raise HTTPException(status_code=504, detail="Evaluation timed out")
+
+
+def _cacheable(result: dict) -> bool:
+    # a result degraded to meet its deadline would outlive the load that degraded it
+    return "skipped" not in result.get("meta", {})
+
+
+def _complete(req: EvaluateRequest, result: dict, path: str, request_id: str,
+              latency: Optional[float]) -> EvaluateResponse:
+    resp = EvaluateResponse(**result)
+    
+    original_decision = resp.decision
+    if GUARDRAIL_MODE == "shadow":
+        SHADOW_REQUESTS.labels(decision=original_decision, path=path).inc()
+        if latency is not None:
+            SHADOW_LATENCY.labels(path=path).observe(latency)
+        tracker = get_shadow_tracker()
+        tracker.record(
+            question=req.question,
+            answer=req.answer,
+            shadow_decision=original_decision,
+            scores=resp.scores.model_dump(),
+            question_len=len(req.question),
+            answer_len=len(req.answer),
+        )
+        if original_decision != "allow":
+            SHADOW_DISAGREEMENT.labels(
+                shadow_decision=original_decision,
+                enforce_decision="allow"
+            ).inc()
+        logger.info(f"Shadow mode: would have returned {original_decision}, but allowing")
+        resp.decision = "allow"
+    else:
+        REQUESTS.labels(decision=resp.decision, path=path).inc()
+        if latency is not None:
+            LATENCY.labels(path=path).observe(latency)
+
+    safe_data = safe_log_data({
+        "decision": resp.decision,
+        "original_decision": original_decision if GUARDRAIL_MODE == "shadow" else None,
+        "scores": resp.scores.model_dump(),
+        "question_len": len(req.question),
+        "answer_len": len(req.answer),
+        "mode": GUARDRAIL_MODE,
+        "request_id": request_id,
+    })
+    logger.info(f"Evaluation complete: {safe_data}")
+
+    with tracer.start_as_current_span("evaluate.finish") as s2:
+        s2.set_attribute("decision", resp.decision)
+        s2.set_attribute("faithfulness", resp.scores.faithfulness)
+        s2.set_attribute("coverage", resp.scores.coverage)
+        s2.set_attribute("toxicity", resp.scores.toxicity)
+        s2.set_attribute("mode", GUARDRAIL_MODE)
+        if GUARDRAIL_MODE == "shadow":
+            s2.set_attribute("shadow_decision", original_decision)
+    
+    return resp
+
+
+def _check_batch_refs(reqs: List[EvaluateRequest]) -> List[Optional[HTTPException]]:
+    errors = []
+    for req in reqs:
+        try:
+            _check_passage_refs(req)
+            errors.append(None)
+        except HTTPException as e:
+            errors.append(e)
+    return errors
+
+
+@app.post("/evaluate/batch", response_model=EvaluateBatchResponse)
+async def evaluate_batch(
+    body: EvaluateBatchRequest,
+    request: Request,
+    api_key: str = Header(None, alias="X-API-Key"),
+    x_request_id: str = Header(None, alias="X-Request-ID")
+):
+    """Many /evaluate bodies in one request.
+
+    Every item is validated on its own and answered with the status /evaluate would have
+    returned. Valid items are scored by the workers BATCH_CHUNK_SIZE at a time, all chunks
+    enqueued in one round trip, and the results are collected together.
+    """
+    request_id = x_request_id or str(uuid.uuid4())
+
+    verify_api_key(api_key)
+    validate_batch(body.items)
+    rate_limit_result = await rate_limit_async(
+        request.client.host if request.client else "unknown",
+        cost=-(-len(body.items) // RATE_LIMIT_BATCH_ITEMS))
+    if rate_limit_result:
+        return rate_limit_result
+
+    results: List[Optional[BatchItemResult]] = [None] * len(body.items)
+    valid: List[Tuple[int, EvaluateRequest]] = []
+    for i, item in enumerate(body.items):
+        try:
+            req = EvaluateRequest(**item)
+            validate_request(req.passages, req.question, req.answer)
+            validate_callback(req.defer_repair, req.callback_url)
+            if not req.corpus_id:
+                _check_passage_refs(req)
+            valid.append((i, req))
+        except HTTPException as e:
+            results[i] = BatchItemResult(status=e.status_code, detail=e.detail)
+        except ValidationError as e:
+            results[i] = BatchItemResult(status=422, detail=e.errors(include_url=False, include_context=False))
+    by_ref = [(i, req) for i, req in valid if req.corpus_id]
+    if by_ref:
+        errors = await run_in_threadpool(_check_batch_refs, [req for _, req in by_ref])
+        for (i, _), e in zip(by_ref, errors):
+            if e is not None:
+                results[i] = BatchItemResult(status=e.status_code, detail=e.detail)
+        valid = [(i, req) for i, req in valid if results[i] is None]
+
+    with LatencyTimer() as T, tracer.start_as_current_span("evaluate.batch") as span:
+        span.set_attribute("request.id", request_id)
+        span.set_attribute("batch.items", len(body.items))
+        span.set_attribute("batch.valid", len(valid))
+        cache = get_result_cache()
+        keys = {i: cache.key(req) for i, req in valid} if cache.enabled else {}
+        if keys:
+            with tracer.start_as_current_span("evaluate.cache"):
+                cached = await cache.get_many([keys[i] for i, _ in valid])
+            for (i, req), result in zip(valid, cached):
+                if result is not None:
+                    resp = _complete(req, result, "cache", f"{request_id}:{i}", None)
+                    resp.meta["cache"] = "hit"
+                    results[i] = BatchItemResult(status=200, result=resp)
+            valid = [(i, req) for i, req in valid if results[i] is None]
+        chunks = [valid[k:k + BATCH_CHUNK_SIZE] for k in range(0, len(valid), BATCH_CHUNK_SIZE)]
+        if chunks:
+            deadline = time.time() + settings.EVAL_BATCH_TIMEOUT_SEC
+            try:
+                with tracer.start_as_current_span("evaluate.enqueue"):
+                    jobs = await enqueue_many_async(
+                        q, "worker.worker.evaluate_batch_encoded",
+                        [(encode([req.model_dump() for _, req in chunk]), deadline) for chunk in chunks],
+                        on_success=Callback(notify_success), on_failure=Callback(notify_failure))
+            except Exception:
+                FAILURES.labels(reason="enqueue_error").inc()
+                span.record_exception(Exception("enqueue_error"))
+                raise HTTPException(status_code=500, detail="Failed to enqueue")
+
+            with tracer.start_as_current_span("evaluate.wait"):
+                dones = await wait_for_jobs_async(jobs, settings.EVAL_BATCH_TIMEOUT_SEC)
+            fresh = []
+            for chunk, done in zip(chunks, dones):
+                if done is not None and done["status"] == "finished" and done["result"] is None:
+                    done = None  # dropped by the worker at the deadline
+                finished = done is not None and done["status"] == "finished"
+                for k, (i, req) in enumerate(chunk):
+                    result = done["result"][k] if finished else None
+                    if result is not None:
+                        if keys and _cacheable(result):
+                            fresh.append((keys[i], result))
+                        resp = _complete(req, result, "batch", f"{request_id}:{i}", None)
+                        results[i] = BatchItemResult(status=200, result=resp)
+                    elif done is None:
+                        FAILURES.labels(reason="timeout").inc()
+                        results[i] = BatchItemResult(status=504, detail="Evaluation timed out")
+                    else:
+                        FAILURES.labels(reason="worker_job_failed").inc()
+                        results[i] = BatchItemResult(status=500, detail="Worker job failed")
+            await cache.put_many(fresh)
+
+    BATCH_ITEMS.observe(len(body.items))
+    BATCH_LATENCY.observe(T.duration)
+    return EvaluateBatchResponse(results=results)
+
+
+@app.get("/repairs/{repair_id}", response_model=RepairResult)
+def get_repair(repair_id: str, api_key: str = Header(None, alias="X-API-Key")):
+    verify_api_key(api_key)
+    try:
+        job = Job.fetch(repair_id, connection=get_redis())
+    except NoSuchJobError:
+        job = None
+    if job is None or job.origin != REPAIR_QUEUE:
+        raise HTTPException(status_code=404, detail="Repair not found")
+    status_ = job.get_status()
+    if status_ == JobStatus.FINISHED:
+        return RepairResult(**job.return_value())
+    if status_ in (JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED):
+        return RepairResult(repair_id=repair_id, status="failed")
+    return JSONResponse(RepairResult(repair_id=repair_id, status="pending").model_dump(), status_code=202)
+
+
+def _open_stream(req: EvaluateRequest) -> StreamState:
+    passages = [p.model_dump() for p in req.passages]
+    if req.corpus_id:
+        passages = get_corpus(req.corpus_id, _corpus_store()).pick(req.passage_ids)
+    # the stream only matches n-grams; BM25/TF-IDF are the worker's job once the answer is done
+    index = build_index(passages, bm25_engine=split_mode(_POLICY.repair.retriever_mode)[1], retrieval=False)
+    return StreamState(index, get_lexicon())
+
+
+@app.websocket("/evaluate/stream")
+async def evaluate_stream(websocket: WebSocket):
+    """Evaluate an answer while it is generated.
+
+    The first message is an /evaluate body whose `answer` may be empty or a first chunk;
+    then {"chunk": "..."} messages, the last one carrying "done": true. Every chunk is
+    acknowledged with a `progress` event. A `block` event ends the stream as soon as
+    the toxicity seen so far crosses the threshold. Otherwise the full answer goes
+    through the worker like /evaluate and comes back as a `final` event.
+    """
+    request_id = websocket.headers.get("x-request-id") or str(uuid.uuid4())
+    try:
+        verify_api_key(websocket.headers.get("x-api-key") or websocket.query_params.get("api_key"))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if await rate_limit_async(websocket.client.host if websocket.client else "unknown"):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    await websocket.accept()
+
+    outcome = "error"
+    try:
+        first = await websocket.receive_json()
+        req = EvaluateRequest(**first)
+        validate_request(req.passages, req.question, req.answer)
+        validate_callback(req.defer_repair, req.callback_url)
+        await run_in_threadpool(_check_passage_refs, req)
+        state = await run_in_threadpool(_open_stream, req)
+
+        msg = {"chunk": req.answer, "done": first.get("done")}
+        while True:
+            state.feed(msg.get("chunk") or "")
+            if state.nbytes > MAX_TOTAL_SIZE_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Answer exceeds size limit: {state.nbytes} > {MAX_TOTAL_SIZE_BYTES} bytes")
+            if GUARDRAIL_MODE != "shadow" and state.should_block(_POLICY):
+                outcome = "early_block"
+                await websocket.send_json({
+                    "event": "block",
+                    "decision": "block",
+                    "scores": {"toxicity": round(state.toxicity(), 2)},
+                    "explanations": ["Toxic/PII content detected"],
+                    "answer_bytes": state.nbytes,
+                })
+                break
+            await websocket.send_json({
+                "event": "progress",
+                "answer_bytes": state.nbytes,
+                "scores": {"toxicity": round(state.toxicity(), 2),
+                           "faithfulness": round(state.faithfulness(), 2)},
+            })
+            if msg.get("done"):
+                req.answer = state.finish()
+                validate_request(req.passages, req.question, req.answer)
+                resp = await _run_evaluation(req, request_id, websocket.headers.get("idempotency-key"))
+                outcome = "final"
+                await websocket.send_json({"event": "final", **resp.model_dump()})
+                break
+            msg = await websocket.receive_json()
+    except WebSocketDisconnect:
+        STREAM_SESSIONS.labels(outcome="disconnect").inc()
+        return
+    except HTTPException as e:
+        await websocket.send_json({"event": "error", "status": e.status_code, "detail": e.detail})
+    except json.JSONDecodeError:
+        await websocket.send_json({"event": "error", "status": 400, "detail": "Messages must be JSON"})
+    except ValidationError as e:
+        await websocket.send_json({"event": "error", "status": 422, "detail": e.errors(include_url=False, include_context=False)})
+    STREAM_SESSIONS.labels(outcome=outcome).inc()
+    await websocket.close()
@@ -1,15 +1,18 @@
 import time
-from typing import Optional
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from typing import Dict, List, Optional, Tuple
+from prometheus_client import Counter, Histogram, Gauge, generate_latest, start_http_server, CONTENT_TYPE_LATEST
 from fastapi import Response
 from redis import Redis
 from rq import Queue
 from app.config import settings
 
+# `path` on the /evaluate metrics: "queue" (RQ worker), "inline" (API process pool)
+# "batch" (an /evaluate/batch item), "cache" (result cache hit) or "coalesced" (shared
+# the result of an identical in-flight evaluation)
 REQUESTS = Counter(
     "guardrail_requests_total",
     "Total /evaluate requests completed",
-    ["decision"]
+    ["decision", "path"]
 )
 
 FAILURES = Counter(
@@ -21,6 +24,7 @@ FAILURES = Counter(
 LATENCY = Histogram(
     "guardrail_eval_latency_seconds",
     "Latency for full evaluate path (API enqueue -> result)",
+    ["path"],
     buckets=(0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.0, 5.0)
 )
 
@@ -32,12 +36,13 @@ JOBS_IN_PROGRESS = Gauge(
 SHADOW_REQUESTS = Counter(
     "guardrail_shadow_requests_total",
     "Total /evaluate requests in shadow mode",
-    ["decision"]
+    ["decision", "path"]
 )
 
 SHADOW_LATENCY = Histogram(
     "guardrail_shadow_eval_latency_seconds",
     "Latency for shadow mode evaluations",
+    ["path"],
     buckets=(0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.0, 5.0)
 )
 
@@ -47,18 +52,167 @@ SHADOW_DISAGREEMENT = Counter(
     ["shadow_decision", "enforce_decision"]
 )
 
+STREAM_SESSIONS = Counter(
+    "guardrail_stream_sessions_total",
+    "/evaluate/stream sessions by how they ended",
+    ["outcome"]
+)
+
+BATCH_ITEMS = Histogram(
+    "guardrail_batch_items",
+    "Items per /evaluate/batch request",
+    buckets=(1, 10, 50, 100, 250, 500, 1000)
+)
+
+BATCH_LATENCY = Histogram(
+    "guardrail_batch_latency_seconds",
+    "Latency for a whole /evaluate/batch request",
+    buckets=(0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+)
+
+RESULT_CACHE_LOOKUPS = Counter(
+    "guardrail_result_cache_lookups_total",
+    "/evaluate result cache lookups by outcome and the tier that answered",
+    ["result", "tier"]
+)
+
+RESULT_CACHE_HIT_RATIO = Gauge(
+    "guardrail_result_cache_hit_ratio",
+    "Share of /evaluate result cache lookups answered from the cache since this process started",
+)
+
+COALESCED_REQUESTS = Counter(
+    "guardrail_coalesced_requests_total",
+    "/evaluate requests that waited on an identical in-flight evaluation instead of running their own",
+    ["scope"]
+)
+
+WORKER_DEADLINE_ACTIONS = Counter(
+    "guardrail_worker_deadline_actions_total",
+    "Worker work shed because the request deadline was near or past",
+    ["action"]
+)
+
+PASSAGE_CACHE_LOOKUPS = Counter(
+    "guardrail_passage_cache_lookups_total",
+    "Passage analysis cache lookups",
+    ["result"]
+)
+
+PASSAGE_CACHE_EVICTIONS = Counter(
+    "guardrail_passage_cache_evictions_total",
+    "Passage analyses evicted from the cache",
+)
+
+PASSAGE_CACHE_BYTES = Gauge(
+    "guardrail_passage_cache_bytes",
+    "Estimated memory held by the passage analysis cache",
+)
+
+PASSAGE_CACHE_ENTRIES = Gauge(
+    "guardrail_passage_cache_entries",
+    "Passage analyses currently cached",
+)
+
+COVERAGE_SUBQUESTIONS = Counter(
+    "guardrail_coverage_subquestions_total",
+    "Coverage sub-questions by how they were decided",
+    ["decided"]
+)
+
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "guardrail_embedding_cache_lookups_total",
+    "Passage embedding cache lookups",
+    ["result"]
+)
+
+EMBEDDING_CACHE_EVICTIONS = Counter(
+    "guardrail_embedding_cache_evictions_total",
+    "Passage embeddings evicted from the cache",
+)
+
+EMBEDDING_CACHE_ENTRIES = Gauge(
+    "guardrail_embedding_cache_entries",
+    "Passage embeddings currently cached",
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "guardrail_embedding_batch_size",
+    "Texts encoded per micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+EMBEDDING_QUEUE_WAIT = Histogram(
+    "guardrail_embedding_queue_wait_seconds",
+    "Time an encode request waited before its batch started",
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 1.0)
+)
+
+EMBEDDING_MODEL_LOAD_SECONDS = Gauge(
+    "guardrail_embedding_model_load_seconds",
+    "Time spent loading and warming up the embedding model",
+)
+
+# worker counters that inline pool processes (app.inline) report back to the API
+WORKER_COUNTERS = (
+    PASSAGE_CACHE_LOOKUPS, PASSAGE_CACHE_EVICTIONS, COVERAGE_SUBQUESTIONS,
+    EMBEDDING_CACHE_LOOKUPS, EMBEDDING_CACHE_EVICTIONS, WORKER_DEADLINE_ACTIONS,
+)
+
+CounterKey = Tuple[int, Tuple[Tuple[str, str], ...]]
+
+
+def counter_values() -> Dict[CounterKey, float]:
+    """Current WORKER_COUNTERS values by (position, labels)."""
+    values = {}
+    for i, counter in enumerate(WORKER_COUNTERS):
+        for metric in counter.collect():
+            for sample in metric.samples:
+                if sample.name.endswith("_total"):
+                    values[(i, tuple(sorted(sample.labels.items())))] = sample.value
+    return values
+
+
+def counter_deltas(before: Dict[CounterKey, float]) -> List[Tuple[CounterKey, float]]:
+    """WORKER_COUNTERS increments since `before`, for apply_counter_deltas in another process."""
+    return [(key, value - before.get(key, 0.0)) for key, value in counter_values().items()
+            if value > before.get(key, 0.0)]
+
+
+def apply_counter_deltas(deltas: List[Tuple[CounterKey, float]]) -> None:
+    for (i, labels), delta in deltas:
+        counter = WORKER_COUNTERS[i]
+        (counter.labels(**dict(labels)) if labels else counter).inc(delta)
+
 
 def metrics_endpoint() -> Response:
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
+def start_worker_metrics_server(port: Optional[int]) -> bool:
+    # workers have no HTTP app; expose their process-local metrics separately
+    if not port:
+        return False
+    try:
+        start_http_server(port)
+        return True
+    except OSError:
+        return False
+
+
 class LatencyTimer:
     def __enter__(self):
         self._t0 = time.perf_counter()
+        self._t1 = None
         return self
 
     def __exit__(self, *_):
-        self.duration = time.perf_counter() - self._t0
+        self._t1 = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        # also read inside the with block, before __exit__
+        return (self._t1 or time.perf_counter()) - self._t0
 
 
 def sample_rq_gauges():
@@ -0,0 +1,93 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence
+
+from .metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_WAIT
+
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("items", "future", "enqueued_at")
+
+    def __init__(self, items: List, enqueued_at: float):
+        self.items = items
+        self.future: Future = Future()
+        self.enqueued_at = enqueued_at
+
+
+class MicroBatcher:
+    """Collects submissions for up to max_wait_ms (or max_batch items) and runs fn once.
+
+    fn maps a list of items to a same-length sequence of results; each submitter gets
+    back the slice for its own items. A single submission larger than max_batch still
+    runs as one batch.
+    """
+
+    def __init__(self, fn: Callable[[List], Sequence], max_batch: int = EMBED_MAX_BATCH,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="microbatch", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: Sequence, enqueued_at: Optional[float] = None) -> Future:
+        """enqueued_at (time.time()) lets remote callers count their transport time as queue wait."""
+        req = _Request(list(items), enqueued_at if enqueued_at is not None else time.time())
+        self._q.put(req)
+        return req.future
+
+    def close(self) -> None:
+        self._q.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            size = len(first.items)
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                batch.append(nxt)
+                size += len(nxt.items)
+            self._flush(batch, size)
+            if stop:
+                return
+
+    def _flush(self, batch: List[_Request], size: int) -> None:
+        started = time.time()
+        for req in batch:
+            EMBEDDING_QUEUE_WAIT.observe(max(0.0, started - req.enqueued_at))
+        EMBEDDING_BATCH_SIZE.observe(size)
+        try:
+            results = self.fn([item for req in batch for item in req.items])
+        except Exception as e:
+            for req in batch:
+                req.future.set_exception(e)
+            return
+        start = 0
+        for req in batch:
+            end = start + len(req.items)
+            req.future.set_result(results[start:end])
+            start = end
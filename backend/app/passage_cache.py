@@ -0,0 +1,182 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Tuple
+import numpy as np
+
+from .metrics import PASSAGE_CACHE_LOOKUPS, PASSAGE_CACHE_EVICTIONS, PASSAGE_CACHE_BYTES, PASSAGE_CACHE_ENTRIES
+from .text_utils import normalize, ngrams, split_sentences
+from .vocab import Vocabulary
+
+PASSAGE_CACHE_MAX_BYTES = int(
+    os.getenv("PASSAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PASSAGE_CACHE_MAX_ENTRIES = int(
+    os.getenv("PASSAGE_CACHE_MAX_ENTRIES", "20000"))
+# token ids are interned per cache; past this many distinct tokens the cache starts over
+# with a fresh vocabulary so ids for evicted passages do not pile up
+PASSAGE_CACHE_MAX_VOCAB = int(
+    os.getenv("PASSAGE_CACHE_MAX_VOCAB", "500000"))
+
+# truth.ngram_overlap_score matches hashed token-id n-grams (app.fingerprint) by default;
+# NGRAM_FINGERPRINTS=false switches back to string n-gram sets.
+NGRAM_FINGERPRINTS = os.getenv("NGRAM_FINGERPRINTS", "true").lower() == "true"
+# string n-gram sizes kept per passage: 3 (falling back to 2/1 on short answers) for the
+# string path, only the unigram set (coverage, repair) for fingerprints
+NGRAM_SIZES = (1,) if NGRAM_FINGERPRINTS else (1, 2, 3)
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+@dataclass(frozen=True, eq=False)
+class PassageAnalysis:
+    """Everything derived from one passage text; shared by every job that sends it."""
+    key: bytes
+    normalized: str
+    tokens: Tuple[str, ...]
+    token_ids: np.ndarray       # ids into vocab
+    vocab: Vocabulary
+    terms: Tuple[str, ...]
+    term_counts: np.ndarray
+    ngrams: Mapping[int, FrozenSet[str]]
+    sentences: Tuple[str, ...]
+    nbytes: int
+
+    @property
+    def token_set(self) -> FrozenSet[str]:
+        return self.ngrams[1]
+
+
+def _estimate_nbytes(normalized: str, sentences: Tuple[str, ...], grams: Dict[int, FrozenSet[str]],
+                     arrays: Tuple[np.ndarray, ...]) -> int:
+    size = sys.getsizeof(normalized) + sum(sys.getsizeof(s) for s in sentences)
+    for gs in grams.values():
+        size += sys.getsizeof(gs) + sum(sys.getsizeof(g) for g in gs)
+    # tokens/terms tuples point at the unigram strings counted above
+    size += sum(a.nbytes for a in arrays) + 16 * len(grams[1])
+    return size
+
+
+def analyze_text(text: str, key: bytes = None, vocab: Vocabulary = None) -> PassageAnalysis:
+    if vocab is None:
+        vocab = Vocabulary()
+    normalized = normalize(text)
+    toks = normalized.split()
+    counts: Dict[str, int] = {}
+    for t in toks:
+        counts[t] = counts.get(t, 0) + 1
+    grams = {n: frozenset(ngrams(toks, n)) for n in NGRAM_SIZES}
+    sentences = tuple(split_sentences(text))
+    token_ids = vocab.ids(toks)
+    term_counts = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    return PassageAnalysis(
+        key=key if key is not None else text_key(text),
+        normalized=normalized,
+        tokens=tuple(toks),
+        token_ids=token_ids,
+        vocab=vocab,
+        terms=tuple(counts),
+        term_counts=term_counts,
+        ngrams=MappingProxyType(grams),
+        sentences=sentences,
+        nbytes=_estimate_nbytes(normalized, sentences, grams, (token_ids, term_counts)),
+    )
+
+
+class PassageCache:
+    """Bounded LRU of PassageAnalysis keyed by a hash of the passage text."""
+
+    def __init__(self, max_bytes: int = PASSAGE_CACHE_MAX_BYTES, max_entries: int = PASSAGE_CACHE_MAX_ENTRIES,
+                 max_vocab: int = PASSAGE_CACHE_MAX_VOCAB):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_vocab = max_vocab
+        self.vocab = Vocabulary()
+        self._entries: "OrderedDict[bytes, PassageAnalysis]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def get(self, text: str) -> PassageAnalysis:
+        if not self.enabled:
+            analysis = analyze_text(text, vocab=self.vocab)
+            self._check_vocab()
+            return analysis
+        key = text_key(text)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+        if hit is not None:
+            PASSAGE_CACHE_LOOKUPS.labels(result="hit").inc()
+            return hit
+
+        PASSAGE_CACHE_LOOKUPS.labels(result="miss").inc()
+        analysis = analyze_text(text, key, self.vocab)
+        if not self._check_vocab():
+            self._put(analysis)
+        return analysis
+
+    def _check_vocab(self) -> bool:
+        """Start over with a fresh vocabulary once it outgrows max_vocab."""
+        with self._lock:
+            if len(self.vocab) <= self.max_vocab:
+                return False
+            # cached ids all point into the old vocabulary, so they go with it
+            evicted = len(self._entries)
+            self._reset()
+        if evicted:
+            PASSAGE_CACHE_EVICTIONS.inc(evicted)
+        return True
+
+    def _put(self, analysis: PassageAnalysis) -> None:
+        if analysis.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            # a concurrent reset swapped the vocabulary after this analysis was built
+            if analysis.vocab is not self.vocab or analysis.key in self._entries:
+                return
+            self._entries[analysis.key] = analysis
+            self._bytes += analysis.nbytes
+            evicted = 0
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.nbytes
+                evicted += 1
+            PASSAGE_CACHE_BYTES.set(self._bytes)
+            PASSAGE_CACHE_ENTRIES.set(len(self._entries))
+        if evicted:
+            PASSAGE_CACHE_EVICTIONS.inc(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def _reset(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        self.vocab = Vocabulary()
+        PASSAGE_CACHE_BYTES.set(0)
+        PASSAGE_CACHE_ENTRIES.set(0)
+
+
+_passage_cache = PassageCache()
+
+
+def get_passage_cache() -> PassageCache:
+    return _passage_cache
@@ -1,10 +1,11 @@
 from dataclasses import dataclass
-from typing import Literal, Tuple
+from typing import Dict, Literal, Tuple
 import yaml
 from pathlib import Path
 
 Route = Literal["allow", "repair", "block"]
-RetrieverMode = Literal["hybrid", "bm25", "tfidf"]
+RetrieverMode = Literal["hybrid", "bm25", "tfidf", "hybrid_sparse", "bm25_sparse"]
+IdfScope = Literal["request", "corpus"]
 
 
 @dataclass
@@ -21,6 +22,19 @@ class RepairCfg:
     max_sentences: int
     add_missing_parts: bool
     add_citations: bool
+    target_unsupported: bool
+    min_sentence_support: float
+
+
+@dataclass
+class CorpusCfg:
+    idf: IdfScope
+
+
+@dataclass
+class SafetyCfg:
+    lexicon: str
+    category_weights: Dict[str, float]
 
 
 @dataclass
@@ -30,6 +44,8 @@ class Policy:
     on_low_faithfulness: Route
     on_low_coverage: Route
     repair: RepairCfg
+    corpus: CorpusCfg
+    safety: SafetyCfg
 
 
 def load_policy(path: str | Path = None) -> Policy:
@@ -42,6 +58,11 @@ def load_policy(path: str | Path = None) -> Policy:
     thr = data["thresholds"]
     routes = data["routes"]
     r = data["repair"]
+    c = data.get("corpus") or {}
+    sf = data.get("safety") or {}
+    lexicon = Path(sf.get("lexicon", "lexicons/default.tsv"))
+    if not lexicon.is_absolute():
+        lexicon = Path(path).parent / lexicon
     return Policy(
         thresholds=Thresholds(
             faithfulness_min=float(thr["faithfulness_min"]),
@@ -57,6 +78,16 @@ def load_policy(path: str | Path = None) -> Policy:
             max_sentences=int(r.get("max_sentences", 4)),
             add_missing_parts=bool(r.get("add_missing_parts", True)),
             add_citations=bool(r.get("add_citations", True)),
+            target_unsupported=bool(r.get("target_unsupported", False)),
+            min_sentence_support=float(r.get("min_sentence_support", 0.5)),
+        ),
+        corpus=CorpusCfg(
+            idf=c.get("idf", "request"),
+        ),
+        safety=SafetyCfg(
+            lexicon=str(lexicon),
+            category_weights={k: float(v) for k, v in
+                              (sf.get("category_weights") or {"profanity": 0.04}).items()},
         ),
     )
 
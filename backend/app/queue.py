@@ -1,6 +1,73 @@
+import os
+from typing import Optional
 from redis import Redis
 from rq import Queue
+from rq.job import Job
+from .codec import decode, encode
 from .config import settings
 
 _redis = Redis.from_url(settings.REDIS_URL)
 q = Queue("eval", connection=_redis)
+
+# deferred repairs; workers listen on "eval repair" so evaluations are served first
+REPAIR_QUEUE = "repair"
+
+# Workers push each finished /evaluate job's outcome here (RQ on_success/on_failure
+# callbacks) and the API pops it, instead of polling job.refresh(). The job id is
+# also published on DONE_CHANNEL, which wakes the API's waiters (app.async_queue).
+DONE_KEY_PREFIX = "guardrail:done:"
+DONE_CHANNEL = "guardrail:done"
+DONE_TTL_SEC = int(os.getenv("DONE_TTL_SEC", "60"))
+
+
+def get_redis() -> Redis:
+    return _redis
+
+
+def done_key(job_id: str) -> str:
+    return f"{DONE_KEY_PREFIX}{job_id}"
+
+
+def encode_notice(body: dict) -> bytes:
+    # a result from an encoded job entry point is a codec frame already; it rides along as bytes
+    return encode(body, compress=False)
+
+
+def read_notice(raw: bytes) -> dict:
+    body = decode(raw)
+    if "result" in body:
+        body["result"] = decode_result(body["result"])
+    return body
+
+
+def decode_result(value):
+    return decode(value) if isinstance(value, bytes) else value
+
+
+def _push_done(connection: Redis, job_id: str, body: dict) -> None:
+    key = done_key(job_id)
+    with connection.pipeline() as pipe:
+        pipe.lpush(key, encode_notice(body))
+        # nobody is waiting any more if the API already timed out
+        pipe.expire(key, DONE_TTL_SEC)
+        pipe.publish(DONE_CHANNEL, job_id)
+        pipe.execute()
+
+
+def notify_success(job: Job, connection: Redis, result, *args, **kwargs) -> None:
+    # callbacks run before RQ stores the result, so the result travels with the notice
+    _push_done(connection, job.id, {"status": "finished", "result": result})
+
+
+def notify_failure(job: Job, connection: Redis, *exc_info, **kwargs) -> None:
+    _push_done(connection, job.id, {"status": "failed"})
+
+
+def job_outcome(job: Job) -> Optional[dict]:
+    """The outcome from the job itself, for when no notice came (e.g. the callback failed)."""
+    job.refresh()
+    if job.is_finished:
+        return {"status": "finished", "result": decode_result(job.return_value())}
+    if job.is_failed:
+        return {"status": "failed"}
+    return None
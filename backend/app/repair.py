@@ -1,15 +1,13 @@
-import re
-from typing import List, Dict
-from .coverage import decompose
-from .retrieval import top_ids, pick_passages
-from .text_utils import normalize
-
-_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+from typing import List, Dict, Sequence, Tuple
+from .coverage import CoveragePlan, decompose
+from .index import PassageIndex, build_index
+from .retrieval import fused_rank_many, top_ids, split_mode
+from .text_utils import normalize, split_sentences
+from .truth import sentence_support
 
 
 def _first_sentences(text: str, n: int) -> List[str]:
-    sents = _SENT_SPLIT.split(text.strip())
-    return [s for s in sents if s][:n]
+    return split_sentences(text)[:n]
 
 
 def _format_citation(p: Dict) -> str:
@@ -18,11 +16,15 @@ def _format_citation(p: Dict) -> str:
     return f"[{src}:{pid}]"
 
 
-def summarize_from_passages(passages: List[Dict], max_sentences: int, add_citations: bool) -> str:
+def summarize_from_passages(passages: List[Dict], max_sentences: int, add_citations: bool,
+                            sentences: List[Sequence[str]] = None) -> str:
     chosen: List[str] = []
-    for p in passages:
-        sents = _first_sentences(p.get("text", ""), max(
-            1, max_sentences - len(chosen)))
+    for i, p in enumerate(passages):
+        limit = max(1, max_sentences - len(chosen))
+        if sentences is not None:
+            sents = sentences[i][:limit]
+        else:
+            sents = _first_sentences(p.get("text", ""), limit)
         for s in sents:
             if not s:
                 continue
@@ -36,6 +38,24 @@ def summarize_from_passages(passages: List[Dict], max_sentences: int, add_citati
     return " ".join(chosen).strip()
 
 
+def _fused_support(question: str, gaps: List[str], index: PassageIndex, top_k: int, sub_k: int,
+                   plan: CoveragePlan = None,
+                   known: Dict[str, List[int]] = None) -> Tuple[List[List[int]], Dict[str, List[int]]]:
+    """Fused top ids for the question (top_k) and each gap (sub_k) in one batched ranking.
+
+    Gaps coverage already ranked deep enough, or found in `known` (rankings at least
+    sub_k deep), reuse those ids: a shorter fused ranking is always a prefix of a longer
+    one. Also returns the gaps ranked here, max(top_k, sub_k) deep, to pass as `known`.
+    """
+    reuse = dict(plan.ranked_ids(sub_k)) if plan is not None else {}
+    reuse.update(known or {})
+    todo = [question] + [g for g in dict.fromkeys(gaps) if g not in reuse]
+    ranked = fused_rank_many(todo, index, top_k=max(top_k, sub_k))
+    fresh = dict(zip(todo[1:], ranked[1:]))
+    ids = [ranked[0][:top_k]] + [(fresh[g] if g in fresh else reuse[g])[:sub_k] for g in gaps]
+    return ids, fresh
+
+
 def repair_answer(
     question: str,
     answer: str,
@@ -46,32 +66,60 @@ def repair_answer(
     add_missing_parts: bool = True,
     add_citations: bool = True,
     missing_parts: List[str] = None,
+    index: PassageIndex = None,
+    target_unsupported: bool = False,
+    min_sentence_support: float = 0.5,
+    plan: CoveragePlan = None,
 ) -> str:
-    # Pull general support
-    ids_q = top_ids(question, passages, retriever_mode, top_k)
-    support = pick_passages(passages, ids_q)
+    if index is None:
+        index = build_index(passages, bm25_engine=split_mode(retriever_mode)[1])
+    if missing_parts is None and plan is not None:
+        missing_parts = plan.missing
+
+    merged_ids: List[int] = []
+    unsupported: List[str] = []
+    if target_unsupported:
+        # ground the answer's own weak sentences first
+        for s in sentence_support(answer, passages, index):
+            if s.support < min_sentence_support:
+                unsupported.append(s.sentence)
+                ids_s = top_ids(s.sentence, passages, retriever_mode, max(1, top_k // 2), index)
+                merged_ids.extend(i for i in ids_s if 0 <= i < len(index) and i not in merged_ids)
 
-    augment: List[Dict] = []
-    missing_list = missing_parts or []
+    missing_list = list(missing_parts or [])
+    gaps: List[str] = []
     if add_missing_parts:
-        subs = decompose(question)
+        subs = [sq.text for sq in plan.subquestions] if plan is not None else decompose(question)
         ans_norm = normalize(answer)
-        for sub in subs:
-            if sub not in ans_norm:
-                missing_list.append(sub)
-                ids_sub = top_ids(sub, passages, retriever_mode,
-                                  max(1, top_k // 2) or 1)
-                augment.extend(pick_passages(passages, ids_sub))
-
-    merged = support + augment
-    if not merged:
+        gaps = [sub for sub in subs if sub not in ans_norm]
+        missing_list.extend(gaps)
+
+    # Pull general support, then a few passages per sub-question the answer skips
+    sub_k = max(1, top_k // 2)
+    if split_mode(retriever_mode)[0] == "hybrid":
+        ranked, _ = _fused_support(question, gaps, index, top_k, sub_k, plan)
+    else:
+        ranked = [top_ids(question, passages, retriever_mode, top_k, index)] + \
+                 [top_ids(sub, passages, retriever_mode, sub_k, index) for sub in gaps]
+    for ids in ranked:
+        merged_ids.extend(i for i in ids if 0 <= i < len(index))
+
+    if not merged_ids:
         return answer
 
     stitched = summarize_from_passages(
-        merged, max_sentences=max_sentences, add_citations=add_citations)
+        [index.passages[i] for i in merged_ids], max_sentences=max_sentences,
+        add_citations=add_citations,
+        sentences=[index.analyses[i].sentences for i in merged_ids])
 
     if stitched and stitched not in answer:
         repair_section = ["\n\n**Auto-repair applied:**\n"]
+
+        if unsupported:
+            repair_section.append("**Unsupported claims:**\n")
+            for sent in unsupported[:5]:
+                repair_section.append(f"  • {sent}\n")
+            repair_section.append("\n")
         
         if missing_list:
             repair_section.append("**Missing parts identified:**\n")
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .async_queue import get_async_redis
+from .embeddings import USE_SEMANTIC_FAITHFULNESS
+from .metrics import RESULT_CACHE_HIT_RATIO, RESULT_CACHE_LOOKUPS
+from .passage_cache import NGRAM_FINGERPRINTS
+from .schemas import EvaluateRequest
+from .version import get_lexicon_hash, get_policy_hash
+
+# Worker results of byte-identical /evaluate payloads (gateway retries, repeated FAQ
+# questions), so they are answered without a job. Off (0) unless a TTL is set.
+RESULT_CACHE_TTL_SEC = int(os.getenv("RESULT_CACHE_TTL_SEC", "0"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "100000"))
+RESULT_CACHE_L1_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_L1_MAX_ENTRIES", "1024"))
+
+RESULT_KEY_PREFIX = "guardrail:result:"
+# payload keys by insertion time, trimmed to RESULT_CACHE_MAX_ENTRIES
+RESULT_INDEX_KEY = "guardrail:result-index"
+IDEMPOTENCY_KEY_PREFIX = "guardrail:idempotency:"
+
+
+def scoring_hash(policy_hash: str) -> str:
+    """Everything besides the payload that changes a result: policy, lexicon, scorer flags."""
+    return (f"{policy_hash}:{get_lexicon_hash()}"
+            f":semantic={int(USE_SEMANTIC_FAITHFULNESS)}:fingerprints={int(NGRAM_FINGERPRINTS)}")
+
+
+def payload_key(payload: dict, policy_hash: str) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{policy_hash}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Two tiers: a per-process LRU (L1) in front of Redis, both expiring after `ttl`.
+
+    An Idempotency-Key also records the result it was answered with, kept for `ttl` apart
+    from the size-bounded entries, so a retry gets the same response (including the
+    same deferred repair_id). Reusing the key for another payload is rejected.
+    """
+
+    def __init__(self, ttl: int = RESULT_CACHE_TTL_SEC, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 l1_max_entries: int = RESULT_CACHE_L1_MAX_ENTRIES, policy_hash: str = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.l1_max_entries = l1_max_entries
+        self.policy_hash = policy_hash or get_policy_hash()
+        self.scoring_hash = scoring_hash(self.policy_hash)
+        self._l1: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.lookups = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def key(self, req: EvaluateRequest) -> str:
+        return payload_key(req.model_dump(), self.scoring_hash)
+
+    def _l1_get(self, key: str) -> Optional[dict]:
+        hit = self._l1.get(key)
+        if hit is None:
+            return None
+        expires, result = hit
+        if expires < time.monotonic():
+            del self._l1[key]
+            return None
+        self._l1.move_to_end(key)
+        return result
+
+    def _l1_put(self, key: str, result: dict) -> None:
+        if self.l1_max_entries <= 0:
+            return
+        self._l1[key] = (time.monotonic() + self.ttl, result)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_max_entries:
+            self._l1.popitem(last=False)
+
+    def _count(self, tier: str) -> None:
+        self.lookups += 1
+        if tier != "miss":
+            self.hits += 1
+            RESULT_CACHE_LOOKUPS.labels(result="hit", tier=tier).inc()
+        else:
+            RESULT_CACHE_LOOKUPS.labels(result="miss", tier="none").inc()
+        RESULT_CACHE_HIT_RATIO.set(self.hits / self.lookups)
+
+    async def get(self, key: str, idempotency_key: Optional[str] = None) -> Optional[dict]:
+        return (await self.get_many([key], idempotency_key))[0]
+
+    async def get_many(self, keys: List[str], idempotency_key: Optional[str] = None) -> List[Optional[dict]]:
+        """Cached results for `keys`, None where missing; Redis is asked once for all L1 misses."""
+        if not self.enabled:
+            return [None] * len(keys)
+        found = {}
+        tiers = {}
+        try:
+            if idempotency_key:
+                raw = await get_async_redis().get(IDEMPOTENCY_KEY_PREFIX + idempotency_key)
+                if raw is not None:
+                    record = json.loads(raw)
+                    if record["key"] != keys[0] or len(keys) != 1:
+                        raise HTTPException(
+                            status_code=422, detail="Idempotency-Key was already used for a different payload")
+                    found[keys[0]], tiers[keys[0]] = record["result"], "idempotency"
+            for key in keys:
+                if key not in found:
+                    result = self._l1_get(key)
+                    if result is not None:
+                        found[key], tiers[key] = result, "l1"
+            missing = [key for key in keys if key not in found]
+            if missing:
+                raws = await get_async_redis().mget([RESULT_KEY_PREFIX + key for key in missing])
+                for key, raw in zip(missing, raws):
+                    if raw is not None:
+                        found[key], tiers[key] = json.loads(raw), "redis"
+                        self._l1_put(key, found[key])
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.warning(f"Result cache lookup failed: {e}")
+        for key in keys:
+            self._count(tiers.get(key, "miss"))
+        return [found.get(key) for key in keys]
+
+    async def put(self, key: str, result: dict, idempotency_key: Optional[str] = None) -> None:
+        await self.put_many([(key, result)], idempotency_key)
+
+    async def put_many(self, items: List[Tuple[str, dict]], idempotency_key: Optional[str] = None) -> None:
+        if not self.enabled or not items:
+            return
+        for key, result in items:
+            self._l1_put(key, result)
+        now = time.time()
+        try:
+            redis = get_async_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                for key, result in items:
+                    pipe.set(RESULT_KEY_PREFIX + key, json.dumps(result), ex=self.ttl)
+                if idempotency_key:
+                    key, result = items[0]
+                    pipe.set(IDEMPOTENCY_KEY_PREFIX + idempotency_key,
+                             json.dumps({"key": key, "result": result}), ex=self.ttl)
+                pipe.zadd(RESULT_INDEX_KEY, {key: now for key, _ in items})
+                pipe.zremrangebyscore(RESULT_INDEX_KEY, "-inf", now - self.ttl)
+                pipe.zcard(RESULT_INDEX_KEY)
+                size = (await pipe.execute())[-1]
+            if size > self.max_entries:
+                evicted = await redis.zpopmin(RESULT_INDEX_KEY, size - self.max_entries)
+                await redis.delete(*[RESULT_KEY_PREFIX + key.decode() for key, _ in evicted])
+        except Exception as e:
+            logging.warning(f"Result cache store failed: {e}")
+
+
+_result_cache = ResultCache()
+
+
+def get_result_cache() -> ResultCache:
+    return _result_cache
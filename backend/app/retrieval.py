@@ -1,36 +1,45 @@
-from typing import List, Tuple, Dict
-from rank_bm25 import BM25Okapi
-from sklearn.feature_extraction.text import TfidfVectorizer
+from typing import List, Tuple, Dict, Optional
 import numpy as np
 
+from .bm25 import SparseBM25
+from .index import PassageIndex, build_index
 from .text_utils import normalize, tokens
 
 
-def _prep_corpus(passages: List[Dict]) -> Tuple[List[str], List[List[str]]]:
-    docs = [normalize(p.get("text", "")) for p in passages]
-    tok_docs = [tokens(d) for d in docs]
-    return docs, tok_docs
+SPARSE_SUFFIX = "_sparse"
 
 
-def bm25_scores(query: str, passages: List[Dict]) -> List[Tuple[int, float]]:
-    docs, tok_docs = _prep_corpus(passages)
-    bm25 = BM25Okapi(tok_docs)
-    qtok = tokens(normalize(query))
-    scores = bm25.get_scores(qtok)
+def split_mode(mode: str) -> Tuple[str, str]:
+    """'hybrid_sparse' -> ('hybrid', 'sparse'); plain modes use rank_bm25."""
+    mode = (mode or "hybrid").lower()
+    if mode.endswith(SPARSE_SUFFIX):
+        return mode[:-len(SPARSE_SUFFIX)], "sparse"
+    return mode, "okapi"
+
+
+def _ensure_index(passages: List[Dict], index: Optional[PassageIndex]) -> PassageIndex:
+    return index if index is not None else build_index(passages)
+
+
+def bm25_scores(query: str, passages: List[Dict], index: PassageIndex = None) -> List[Tuple[int, float]]:
+    index = _ensure_index(passages, index)
+    if index.bm25 is None:
+        scores = np.zeros(len(index))
+    else:
+        scores = index.bm25.get_scores(tokens(query))
     order = np.argsort(scores)[::-1]
     return [(int(i), float(scores[i])) for i in order]
 
 
-def tfidf_scores(query: str, passages: List[Dict]) -> List[Tuple[int, float]]:
-    docs, _ = _prep_corpus(passages)
-    if len(docs) == 0:
+def tfidf_scores(query: str, passages: List[Dict], index: PassageIndex = None) -> List[Tuple[int, float]]:
+    index = _ensure_index(passages, index)
+    if len(index) == 0:
         return []
-    vec = TfidfVectorizer(
-        lowercase=False, preprocessor=lambda x: x, tokenizer=lambda x: x.split())
-    X = vec.fit_transform([d for d in docs])
-    q = normalize(query)
-    qv = vec.transform([q])
-    sims = (X @ qv.T).toarray().ravel()
+    if index.tfidf is None:
+        sims = np.zeros(len(index))
+    else:
+        qv = index.tfidf.transform([normalize(query)])
+        sims = (index.tfidf_matrix @ qv.T).toarray().ravel()
     order = np.argsort(sims)[::-1]
     return [(int(i), float(sims[i])) for i in order]
 
@@ -43,11 +52,12 @@ def rrf_fuse(ranklists: List[List[int]], k: int = 60) -> Dict[int, float]:
     return fused
 
 
-def fused_rank(query: str, passages: List[Dict], top_k: int = 5) -> List[int]:
+def fused_rank(query: str, passages: List[Dict], top_k: int = 5, index: PassageIndex = None) -> List[int]:
     if not passages:
         return []
-    bm = bm25_scores(query, passages)
-    tf = tfidf_scores(query, passages)
+    index = _ensure_index(passages, index)
+    bm = bm25_scores(query, passages, index)
+    tf = tfidf_scores(query, passages, index)
 
     bm_ids = [i for i, _ in bm]
     tf_ids = [i for i, _ in tf]
@@ -57,21 +67,81 @@ def fused_rank(query: str, passages: List[Dict], top_k: int = 5) -> List[int]:
     return [idx for idx, _ in order[:top_k]]
 
 
-def bm25_top_ids(query: str, passages: List[Dict], top_k: int = 5) -> List[int]:
-    return [i for i, _ in bm25_scores(query, passages)[:top_k]]
+def _bm25_matrix(queries: List[str], index: PassageIndex) -> np.ndarray:
+    if index.bm25 is None:
+        return np.zeros((len(queries), len(index)))
+    qtoks = [tokens(q) for q in queries]
+    if isinstance(index.bm25, SparseBM25):
+        return index.bm25.get_score_matrix(qtoks)
+    return np.vstack([index.bm25.get_scores(t) for t in qtoks])
 
 
-def tfidf_top_ids(query: str, passages: List[Dict], top_k: int = 5) -> List[int]:
-    return [i for i, _ in tfidf_scores(query, passages)[:top_k]]
+def _tfidf_matrix(queries: List[str], index: PassageIndex) -> np.ndarray:
+    if index.tfidf is None:
+        return np.zeros((len(queries), len(index)))
+    Q = index.tfidf.transform([normalize(q) for q in queries])
+    return (Q @ index.tfidf_matrix.T).toarray()
 
 
-def top_ids(query: str, passages: List[Dict], mode: str = "hybrid", top_k: int = 5) -> List[int]:
-    mode = (mode or "hybrid").lower()
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    # 1-based rank of each doc, same tie order as argsort(...)[::-1] per row
+    order = np.argsort(scores, axis=1)[:, ::-1]
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, scores.shape[1] + 1)[None, :], axis=1)
+    return ranks
+
+
+def fused_rank_many(queries: List[str], index: PassageIndex, top_k: int = 5, k: int = 60) -> List[List[int]]:
+    """fused_rank for every query in one pass over the index.
+
+    RRF ties resolve by BM25 rank, matching the stable sort in fused_rank.
+    """
+    n_docs = len(index)
+    if not queries:
+        return []
+    if n_docs == 0 or top_k <= 0:
+        return [[] for _ in queries]
+
+    bm_rank = _ranks(_bm25_matrix(queries, index))
+    tf_rank = _ranks(_tfidf_matrix(queries, index))
+    neg_fused = -(1.0 / (k + bm_rank) + 1.0 / (k + tf_rank))
+
+    if top_k >= n_docs:
+        return np.lexsort((bm_rank, neg_fused), axis=1).tolist()
+
+    part = np.argpartition(neg_fused, top_k - 1, axis=1)[:, :top_k]
+    kth = np.take_along_axis(neg_fused, part, axis=1).max(axis=1, keepdims=True)
+    exact = (neg_fused <= kth).sum(axis=1) == top_k
+
+    out = np.empty((len(queries), top_k), dtype=np.int64)
+    if exact.any():
+        cand = part[exact]
+        order = np.lexsort((np.take_along_axis(bm_rank[exact], cand, axis=1),
+                            np.take_along_axis(neg_fused[exact], cand, axis=1)), axis=1)
+        out[exact] = np.take_along_axis(cand, order, axis=1)
+    if not exact.all():
+        # fused ties straddle the top-k boundary: settle them with a full sort
+        rest = ~exact
+        out[rest] = np.lexsort((bm_rank[rest], neg_fused[rest]), axis=1)[:, :top_k]
+    return out.tolist()
+
+
+def bm25_top_ids(query: str, passages: List[Dict], top_k: int = 5, index: PassageIndex = None) -> List[int]:
+    return [i for i, _ in bm25_scores(query, passages, index)[:top_k]]
+
+
+def tfidf_top_ids(query: str, passages: List[Dict], top_k: int = 5, index: PassageIndex = None) -> List[int]:
+    return [i for i, _ in tfidf_scores(query, passages, index)[:top_k]]
+
+
+def top_ids(query: str, passages: List[Dict], mode: str = "hybrid", top_k: int = 5,
+            index: PassageIndex = None) -> List[int]:
+    mode, _ = split_mode(mode)
     if mode == "bm25":
-        return bm25_top_ids(query, passages, top_k)
+        return bm25_top_ids(query, passages, top_k, index)
     if mode == "tfidf":
-        return tfidf_top_ids(query, passages, top_k)
-    return fused_rank(query, passages, top_k)
+        return tfidf_top_ids(query, passages, top_k, index)
+    return fused_rank(query, passages, top_k, index)
 
 
 def pick_passages(passages: List[Dict], ids: List[int]) -> List[Dict]:
@@ -1,22 +1,40 @@
-import re
+from typing import Dict, Iterable, List
 
-# Very small, conservative list for demo. Expand later.
-PROFANE = {"damn", "shit", "bastard"}  # demo only
+from .lexicon import Lexicon, LexiconMatch
+from .pii import pii_kinds
+from .policy import SafetyCfg, load_policy
 
-EMAIL_RE = re.compile(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", re.I)
-PHONE_RE = re.compile(
-    r"\b(?:\+?1[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)?\d{3}[-.\s]?\d{4}\b")
-SSN_RE = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
+_LEXICON: Lexicon = None
 
 
-def toxicity_score(text: str) -> float:
+def load_lexicon(cfg: SafetyCfg) -> Lexicon:
+    return Lexicon.from_file(cfg.lexicon, cfg.category_weights)
+
+
+def get_lexicon() -> Lexicon:
+    global _LEXICON
+    if _LEXICON is None:
+        _LEXICON = load_lexicon(load_policy().safety)
+    return _LEXICON
+
+
+def lexicon_matches(text: str, lexicon: Lexicon = None) -> List[LexiconMatch]:
+    return (lexicon if lexicon is not None else get_lexicon()).scan(text)
+
+
+def combine_toxicity(kinds: Iterable[str], categories: Dict[str, float]) -> float:
+    """Score from the PII kinds and lexicon category weights found in a text."""
     score = 0.0
-    if EMAIL_RE.search(text):
+    if "email" in kinds:
         score += 0.04
-    if PHONE_RE.search(text):
+    if "phone" in kinds:
         score += 0.04
-    if SSN_RE.search(text):
+    if "ssn" in kinds:
         score += 0.08
-    if any(bad in text.lower() for bad in PROFANE):
-        score += 0.04
+    score += sum(categories.values())
     return min(1.0, round(score, 4))
+
+
+def toxicity_score(text: str, lexicon: Lexicon = None) -> float:
+    lexicon = lexicon if lexicon is not None else get_lexicon()
+    return combine_toxicity(pii_kinds(text), lexicon.categories(lexicon.scan(text)))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 
 
 class Passage(BaseModel):
@@ -12,6 +12,23 @@ class EvaluateRequest(BaseModel):
     question: str
     answer: str
     passages: List[Passage] = Field(default_factory=list)
+    corpus_id: Optional[str] = None
+    passage_ids: List[str] = Field(default_factory=list)
+    defer_repair: bool = False  # return before repair; fetch it from /repairs/{meta.repair_id}
+    callback_url: Optional[str] = None  # POSTed the /repairs result when a deferred repair ends
+
+
+class CorpusCreateRequest(BaseModel):
+    name: Optional[str] = None
+    passages: List[Passage]
+
+
+class CorpusInfo(BaseModel):
+    corpus_id: str
+    name: str = ""
+    passage_count: int
+    size_bytes: int
+    created_at: str
 
 
 class Scores(BaseModel):
@@ -26,3 +43,23 @@ class EvaluateResponse(BaseModel):
     repaired_answer: Optional[str] = None
     explanations: List[str] = Field(default_factory=list)
     meta: Dict[str, str] = Field(default_factory=dict)
+
+
+class RepairResult(BaseModel):
+    repair_id: str
+    status: str  # "pending" | "done" | "failed"
+    repaired_answer: Optional[str] = None
+
+
+class EvaluateBatchRequest(BaseModel):
+    items: List[Dict[str, Any]]  # /evaluate bodies, validated one by one
+
+
+class BatchItemResult(BaseModel):
+    status: int  # HTTP status /evaluate would have answered with
+    result: Optional[EvaluateResponse] = None
+    detail: Optional[Any] = None
+
+
+class EvaluateBatchResponse(BaseModel):
+    results: List[BatchItemResult]  # in request order
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import math
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from rq import Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+
+from .async_queue import get_async_redis, wait_for_job_async
+from .metrics import COALESCED_REQUESTS
+from .queue import DONE_CHANNEL, done_key, encode_notice
+
+# Identical payloads arriving together (a question going viral) share one evaluation
+# instead of each running its own job. Works without the result cache.
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+# how long the leader's done notice is kept for waiters in other API processes
+SINGLE_FLIGHT_GRACE_SEC = int(os.getenv("SINGLE_FLIGHT_GRACE_SEC", "5"))
+
+# payload key -> id of the job evaluating it, while it runs
+INFLIGHT_KEY_PREFIX = "guardrail:inflight:"
+# processes waiting on it, leader included
+FOLLOWERS_SUFFIX = ":followers"
+
+
+class SingleFlight:
+    """Coalesces identical in-flight evaluations.
+
+    Within a process, followers await the leader's future. Across processes, the leader
+    of a queued evaluation claims a Redis marker naming its job before enqueueing it;
+    followers elsewhere wait on that job's done notice, which the leader reads without
+    popping.
+    """
+
+    def __init__(self, enabled: bool = SINGLE_FLIGHT, grace: int = SINGLE_FLIGHT_GRACE_SEC):
+        self.enabled = enabled
+        self.grace = grace
+        self._local: Dict[str, asyncio.Future] = {}
+
+    async def _claim(self, key: str, job_id: str, timeout: float) -> Optional[str]:
+        """None if this process now leads `key`, else the job id of the current leader."""
+        marker = INFLIGHT_KEY_PREFIX + key
+        ttl = max(1, math.ceil(timeout))
+        async with get_async_redis().pipeline(transaction=True) as pipe:
+            pipe.set(marker, job_id, nx=True, ex=ttl)
+            pipe.get(marker)
+            # counted in the same transaction, so the leader's release sees every follower
+            pipe.incr(marker + FOLLOWERS_SUFFIX)
+            pipe.expire(marker + FOLLOWERS_SUFFIX, ttl)
+            _, holder, _, _ = await pipe.execute()
+        holder = holder.decode() if holder is not None else job_id
+        return None if holder == job_id else holder
+
+    async def _release(self, key: str, job_id: str, failed: bool) -> None:
+        marker = INFLIGHT_KEY_PREFIX + key
+        try:
+            redis = get_async_redis()
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(marker)
+                pipe.get(marker + FOLLOWERS_SUFFIX)
+                pipe.delete(marker + FOLLOWERS_SUFFIX)
+                _, count, _ = await pipe.execute()
+            async with redis.pipeline(transaction=False) as pipe:
+                if int(count or 0) <= 1:
+                    # nobody else is waiting, so the notice goes as a consumed one would
+                    pipe.delete(done_key(job_id))
+                else:
+                    if failed:
+                        # nothing else will notify the followers (e.g. it was never enqueued)
+                        pipe.lpush(done_key(job_id), encode_notice({"status": "failed"}))
+                        pipe.publish(DONE_CHANNEL, job_id)
+                    pipe.expire(done_key(job_id), self.grace)
+                await pipe.execute()
+        except Exception as e:
+            logging.warning(f"Single-flight release failed: {e}")
+
+    async def run(self, key: str, timeout: float, evaluate: Callable[[Optional[str]], Awaitable[Optional[dict]]],
+                  queue: Optional[Queue] = None) -> Tuple[bool, Optional[dict]]:
+        """(coalesced, outcome) for `key`, running evaluate(job_id) only if nobody else is.
+
+        Outcomes are those of wait_for_job_async(). With `queue`, the evaluation is shared
+        with other processes: evaluate() must enqueue under `job_id` and wait without
+        consuming the notice. Without it (inline evaluations), job_id is None.
+        """
+        if not self.enabled:
+            return False, await evaluate(None)
+        loop = asyncio.get_running_loop()
+        leader = self._local.get(key)
+        if leader is not None and leader.get_loop() is loop:
+            COALESCED_REQUESTS.labels(scope="process").inc()
+            try:
+                return True, await asyncio.wait_for(asyncio.shield(leader), timeout)
+            except asyncio.TimeoutError:
+                return True, None
+
+        fut = self._local[key] = loop.create_future()
+        claimed = None
+        # what followers get if this raises (e.g. the enqueue failed)
+        done = {"status": "failed"}
+        raised = True
+        try:
+            job_id = None
+            if queue is not None:
+                job_id = str(uuid.uuid4())
+                try:
+                    holder = await self._claim(key, job_id, timeout)
+                except Exception as e:
+                    logging.warning(f"Single-flight claim failed, evaluating alone: {e}")
+                    holder, job_id = None, None
+                if holder is not None:
+                    COALESCED_REQUESTS.labels(scope="redis").inc()
+                    try:
+                        done = await wait_for_job_async(
+                            Job(holder, connection=queue.connection), timeout, consume=False)
+                    except NoSuchJobError:
+                        done = None
+                    raised = False
+                    return True, done
+                claimed = job_id
+            done = await evaluate(job_id)
+            raised = False
+            return False, done
+        finally:
+            fut.set_result(done)
+            if self._local.get(key) is fut:
+                del self._local[key]
+            if claimed is not None:
+                await self._release(key, claimed, failed=raised)
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
@@ -0,0 +1,123 @@
+import os
+import re
+from typing import Dict, List, Set
+
+from .index import PassageIndex
+from .lexicon import Lexicon
+from .pii import PII_RE
+from .policy import Policy
+from .safety import combine_toxicity
+from .text_utils import ngrams, tokens
+
+# chars before each new chunk that are scanned again, so matches straddling a chunk
+# boundary are found; anything longer than this (a very long email) is left to the
+# final evaluation
+STREAM_SCAN_WINDOW = int(os.getenv("STREAM_SCAN_WINDOW", "256"))
+
+_UP_TO_LAST_NONWORD = re.compile(r".*\W", re.S)
+
+
+class StreamState:
+    """Running checks over an answer that arrives in chunks.
+
+    toxicity() only counts PII and lexicon matches followed by at least one received
+    character: more text can extend or break a match touching the end (a phone number
+    still arriving, "damn" becoming "damnation"). So it never exceeds toxicity_score()
+    of the finished answer, and an early block is always confirmed by the final
+    decision. faithfulness() is the n-gram overlap score of the tokens completed so
+    far, computed incrementally against the passage index.
+    """
+
+    def __init__(self, index: PassageIndex, lexicon: Lexicon, window: int = STREAM_SCAN_WINDOW):
+        self.index = index
+        self.lexicon = lexicon
+        self.window = window
+        self.pii_kinds: Set[str] = set()
+        self.categories: Dict[str, float] = {}
+        self.nbytes = 0
+        self._parts: List[str] = []
+        self._recent = ""
+        self._pending = ""
+
+        self._ctx3 = index.context_ngrams(3)
+        self._ctx1 = index.context_ngrams(1)
+        self._head: List[str] = []
+        self._tail: List[str] = []
+        self._trigrams: Set[str] = set()
+        self._trigram_hits = 0
+        self._unigrams: Set[str] = set()
+        self._unigram_hits = 0
+        self.n_tokens = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        self.nbytes += len(chunk.encode("utf-8"))
+
+        # one char ahead of the rescanned window gives \b and lexicon boundaries their context
+        keep = self._recent[-(self.window + 1):]
+        recent = keep + chunk
+        start = 1 if len(keep) > self.window else 0
+        for m in PII_RE.finditer(recent, start):
+            if m.end() < len(recent):
+                self.pii_kinds.add(m.lastgroup)
+        for m in self.lexicon.scan(recent, start):
+            if m.end < len(recent):
+                self.categories[m.category] = self.lexicon.weights.get(m.category, 0.0)
+        self._recent = recent
+
+        # tokens end at a non-word char; a trailing partial word waits for the next chunk
+        self._pending += chunk
+        m = _UP_TO_LAST_NONWORD.match(self._pending)
+        if m:
+            self._add_tokens(tokens(self._pending[:m.end()]))
+            self._pending = self._pending[m.end():]
+
+    def finish(self) -> str:
+        """Settle the trailing word and return the full answer."""
+        self._add_tokens(tokens(self._pending))
+        self._pending = ""
+        return self.text
+
+    def _add_tokens(self, toks: List[str]) -> None:
+        for t in toks:
+            if len(self._head) < 2:
+                self._head.append(t)
+            if t not in self._unigrams:
+                self._unigrams.add(t)
+                self._unigram_hits += t in self._ctx1
+            self._tail.append(t)
+            if len(self._tail) == 3:
+                gram = " ".join(self._tail)
+                if gram not in self._trigrams:
+                    self._trigrams.add(gram)
+                    self._trigram_hits += gram in self._ctx3
+                del self._tail[0]
+            self.n_tokens += 1
+
+    def toxicity(self) -> float:
+        return combine_toxicity(self.pii_kinds, self.categories)
+
+    def faithfulness(self) -> float:
+        """truth.ngram_overlap_score over the tokens seen so far (without fingerprints)."""
+        if not self.n_tokens:
+            return 0.0
+        if self.n_tokens < 3:
+            n = len(self._head)
+            grams = set(ngrams(self._head, n))
+            score = len(grams & self.index.context_ngrams(n)) / len(grams)
+        else:
+            score = self._trigram_hits / len(self._trigrams)
+        unigram_score = self._unigram_hits / len(self._unigrams)
+        mixed = 0.7 * score + 0.3 * unigram_score
+        return max(0.0, min(1.0, round(mixed, 4)))
+
+    def should_block(self, policy: Policy) -> bool:
+        # same rounding as the worker applies before route_decision
+        return (policy.on_toxicity == "block"
+                and round(self.toxicity(), 2) >= policy.thresholds.toxicity_max)
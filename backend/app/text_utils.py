@@ -3,6 +3,7 @@ from typing import List
 
 _ws = re.compile(r"\s+")
 _punct = re.compile(r"[^\w\s]")
+_sent_split = re.compile(r"(?<=[.!?])\s+")
 
 
 def normalize(text: str) -> str:
@@ -20,3 +21,7 @@ def ngrams(tok: List[str], n: int) -> List[str]:
     if n <= 1:
         return tok[:]
     return [" ".join(tok[i:i+n]) for i in range(0, max(0, len(tok)-n+1))]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in _sent_split.split(text.strip()) if s]
@@ -1,13 +1,21 @@
+from dataclasses import dataclass
 from typing import List, Optional
-from .text_utils import tokens, ngrams, normalize
-import os
+import numpy as np
+from .embeddings import USE_SEMANTIC_FAITHFULNESS, answer_and_passage_embeddings, get_encoder
+from .fingerprint import ngram_fingerprints, overlap_count, query_ids
+from .index import PassageIndex, build_index
+from .passage_cache import NGRAM_FINGERPRINTS
+from .text_utils import tokens, ngrams, normalize, split_sentences
 
 
 def concat_passages(passages: List[dict]) -> str:
     return "\n".join(p.get("text", "") for p in passages)
 
 
-def ngram_overlap_score(answer: str, passages: List[dict], n: int = 3) -> float:
+def ngram_overlap_score(answer: str, passages: List[dict], n: int = 3, index: PassageIndex = None,
+                        fingerprints: bool = None) -> float:
+    if fingerprints is None:
+        fingerprints = NGRAM_FINGERPRINTS
     ans_toks = tokens(answer)
     if not ans_toks:
         return 0.0
@@ -17,54 +25,97 @@ def ngram_overlap_score(answer: str, passages: List[dict], n: int = 3) -> float:
     if len(ans_toks) < 2:
         n = 1
 
+    if index is None:
+        index = build_index(passages)
+
+    if fingerprints:
+        ids = query_ids(index.vocab, ans_toks)
+        ans_fp = ngram_fingerprints(ids, n)
+        if not len(ans_fp):
+            return 0.0
+        score = overlap_count(ans_fp, index.context_fingerprints(n)) / len(ans_fp)
+        ans_uni = ngram_fingerprints(ids, 1)
+        unigram_score = overlap_count(ans_uni, index.context_fingerprints(1)) / len(ans_uni)
+        mixed = 0.7 * score + 0.3 * unigram_score
+        return max(0.0, min(1.0, round(mixed, 4)))
+
     ans_ngrams = set(ngrams(ans_toks, n))
-    ctx_text = concat_passages(passages)
-    ctx_ngrams = set(ngrams(tokens(ctx_text), n))
+    ctx_ngrams = index.context_ngrams(n)
 
     if not ans_ngrams:
         return 0.0
     overlap = ans_ngrams & ctx_ngrams
     score = len(overlap) / max(1, len(ans_ngrams))
-    uni_overlap = set(ngrams(ans_toks, 1)) & set(ngrams(tokens(ctx_text), 1))
-    unigram_score = len(uni_overlap) / max(1, len(set(ngrams(ans_toks, 1))))
+    ans_unigrams = set(ans_toks)
+    uni_overlap = ans_unigrams & index.context_ngrams(1)
+    unigram_score = len(uni_overlap) / max(1, len(ans_unigrams))
     mixed = 0.7 * score + 0.3 * unigram_score
     return max(0.0, min(1.0, round(mixed, 4)))
 
 
+@dataclass(frozen=True)
+class SentenceSupport:
+    sentence: str
+    support: float              # share of tokens inside a passage span of >= min_span tokens
+    longest_span: int           # tokens in the longest span found verbatim in one passage
+    passage_id: Optional[str]   # passage holding that span
+
+
+def _covered_share(lens: np.ndarray, min_span: int) -> float:
+    # position j is covered if some match ending at i >= j, of length >= min_span, starts at or before j
+    idx = np.arange(len(lens))
+    starts = np.where(lens >= min_span, idx - lens + 1, len(lens))
+    reach = np.minimum.accumulate(starts[::-1])[::-1]
+    return float(np.count_nonzero(reach <= idx)) / len(lens)
+
+
+def sentence_support(answer: str, passages: List[dict], index: PassageIndex = None,
+                     min_span: int = 3) -> List[SentenceSupport]:
+    """Per-sentence grounding of the answer; one suffix-automaton walk per sentence."""
+    if index is None:
+        index = build_index(passages)
+    sam = index.automaton()
+    out: List[SentenceSupport] = []
+    for sent in split_sentences(answer):
+        toks = tokens(sent)
+        if not toks:
+            continue
+        lens, docs = sam.match(query_ids(index.vocab, toks))
+        best = int(np.argmax(lens))
+        out.append(SentenceSupport(
+            sentence=sent,
+            support=round(_covered_share(lens, min(min_span, len(toks))), 4),
+            longest_span=int(lens[best]),
+            passage_id=index.passages[docs[best]].get("id") if lens[best] else None,
+        ))
+    return out
+
+
 def semantic_entailment_score(answer: str, passages: List[dict]) -> Optional[float]:
-    if os.getenv("USE_SEMANTIC_FAITHFULNESS", "false").lower() != "true":
+    if not USE_SEMANTIC_FAITHFULNESS:
         return None
-    
+    encoder = get_encoder()
+    if encoder is None:
+        return None
+
     try:
-        from sentence_transformers import SentenceTransformer
-        import numpy as np
-        
-        if not hasattr(semantic_entailment_score, "_model"):
-            semantic_entailment_score._model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        model = semantic_entailment_score._model
-        
-        answer_embedding = model.encode([answer], convert_to_numpy=True)[0]
         passage_texts = [p.get("text", "") for p in passages if p.get("text")]
         if not passage_texts:
             return None
-        
-        passage_embeddings = model.encode(passage_texts, convert_to_numpy=True)
-        
-        similarities = np.dot(passage_embeddings, answer_embedding) / (
-            np.linalg.norm(passage_embeddings, axis=1) * np.linalg.norm(answer_embedding)
-        )
+
+        # rows are unit length, so the dot product is the cosine similarity
+        answer_vec, passage_vecs = answer_and_passage_embeddings(answer, passage_texts, encoder)
+        similarities = passage_vecs @ answer_vec
         max_sim = float(np.max(similarities))
-        
+
         return max(0.0, min(1.0, (max_sim + 1) / 2))
-    except ImportError:
-        return None
     except Exception:
         return None
 
 
-def blended_faithfulness_score(answer: str, passages: List[dict], use_semantic: bool = False) -> float:
-    overlap_score = ngram_overlap_score(answer, passages)
+def blended_faithfulness_score(answer: str, passages: List[dict], use_semantic: bool = False,
+                               index: PassageIndex = None) -> float:
+    overlap_score = ngram_overlap_score(answer, passages, index=index)
     
     if use_semantic:
         semantic_score = semantic_entailment_score(answer, passages)
@@ -1,9 +1,30 @@
+import ipaddress
+import os
+import socket
+from urllib.parse import urlparse
 from fastapi import HTTPException
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 MAX_PASSAGES = 50
 MAX_PASSAGE_SIZE_BYTES = 4 * 1024
 MAX_TOTAL_SIZE_BYTES = 200 * 1024
+MAX_CORPUS_PASSAGES = int(os.getenv("MAX_CORPUS_PASSAGES", "10000"))
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "1000"))
+# comma-separated hosts repair callbacks may be POSTed to; when empty, any host with
+# only public addresses is allowed (the worker POSTs from inside the cluster)
+REPAIR_CALLBACK_ALLOWED_HOSTS = {h.strip().lower() for h in os.getenv("REPAIR_CALLBACK_ALLOWED_HOSTS", "").split(",")
+                                 if h.strip()}
+
+
+def _passage_text(passage) -> str:
+    if isinstance(passage, dict):
+        return passage.get("text", "")
+    return passage.text
+
+
+def request_size(passages: List[Dict], question: str, answer: str) -> int:
+    return (len(question.encode('utf-8')) + len(answer.encode('utf-8'))
+            + sum(len(_passage_text(p).encode('utf-8')) for p in passages))
 
 
 def validate_request(passages: List[Dict], question: str, answer: str) -> None:
@@ -15,7 +36,7 @@ def validate_request(passages: List[Dict], question: str, answer: str) -> None:
 
     total_size = len(question.encode('utf-8')) + len(answer.encode('utf-8'))
     for i, passage in enumerate(passages):
-        text = passage.get("text", "")
+        text = _passage_text(passage)
         passage_size = len(text.encode('utf-8'))
 
         if passage_size > MAX_PASSAGE_SIZE_BYTES:
@@ -31,3 +52,100 @@ def validate_request(passages: List[Dict], question: str, answer: str) -> None:
             status_code=413,
             detail=f"Total request size exceeds limit: {total_size} > {MAX_TOTAL_SIZE_BYTES} bytes"
         )
+
+
+def validate_passage_refs(corpus_id: Optional[str], passage_ids: List[str], passages: List[Dict]) -> None:
+    if not corpus_id and not passage_ids:
+        return
+    if not corpus_id or not passage_ids:
+        raise HTTPException(
+            status_code=422,
+            detail="corpus_id and passage_ids must be given together"
+        )
+    if passages:
+        raise HTTPException(
+            status_code=422,
+            detail="Send either passages or corpus_id/passage_ids, not both"
+        )
+    if len(passage_ids) > MAX_PASSAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many passages: {len(passage_ids)} > {MAX_PASSAGES}"
+        )
+
+
+def validate_corpus(passages: List[Dict]) -> None:
+    if not passages:
+        raise HTTPException(status_code=422, detail="Corpus has no passages")
+    if len(passages) > MAX_CORPUS_PASSAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many passages: {len(passages)} > {MAX_CORPUS_PASSAGES}"
+        )
+
+    seen = set()
+    for i, passage in enumerate(passages):
+        passage_size = len(_passage_text(passage).encode('utf-8'))
+        if passage_size > MAX_PASSAGE_SIZE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Passage {i} exceeds size limit: {passage_size} > {MAX_PASSAGE_SIZE_BYTES} bytes"
+            )
+        pid = passage["id"] if isinstance(passage, dict) else passage.id
+        if pid in seen:
+            raise HTTPException(status_code=422, detail=f"Duplicate passage id: {pid}")
+        seen.add(pid)
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    # rules out loopback, RFC 1918, link-local (169.254.169.254), CGNAT and reserved ranges
+    return ip.is_global
+
+
+def callback_url_error(callback_url: str, resolve: bool = False) -> Optional[str]:
+    """Why callback_url may not be called back, or None.
+
+    Without `resolve` only literal addresses are checked, which is what the API does
+    without blocking; the worker resolves the host right before POSTing.
+    """
+    url = urlparse(callback_url)
+    if url.scheme not in ("http", "https") or not url.hostname:
+        return "callback_url must be an http(s) URL"
+    host = url.hostname.lower()
+    if REPAIR_CALLBACK_ALLOWED_HOSTS:
+        return None if host in REPAIR_CALLBACK_ALLOWED_HOSTS else "callback_url host is not allowed"
+    if host == "localhost" or host.endswith(".localhost"):
+        return "callback_url must be a public address"
+    try:
+        addresses = [host] if not resolve else [
+            info[4][0] for info in socket.getaddrinfo(host, url.port, proto=socket.IPPROTO_TCP)]
+        if not all(_is_public(a) for a in addresses):
+            return "callback_url must be a public address"
+    except ValueError:
+        pass  # a name; checked once resolved
+    except (socket.gaierror, UnicodeError):
+        return "callback_url host does not resolve"
+    return None
+
+
+def validate_callback(defer_repair: bool, callback_url: Optional[str]) -> None:
+    if not callback_url:
+        return
+    if not defer_repair:
+        raise HTTPException(status_code=422, detail="callback_url requires defer_repair")
+    error = callback_url_error(callback_url)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+
+
+def validate_batch(items: List[Dict]) -> None:
+    if not items:
+        raise HTTPException(status_code=422, detail="Batch has no items")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many batch items: {len(items)} > {MAX_BATCH_ITEMS}"
+        )
@@ -41,6 +41,16 @@ def get_policy_hash():
         pass
     return "unknown"
 
+def get_lexicon_hash():
+    try:
+        from .policy import load_policy
+        lexicon_path = Path(load_policy().safety.lexicon)
+        if lexicon_path.exists():
+            return hashlib.sha256(lexicon_path.read_bytes()).hexdigest()[:8]
+    except Exception:
+        pass
+    return "unknown"
+
 def get_build_time():
     build_time = os.getenv("BUILD_TIME")
     if build_time:
@@ -0,0 +1,26 @@
+import threading
+from typing import Dict, Iterable, List
+import numpy as np
+
+
+class Vocabulary:
+    """Token -> integer id table; ids are stable for the lifetime of the table."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def ids(self, toks: Iterable[str]) -> np.ndarray:
+        """Ids for toks, interning unseen tokens."""
+        with self._lock:
+            table = self._ids
+            return np.fromiter(
+                (table.setdefault(t, len(table)) for t in toks), dtype=np.int64)
+
+    def lookup(self, toks: Iterable[str]) -> List[int]:
+        """Ids for toks without interning; unseen tokens map to -1."""
+        table = self._ids
+        return [table.get(t, -1) for t in toks]
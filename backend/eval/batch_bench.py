@@ -0,0 +1,104 @@
+"""API throughput for bulk callers: N /evaluate requests vs the same items via /evaluate/batch.
+
+    python eval/batch_bench.py [--items 2000] [--batch-size 500] [--concurrency 100]
+
+Same in-process setup as concurrency_bench.py (fakeredis, simulated workers), with jobs
+finishing as soon as they are picked up, so the numbers are the API-side cost per item.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import fakeredis
+import httpx
+from rq import Queue
+from rq.job import Job
+
+import app.async_queue as async_queue
+import app.auth as auth
+import app.main as api
+import app.result_cache as result_cache
+import app.single_flight as single_flight
+from app.codec import decode
+from app.queue import notify_success
+from concurrency_bench import API_KEY, PAYLOAD, RESULT
+
+
+def instant_workers(r, stop: threading.Event) -> None:
+    queue = Queue("eval", connection=r)
+    while not stop.is_set():
+        job_ids = r.lpop(queue.key, 1000)
+        if not job_ids:
+            time.sleep(0.001)
+            continue
+        for job in Job.fetch_many([j.decode() for j in job_ids], connection=r):
+            batch = job.func_name.endswith("evaluate_batch_encoded")
+            notify_success(job, r, [RESULT] * len(decode(job.args[0])) if batch else RESULT)
+
+
+async def single(client, n: int, concurrency: int) -> None:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            resp = await client.post("/evaluate", json=PAYLOAD, headers=API_KEY)
+            assert resp.status_code == 200, resp.text
+
+    await asyncio.gather(*(one() for _ in range(n)))
+
+
+async def batched(client, n: int, batch_size: int, concurrency: int) -> None:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(k):
+        async with sem:
+            resp = await client.post("/evaluate/batch", json={"items": [PAYLOAD] * k}, headers=API_KEY)
+            assert resp.status_code == 200, resp.text
+            assert all(r["status"] == 200 for r in resp.json()["results"])
+
+    sizes = [min(batch_size, n - i) for i in range(0, n, batch_size)]
+    await asyncio.gather(*(one(k) for k in sizes))
+
+
+async def timed(fn, *args):
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        t, cpu = time.perf_counter(), time.process_time()
+        await fn(client, *args)
+        return time.perf_counter() - t, time.process_time() - cpu
+
+
+def main(items: int, batch_size: int, concurrency: int):
+    server = fakeredis.FakeServer()
+    r = fakeredis.FakeRedis(server=server)
+    async_queue._connect = lambda: fakeredis.aioredis.FakeRedis(server=server)
+    auth.RATE_LIMIT_REQUESTS = 10 ** 9
+    api.q = Queue("eval", connection=r)
+    # one payload repeated: each request must cost a job, not a cache hit or a shared one
+    result_cache._result_cache = result_cache.ResultCache(ttl=0)
+    single_flight._single_flight = single_flight.SingleFlight(enabled=False)
+    stop = threading.Event()
+    threading.Thread(target=instant_workers, args=(r, stop), daemon=True).start()
+    try:
+        print(f"{'mode':>8s} {'items':>6s} {'wall s':>7s} {'cpu s':>7s} {'items/cpu s':>12s}")
+        for name, fn, args in (("single", single, (items, concurrency)),
+                               ("batch", batched, (items, batch_size, concurrency))):
+            wall, cpu = asyncio.run(timed(fn, *args))
+            print(f"{name:>8s} {items:6d} {wall:7.2f} {cpu:7.2f} {items / cpu:12.0f}")
+    finally:
+        stop.set()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=2000)
+    ap.add_argument("--batch-size", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=100)
+    args = ap.parse_args()
+    main(args.items, args.batch_size, args.concurrency)
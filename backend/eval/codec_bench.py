@@ -0,0 +1,113 @@
+"""Redis bytes and serialization time per /evaluate job: pickled model_dump dicts vs app.codec.
+
+    python eval/codec_bench.py [--sizes 2,50,200] [--repeat 50]
+
+For each payload size (KB of passage text) both paths go through the same RQ calls the
+API and the worker make, against fakeredis:
+  pickle  the previous path: the payload dict as the job argument, the result dict
+          returned to RQ and sent back as a JSON done notice
+  codec   evaluate_encoded: msgpack frames (zstd past JOB_CODEC_COMPRESS_MIN_BYTES
+          when zstandard is installed) as the argument, the return value and the notice
+"Redis bytes" is the job hash plus the stored result plus the notice. "API ms" is
+building the job and reading the notice; "worker ms" is loading the argument and
+storing the result. Scoring itself is the same on both paths and is left out.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import fakeredis
+from rq import Queue
+from rq.job import Job
+from rq.results import Result
+
+from app import codec
+from app.codec import decode, encode
+from app.queue import encode_notice, read_notice
+
+RESULT = {"decision": "allow", "scores": {"faithfulness": 0.91, "coverage": 1.0, "toxicity": 0.0},
+          "repaired_answer": None, "explanations": ["faithful", "covered"],
+          "meta": {"engine": "day6", "v": "day6"}}
+
+
+def make_payload(kb: int, rng: random.Random) -> dict:
+    # Zipf-weighted made-up words, which compress about as well as English prose
+    vocab = ["".join(rng.choice("etaoinshrdlucmfwypvbgk") for _ in range(rng.randint(2, 10)))
+             for _ in range(2000)]
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    passages = []
+    size = 0
+    while size < kb * 1024:
+        text = " ".join(rng.choices(vocab, weights, k=rng.randint(40, 120))) + "."
+        passages.append({"id": f"p{len(passages)}", "text": text, "source": f"doc-{len(passages) % 7}"})
+        size += len(text)
+    return {"question": "What are side-effects of metformin?",
+            "answer": "Common side-effects are nausea and diarrhea.", "passages": passages,
+            "corpus_id": None, "passage_ids": None, "defer_repair": False, "callback_url": None}
+
+
+def run_path(r, queue: Queue, payload: dict, encoded: bool):
+    t = time.perf_counter()
+    if encoded:
+        job = queue.create_job("worker.worker.evaluate_encoded", args=(encode(payload),))
+    else:
+        job = queue.create_job("worker.worker.evaluate_payload", args=(payload,))
+    job.save()
+    api = time.perf_counter() - t
+
+    t = time.perf_counter()
+    loaded = Job.fetch(job.id, connection=r)
+    arg = loaded.args[0]
+    if encoded:
+        arg = decode(arg)
+        value = encode(RESULT)
+        notice = encode_notice({"status": "finished", "result": value})
+    else:
+        value = RESULT
+        notice = json.dumps({"status": "finished", "result": value})
+    Result.create(loaded, Result.Type.SUCCESSFUL, ttl=60, return_value=value)
+    r.lpush("notice", notice)
+    worker = time.perf_counter() - t
+
+    t = time.perf_counter()
+    raw = r.lpop("notice")
+    done = read_notice(raw) if encoded else json.loads(raw)
+    api += time.perf_counter() - t
+    assert done["result"] == RESULT and arg == payload
+
+    stored = sum(len(k) + len(v) for k, v in r.hgetall(job.key).items())
+    stored += sum(len(k) + len(v) for _, entry in r.xrange(Result.get_key(job.id)) for k, v in entry.items())
+    stored += len(raw)
+    r.delete(job.key, Result.get_key(job.id))
+    return stored, api, worker
+
+
+def main(sizes, repeat: int):
+    r = fakeredis.FakeRedis()
+    queue = Queue("eval", connection=r)
+    rng = random.Random(0)
+    zstd = "zstd" if codec.zstandard is not None else "no zstandard"
+    print(f"codec v{codec.CODEC_VERSION}, {zstd}, compress from {codec.JOB_CODEC_COMPRESS_MIN_BYTES} bytes")
+    print(f"{'KB':>4s} {'path':>7s} {'Redis bytes':>12s} {'API ms':>7s} {'worker ms':>10s}")
+    for kb in sizes:
+        payload = make_payload(kb, rng)
+        for name, encoded in (("pickle", False), ("codec", True)):
+            runs = [run_path(r, queue, payload, encoded) for _ in range(repeat)]
+            stored = runs[0][0]
+            api = sorted(x[1] for x in runs)[len(runs) // 2] * 1000
+            worker = sorted(x[2] for x in runs)[len(runs) // 2] * 1000
+            print(f"{kb:4d} {name:>7s} {stored:12d} {api:7.2f} {worker:10.2f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="2,50,200")
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+    main([int(s) for s in args.sizes.split(",")], args.repeat)
@@ -0,0 +1,131 @@
+"""Pending /evaluate requests one API process can hold, sync handler vs async handler.
+
+    python eval/concurrency_bench.py [--job-ms 500] [--levels 40,200,1000,3000]
+
+Runs the API in-process against fakeredis with a simulated worker pool that finishes
+every job --job-ms after it was enqueued, so only the API side is measured. "sync" is the
+previous handler (blocking enqueue + BLPOP, one threadpool thread per pending request);
+"async" is the current /evaluate. A level is sustainable when every request succeeds and
+the slowest one takes under twice the job time, i.e. nothing queued inside the API.
+fakeredis parses every command in Python on the same core, so it sets the async
+ceiling here; against a real Redis the async handler holds more.
+"""
+import argparse
+import asyncio
+import heapq
+import os
+import sys
+import threading
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import fakeredis
+import httpx
+from fastapi import FastAPI, HTTPException
+from rq import Queue
+from rq.job import Callback, Job
+
+import app.async_queue as async_queue
+import app.auth as auth
+import app.main as api
+import app.result_cache as result_cache
+import app.single_flight as single_flight
+from app.config import settings
+from app.queue import done_key, notify_failure, notify_success, read_notice
+from app.schemas import EvaluateRequest
+
+PAYLOAD = {
+    "question": "What are side-effects of metformin?",
+    "answer": "Common side-effects are nausea and diarrhea.",
+    "passages": [{"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "med-guide"}],
+}
+RESULT = {"decision": "allow", "scores": {"faithfulness": 1.0, "coverage": 1.0, "toxicity": 0.0}}
+API_KEY = {"X-API-Key": auth.REQUIRED_API_KEY}
+
+
+def sync_app(q: Queue) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/evaluate")
+    def evaluate(req: EvaluateRequest):
+        if auth.rate_limit("bench"):
+            raise HTTPException(status_code=429)
+        job = q.enqueue("worker.worker.evaluate_payload", req.model_dump(),
+                        on_success=Callback(notify_success), on_failure=Callback(notify_failure))
+        # parks this threadpool thread until the worker's notice arrives
+        got = q.connection.blpop([done_key(job.id)], timeout=settings.EVAL_TIMEOUT_SEC)
+        if got is None:
+            raise HTTPException(status_code=504)
+        return read_notice(got[1])["result"]
+
+    return app
+
+
+def simulated_workers(r, job_ms: float, stop: threading.Event) -> None:
+    queue = Queue("eval", connection=r)
+    due = []
+    while not stop.is_set():
+        now = time.perf_counter()
+        for job_id in r.lpop(queue.key, 1000) or []:
+            heapq.heappush(due, (now + job_ms / 1000, job_id.decode()))
+        while due and due[0][0] <= now:
+            _, job_id = heapq.heappop(due)
+            notify_success(Job.fetch(job_id, connection=r), r, RESULT)
+        time.sleep(0.002)
+
+
+async def fire(app: FastAPI, n: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one():
+            t = time.perf_counter()
+            resp = await client.post("/evaluate", json=PAYLOAD, headers=API_KEY)
+            return resp.status_code, time.perf_counter() - t
+
+        t = time.perf_counter()
+        results = await asyncio.gather(*(one() for _ in range(n)))
+        return results, time.perf_counter() - t
+
+
+def main(job_ms: float, levels):
+    server = fakeredis.FakeServer()
+    r = fakeredis.FakeRedis(server=server)
+    async_queue._connect = lambda: fakeredis.aioredis.FakeRedis(server=server)
+    auth.Redis.from_url = staticmethod(lambda *a, **kw: r)
+    auth.RATE_LIMIT_REQUESTS = 10 ** 9
+    api.q = Queue("eval", connection=r)
+    # one payload repeated: each request must cost a job, not a cache hit or a shared one
+    result_cache._result_cache = result_cache.ResultCache(ttl=0)
+    single_flight._single_flight = single_flight.SingleFlight(enabled=False)
+    apps = {"sync": sync_app(api.q), "async": api.app}
+
+    stop = threading.Event()
+    threading.Thread(target=simulated_workers, args=(r, job_ms, stop), daemon=True).start()
+    print(f"job time {job_ms:.0f} ms, timeout {settings.EVAL_TIMEOUT_SEC}s")
+    print(f"{'handler':>7s} {'pending':>8s} {'ok':>6s} {'p50 ms':>8s} {'max ms':>8s} {'req/s':>8s}")
+    best = {}
+    try:
+        for name, app in apps.items():
+            for n in levels:
+                results, wall = asyncio.run(fire(app, n))
+                lat = sorted(dt * 1000 for status, dt in results if status == 200)
+                ok = len(lat)
+                p50 = lat[len(lat) // 2] if lat else float("nan")
+                worst = lat[-1] if lat else float("nan")
+                print(f"{name:>7s} {n:8d} {ok:6d} {p50:8.0f} {worst:8.0f} {n / wall:8.0f}")
+                if ok == n and worst < 2 * job_ms:
+                    best[name] = n
+    finally:
+        stop.set()
+    for name in apps:
+        print(f"max sustainable pending ({name}): {best.get(name, 0)}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--job-ms", type=float, default=500)
+    ap.add_argument("--levels", default="40,200,1000,3000")
+    args = ap.parse_args()
+    main(args.job_ms, [int(x) for x in args.levels.split(",")])
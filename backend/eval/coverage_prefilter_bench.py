@@ -0,0 +1,80 @@
+"""How much fused ranking the coverage prefilter avoids.
+
+    python eval/coverage_prefilter_bench.py
+
+For each workload: share of sub-questions decided from the inverted index alone, and
+coverage_score time with the prefilter vs ranking every sub-question.
+"""
+import csv
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from app.coverage import _prefilter, _ranked_support, coverage_score, decompose
+from app.index import build_index
+from app.retrieval import fused_rank_many
+from tests.benchmark_cases import load_benchmark
+
+
+def ranked_coverage(question, index):
+    subs = decompose(question)
+    ranked = fused_rank_many(subs, index, top_k=3)
+    ok = [_ranked_support(s, ids, index)[0] for s, ids in zip(subs, ranked)]
+    return round(sum(ok) / max(1, len(subs)), 4), [s for s, k in zip(subs, ok) if not k]
+
+
+def workloads():
+    cases = []
+    for fp in sorted(glob.glob(os.path.join(backend_dir, "tests", "goldens", "*.json"))) + \
+            sorted(glob.glob(os.path.join(backend_dir, "eval", "cases", "*.json"))):
+        inp = json.load(open(fp, encoding="utf-8"))["input"]
+        cases.append((inp["question"], inp.get("passages", [])))
+    yield "goldens+cases", cases
+    yield "eval/benchmark.csv", [(q, ps) for q, _, ps in load_benchmark()]
+    with open(os.path.join(backend_dir, "benchmark.csv"), encoding="utf-8") as f:
+        yield "benchmark.csv", [(r["question"], json.loads(r["passages"])) for r in csv.DictReader(f)]
+
+    rng = random.Random(0)
+    vocab = [f"term{i}" for i in range(2000)]
+    large = []
+    for _ in range(50):
+        passages = [{"id": f"p{i}", "text": " ".join(rng.choices(vocab, k=600))} for i in range(50)]
+        question = " and ".join(" ".join(rng.choices(vocab, k=3)) for _ in range(4))
+        large.append((question, passages))
+    yield "synthetic 50x4KB", large
+
+
+def main(repeats: int = 5):
+    print(f"{'workload':22s} {'subqs':>6s} {'prefiltered':>11s} {'ranked ms':>10s} {'prefilter ms':>13s}")
+    for name, cases in workloads():
+        indexes = [(q, build_index(ps, bm25_engine="sparse")) for q, ps in cases]
+        subqs = decided = 0
+        for q, index in indexes:
+            for s in decompose(q):
+                subqs += 1
+                decided += _prefilter(s, index) is not None
+            assert coverage_score(q, index.passages, index) == ranked_coverage(q, index)
+
+        def prefiltered(q, ix):
+            # the postings map is built once per job, so charge it to every call here
+            ix._derived.pop("postings", None)
+            return coverage_score(q, ix.passages, ix)
+
+        timings = []
+        for fn in (ranked_coverage, prefiltered):
+            t = time.perf_counter()
+            for _ in range(repeats):
+                for q, index in indexes:
+                    fn(q, index)
+            timings.append((time.perf_counter() - t) * 1000 / (repeats * len(indexes)))
+        print(f"{name:22s} {subqs:6d} {decided / max(1, subqs):10.0%} {timings[0]:10.3f} {timings[1]:13.3f}")
+
+
+if __name__ == "__main__":
+    main()
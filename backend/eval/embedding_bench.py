@@ -0,0 +1,104 @@
+"""Latency and memory of the embedding backends and cache storage dtypes.
+
+    python eval/embedding_bench.py                      # every backend whose deps are installed
+    EMBEDDING_ONNX_PATH=/models/minilm python eval/embedding_bench.py --quantize
+
+Each backend runs in a fresh subprocess so peak RSS is not shared between them.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+import numpy as np
+
+BATCH_SIZES = (1, 8, 32)
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _texts(n: int):
+    from tests.benchmark_cases import CASES
+    texts = [p["text"] for _, _, ps in CASES for p in ps] + [a for _, a, _ in CASES]
+    return (texts * (n // len(texts) + 1))[:n]
+
+
+def run_backend(name: str, repeats: int) -> dict:
+    from app.embedding_backends import EMBEDDING_ONNX_PATH, OnnxBackend, SentenceTransformerBackend
+    from app.embeddings import EMBEDDING_MODEL
+
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    backend = OnnxBackend(EMBEDDING_ONNX_PATH) if name == "onnx" else SentenceTransformerBackend(EMBEDDING_MODEL)
+    backend.encode(["warm up"])
+    result = {"backend": name, "load_s": round(time.perf_counter() - t0, 2)}
+    for bs in BATCH_SIZES:
+        texts = _texts(bs)
+        times = []
+        for _ in range(repeats):
+            t = time.perf_counter()
+            backend.encode(texts)
+            times.append((time.perf_counter() - t) * 1000)
+        times.sort()
+        result[f"b{bs}_p50_ms"] = round(statistics.median(times), 1)
+        result[f"b{bs}_p95_ms"] = round(times[int(0.95 * (len(times) - 1))], 1)
+    result["rss_mb"] = round(_rss_mb() - rss0, 1)
+    return result
+
+
+def storage_report(n: int = 20000, dim: int = 384):
+    from app.embedding_backends import pack_vector, stored_nbytes, unpack_vector
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    sample = vecs[:500]
+    for dtype in ("float32", "float16", "int8"):
+        stored = [pack_vector(v, dtype) for v in vecs]
+        restored = np.stack([unpack_vector(s) for s in stored[:500]])
+        err = np.abs(restored @ sample.T - sample @ sample.T).max()
+        mib = sum(stored_nbytes(s) for s in stored) / 2**20
+        print(f"  {dtype:8s} {mib:7.1f} MiB for {n} vectors   max cosine error {err:.5f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeats", type=int, default=30)
+    ap.add_argument("--quantize", action="store_true",
+                    help="write model_quantized.onnx into EMBEDDING_ONNX_PATH first")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.repeats)))
+        return
+
+    if args.quantize:
+        from app.embedding_backends import EMBEDDING_ONNX_PATH, quantize_onnx
+        print("wrote", quantize_onnx(EMBEDDING_ONNX_PATH))
+
+    print("Cache storage:")
+    storage_report()
+
+    print("Backends:")
+    for name in ("sentence-transformers", "onnx"):
+        proc = subprocess.run([sys.executable, __file__, "--child", name, "--repeats", str(args.repeats)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            reason = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+            print(f"  {name}: skipped ({reason})")
+            continue
+        print("  " + json.dumps(json.loads(proc.stdout.strip().splitlines()[-1])))
+
+
+if __name__ == "__main__":
+    main()
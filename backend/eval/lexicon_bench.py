@@ -0,0 +1,48 @@
+"""Toxicity lexicon scan time vs lexicon size.
+
+    python eval/lexicon_bench.py
+
+Finding every matched term with one substring test per term costs O(terms x answer); the
+Aho-Corasick scan walks the answer once whatever the lexicon size.
+"""
+import os
+import random
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from app.lexicon import Lexicon
+
+
+def random_words(rng, n):
+    return {"".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(4, 10))) for _ in range(n)}
+
+
+def main(repeats: int = 50):
+    rng = random.Random(0)
+    answers = [" ".join(random_words(rng, 300)) for _ in range(5)]  # ~2KB each
+    print(f"{'terms':>7s} {'substring ms':>13s} {'automaton ms':>13s} {'build ms':>9s}")
+    for size in (10, 100, 1000, 10000, 50000):
+        terms = sorted(random_words(rng, size))
+        t = time.perf_counter()
+        lexicon = Lexicon((w, "profanity") for w in terms)
+        build = (time.perf_counter() - t) * 1000
+
+        def substring(text):
+            low = text.lower()
+            return [w for w in terms if w in low]
+
+        timings = []
+        for fn in (substring, lexicon.scan):
+            t = time.perf_counter()
+            for _ in range(repeats):
+                for a in answers:
+                    fn(a)
+            timings.append((time.perf_counter() - t) * 1000 / (repeats * len(answers)))
+        print(f"{size:7d} {timings[0]:13.3f} {timings[1]:13.3f} {build:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,9 +23,11 @@ setup(
         "pydantic>=2.9.2",
         "python-dotenv>=1.0.1",
         "redis>=5.0.7",
-        "rq>=1.16.2",
+        "rq==1.16.2",  # app.async_queue replays its enqueue pipeline calls
+        "msgpack>=1.0.0",
         "numpy>=2.1.3",
         "scikit-learn>=1.5.2",
+        "scipy>=1.11.0",
         "rank-bm25>=0.2.2",
         "pyyaml>=6.0.2",
         "prometheus-client>=0.20.0",
@@ -36,7 +38,9 @@ setup(
     ],
     extras_require={
         "semantic": ["sentence-transformers>=2.2.0", "torch>=2.0.0"],
-        "dev": ["pytest>=7.0.0", "black>=23.0.0", "flake8>=6.0.0"],
+        "onnx": ["onnxruntime>=1.16.0", "tokenizers>=0.15.0"],
+        "zstd": ["zstandard>=0.22.0"],
+        "dev": ["pytest>=7.0.0", "black>=23.0.0", "flake8>=6.0.0", "fakeredis>=2.20.0", "httpx>=0.27.0"],
     },
     classifiers=[
         "Development Status :: 4 - Beta",
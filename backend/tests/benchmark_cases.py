@@ -0,0 +1,30 @@
+"""eval/benchmark.csv cases and a multi-passage context, shared by the tests and eval scripts."""
+import csv
+import io
+import json
+import os
+
+BENCHMARK = os.path.join(os.path.dirname(__file__), "..", "eval", "benchmark.csv")
+
+
+def load_benchmark(path: str = BENCHMARK):
+    # passages column is raw (unquoted) JSON, so split it off before csv parsing
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()[1:]
+    cases = []
+    for line in lines:
+        if not line.strip():
+            continue
+        start, end = line.index("["), line.rindex("]")
+        domain, question, answer = next(csv.reader(io.StringIO(line[:start])))[:3]
+        cases.append((question, answer, json.loads(line[start:end + 1])))
+    return cases
+
+
+CASES = load_benchmark()
+MULTI_PASSAGE = [
+    {"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "med-guide"},
+    {"id": "p2", "text": "Rare adverse events include lactic acidosis.", "source": "safety-note"},
+    {"id": "p3", "text": "Typical dosage: 500 mg twice daily with meals.", "source": "dose-guide"},
+    {"id": "p4", "text": "Contraindications: severe renal impairment and acidosis.", "source": "safety-note"},
+]
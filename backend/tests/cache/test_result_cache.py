@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+import app.result_cache as result_cache
+from app.result_cache import RESULT_INDEX_KEY, RESULT_KEY_PREFIX, ResultCache, payload_key
+from tests.conftest import API_KEY, REPAIR_PAYLOAD as PAYLOAD
+from worker import worker
+
+
+TTL = 3600
+
+
+@pytest.fixture
+def eager_queue():
+    return True
+
+
+@pytest.fixture(autouse=True)
+def fresh_result_cache(monkeypatch):
+    # off by default; every test here runs with it on
+    monkeypatch.setattr(result_cache, "_result_cache", ResultCache(ttl=TTL))
+
+
+@pytest.fixture
+def calls(redis, monkeypatch):
+    seen = []
+    evaluate_payload = worker.evaluate_payload
+
+    def counting(payload, *args, **kwargs):
+        seen.append(payload)
+        return evaluate_payload(payload, *args, **kwargs)
+
+    monkeypatch.setattr(worker, "evaluate_payload", counting)
+    return seen
+
+
+def test_repeat_payload_skips_the_worker(calls):
+    client = TestClient(main.app)
+    first = client.post("/evaluate", json=PAYLOAD, headers=API_KEY).json()
+    second = client.post("/evaluate", json=PAYLOAD, headers=API_KEY).json()
+    third = client.post("/evaluate", json=PAYLOAD, headers=API_KEY).json()
+    assert len(calls) == 1
+    assert "cache" not in first["meta"]
+    assert second["meta"] == third["meta"] == {**first["meta"], "cache": "hit"}
+    assert {k: v for k, v in second.items() if k != "meta"} == {k: v for k, v in first.items() if k != "meta"}
+    assert result_cache.get_result_cache().hits == 2
+    assert b"guardrail_result_cache_hit_ratio 0.66" in client.get("/metrics").content
+
+
+def test_key_covers_payload_and_policy(calls, monkeypatch):
+    client = TestClient(main.app)
+    client.post("/evaluate", json=PAYLOAD, headers=API_KEY)
+    client.post("/evaluate", json={**PAYLOAD, "answer": PAYLOAD["answer"] + " "}, headers=API_KEY)
+    monkeypatch.setattr(result_cache, "_result_cache", ResultCache(ttl=TTL, policy_hash="edited"))
+    client.post("/evaluate", json=PAYLOAD, headers=API_KEY)
+    assert len(calls) == 3
+    # field order and defaults do not matter
+    reordered = {"passages": PAYLOAD["passages"], "answer": PAYLOAD["answer"], "question": PAYLOAD["question"]}
+    cache = result_cache.get_result_cache()
+    assert cache.key(main.EvaluateRequest(**reordered)) == cache.key(main.EvaluateRequest(**PAYLOAD))
+    assert payload_key(PAYLOAD, "a") != payload_key(PAYLOAD, "b")
+
+
+def test_key_covers_lexicon_and_scorer_flags(monkeypatch):
+    req = main.EvaluateRequest(**PAYLOAD)
+    base = ResultCache().key(req)
+    monkeypatch.setattr(result_cache, "get_lexicon_hash", lambda: "edited")
+    edited = ResultCache().key(req)
+    monkeypatch.setattr(result_cache, "USE_SEMANTIC_FAITHFULNESS", not result_cache.USE_SEMANTIC_FAITHFULNESS)
+    semantic = ResultCache().key(req)
+    monkeypatch.setattr(result_cache, "NGRAM_FINGERPRINTS", not result_cache.NGRAM_FINGERPRINTS)
+    fingerprints = ResultCache().key(req)
+    assert len({base, edited, semantic, fingerprints}) == 4
+
+
+def test_cache_is_off_by_default():
+    assert not ResultCache().enabled
+
+
+def test_idempotency_key(redis, calls):
+    client = TestClient(main.app)
+    headers = {**API_KEY, "Idempotency-Key": "retry-1"}
+    first = client.post("/evaluate", json={**PAYLOAD, "defer_repair": True}, headers=headers).json()
+    # the payload entry is gone (evicted); the retry still gets the same answer and repair_id
+    result_cache.get_result_cache()._l1.clear()
+    redis.delete(*redis.keys(RESULT_KEY_PREFIX + "*"))
+    retry = client.post("/evaluate", json={**PAYLOAD, "defer_repair": True}, headers=headers).json()
+    assert len(calls) == 1
+    assert retry["meta"] == {**first["meta"], "cache": "hit"}
+    conflict = client.post("/evaluate", json=PAYLOAD, headers=headers)
+    assert conflict.status_code == 422
+
+
+def test_request_id_is_only_for_tracing(calls):
+    client = TestClient(main.app)
+    headers = {**API_KEY, "X-Request-ID": "trace-1"}
+    first = client.post("/evaluate", json=PAYLOAD, headers=headers)
+    other = client.post("/evaluate", json={**PAYLOAD, "answer": "Nausea."}, headers=headers)
+    assert first.status_code == other.status_code == 200
+    assert len(calls) == 2
+
+
+def test_entries_are_size_bounded(redis):
+    cache = ResultCache(ttl=TTL, max_entries=3, l1_max_entries=2)
+    keys = [payload_key({"n": i}, "p") for i in range(5)]
+
+    async def run():
+        for i, key in enumerate(keys):
+            await cache.put(key, {"n": i})
+        return await cache.get_many(keys)
+
+    got = asyncio.run(run())
+    assert got == [None, None, {"n": 2}, {"n": 3}, {"n": 4}]
+    assert redis.zcard(RESULT_INDEX_KEY) == 3
+    assert len(redis.keys(RESULT_KEY_PREFIX + "*")) == 3
+    # L1 held keys[3:]; the lookup refreshed them, then promoted the Redis hit for keys[2]
+    assert list(cache._l1) == [keys[4], keys[2]]
@@ -0,0 +1,45 @@
+import pytest
+
+import app.result_cache as result_cache
+
+API_KEY = {"X-API-Key": "demo-key-change-in-production"}
+# faithful and covered: routes to allow
+PAYLOAD = {
+    "question": "What are side-effects of metformin?",
+    "answer": "Common side-effects are nausea and diarrhea.",
+    "passages": [{"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "med-guide"}],
+}
+# unsupported answer: routes to repair
+REPAIR_PAYLOAD = {**PAYLOAD, "answer": "It improves vision and strengthens hair."}
+RESULT = {"decision": "allow", "scores": {"faithfulness": 1.0, "coverage": 1.0, "toxicity": 0.0},
+          "explanations": [], "repaired_answer": None}
+
+
+@pytest.fixture(autouse=True)
+def fresh_result_cache(monkeypatch):
+    # the L1 lives for the whole process; a result cached by one test would answer another
+    monkeypatch.setattr(result_cache, "_result_cache", result_cache.ResultCache())
+
+
+@pytest.fixture
+def eager_queue():
+    """True runs eval jobs on the spot (RQ is_async=False); override or parametrize per module."""
+    return False
+
+
+@pytest.fixture
+def redis(monkeypatch, eager_queue):
+    """One fakeredis server behind the API (sync and asyncio clients), its eval queue and the worker."""
+    fakeredis = pytest.importorskip("fakeredis")
+    import app.async_queue as async_queue
+    import app.main as main
+    from rq import Queue
+    from worker import worker
+
+    server = fakeredis.FakeServer()
+    r = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(async_queue, "_connect", lambda: fakeredis.aioredis.FakeRedis(server=server))
+    monkeypatch.setattr(main, "get_redis", lambda: r)
+    monkeypatch.setattr(main, "q", Queue("eval", connection=r, is_async=not eager_queue))
+    monkeypatch.setattr(worker, "get_redis", lambda: r)
+    return r
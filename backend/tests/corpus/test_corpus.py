@@ -0,0 +1,104 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.corpus import CorpusNotFound, CorpusStore, get_corpus
+from app.policy import load_policy
+from tests.conftest import API_KEY
+from worker import worker
+
+PASSAGES = [
+    {"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "med-guide"},
+    {"id": "p2", "text": "Rare adverse events include lactic acidosis.", "source": "safety-note"},
+    {"id": "p3", "text": "Typical dosage: 500 mg twice daily.", "source": "dose-guide"},
+]
+
+
+@pytest.fixture
+def store(redis):
+    return CorpusStore(redis)
+
+
+def test_store_round_trip(store):
+    meta = store.create(PASSAGES, name="metformin")
+    assert store.get_meta(meta["corpus_id"])["passage_count"] == 3
+    assert store.missing_ids(meta["corpus_id"], ["p1", "nope"]) == ["nope"]
+    assert store.missing_ids("unknown", ["p1"]) is None
+
+    corpus = store.load(meta["corpus_id"])
+    assert corpus.pick(["p3", "p1"]) == [PASSAGES[2], PASSAGES[0]]
+    assert corpus.stats.df["nausea"] == 1
+    assert corpus.stats.df["acidosis"] == 1
+    with pytest.raises(CorpusNotFound):
+        corpus.pick(["nope"])
+
+    assert store.delete(meta["corpus_id"])
+    assert store.get_meta(meta["corpus_id"]) is None
+
+
+def test_evaluate_by_reference_matches_inline(store):
+    corpus_id = store.create(PASSAGES)["corpus_id"]
+    question = "What are side-effects and rare risks of metformin?"
+    answer = "Common side-effects include nausea. Rarely, lactic acidosis may occur."
+    inline = worker.evaluate_payload(
+        {"question": question, "answer": answer, "passages": PASSAGES[:2]})
+    by_ref = worker.evaluate_payload(
+        {"question": question, "answer": answer, "corpus_id": corpus_id, "passage_ids": ["p1", "p2"]})
+    assert by_ref == inline
+    assert get_corpus(corpus_id, store) is get_corpus(corpus_id, store)
+
+
+def test_api_corpus_endpoints(store):
+    client = TestClient(main.app)
+    resp = client.post("/corpora", json={"name": "kb", "passages": PASSAGES}, headers=API_KEY)
+    assert resp.status_code == 201
+    corpus_id = resp.json()["corpus_id"]
+    assert client.get(f"/corpora/{corpus_id}", headers=API_KEY).json()["passage_count"] == 3
+
+    dup = client.post("/corpora", json={"passages": PASSAGES + PASSAGES[:1]}, headers=API_KEY)
+    assert dup.status_code == 422
+
+    body = {"question": "q", "answer": "a", "corpus_id": corpus_id, "passage_ids": ["p1", "zzz"]}
+    assert client.post("/evaluate", json=body, headers=API_KEY).status_code == 422
+    body = {"question": "q", "answer": "a", "corpus_id": "missing", "passage_ids": ["p1"]}
+    assert client.post("/evaluate", json=body, headers=API_KEY).status_code == 404
+    body = {"question": "q", "answer": "a", "passages": PASSAGES, "corpus_id": corpus_id, "passage_ids": ["p1"]}
+    assert client.post("/evaluate", json=body, headers=API_KEY).status_code == 422
+
+    assert client.delete(f"/corpora/{corpus_id}", headers=API_KEY).status_code == 200
+    assert client.get(f"/corpora/{corpus_id}", headers=API_KEY).status_code == 404
+
+
+def test_worker_uses_mmapped_index(store, tmp_path, monkeypatch):
+    indexed = CorpusStore(store.redis, index_dir=str(tmp_path))
+    corpus_id = indexed.create(PASSAGES)["corpus_id"]
+    assert (tmp_path / corpus_id / "meta.json").exists()
+
+    monkeypatch.setattr(worker, "CorpusStore", lambda r: CorpusStore(r, index_dir=str(tmp_path)))
+    monkeypatch.setattr(worker._POLICY.corpus, "idf", "corpus")
+    monkeypatch.setattr(worker, "_BM25_ENGINE", "sparse")
+    payload = {"question": "What are side-effects and rare risks of metformin?",
+               "answer": "Common side-effects include nausea. Rarely, lactic acidosis may occur.",
+               "corpus_id": corpus_id, "passage_ids": ["p2", "p1"]}
+    from_index = worker.evaluate_payload(payload)
+    assert get_corpus(corpus_id, indexed).index is not None
+
+    plain_id = store.create(PASSAGES)["corpus_id"]
+    from_redis = worker.evaluate_payload(dict(payload, corpus_id=plain_id))
+    assert get_corpus(plain_id, store).index is None
+    assert from_index == from_redis
+
+    indexed.delete(corpus_id)
+    assert not (tmp_path / corpus_id).exists()
+
+
+def test_corpus_idf_needs_sparse_engine(caplog):
+    policy = load_policy()
+    policy.corpus.idf = "corpus"
+    policy.repair.retriever_mode = "hybrid"
+    assert worker._bm25_engine(policy) == "okapi"
+    assert "corpus.idf: corpus has no effect" in caplog.text
+    caplog.clear()
+    policy.repair.retriever_mode = "hybrid_sparse"
+    assert worker._bm25_engine(policy) == "sparse"
+    assert not caplog.text
@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pytest
+
+from app.bm25 import SparseBM25
+from app.corpus import build_corpus_stats
+from app.corpus_index import CorpusIndex, write_corpus_index
+from app.text_utils import normalize
+
+PASSAGES = [
+    {"id": "p1", "text": "Common side-effects are nausea and diarrhea. Take with food!", "source": "med-guide"},
+    {"id": "p2", "text": "  Rare adverse events include lactic acidosis.  Stop if it occurs.", "source": "safety-note"},
+    {"id": "p3", "text": "Typical dosage: 500 mg twice daily. Max 2000 mg/day.", "source": None},
+    {"id": "p4", "text": "", "source": "empty"},
+    {"id": "p5", "text": "Ünïcode pässage — naïve café. Nausea again?", "source": "intl"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = os.path.join(tmp_path, "c1")
+    write_corpus_index(path, PASSAGES)
+    return CorpusIndex.open(path)
+
+
+def test_arrays_are_readonly_mmaps(index):
+    for arr in index.arrays.values():
+        assert isinstance(arr, np.memmap)
+        assert not arr.flags.writeable
+    # the scoring matrix wraps the mapped buffers instead of copying them
+    assert np.shares_memory(index.bm25.matrix.data, index.arrays["bm25_data"])
+    assert np.shares_memory(index.bm25.matrix.indices, index.arrays["bm25_indices"])
+
+
+def test_round_trip(index):
+    assert len(index) == len(PASSAGES)
+    for row, p in enumerate(PASSAGES):
+        assert index.passage(row) == p
+    terms = [t.decode("utf-8") for t in index.vocab.terms]
+    assert terms == sorted({t for p in PASSAGES for t in normalize(p["text"]).split()})
+    assert index.vocab.get("nausea") == terms.index("nausea")
+    assert index.vocab.get("missing-term") is None
+    assert index.vocab.get("x" * 500) is None
+
+
+def test_bm25_rows_match_corpus_stats(index):
+    stats = build_corpus_stats(PASSAGES)
+    queries = [["nausea", "acidosis"], ["dosage", "daily", "nausea"], ["unknown"], []]
+    for rows in ([0, 1], [2, 0, 4], [3], list(range(len(PASSAGES)))):
+        picked = [PASSAGES[r] for r in rows]
+        tfs = []
+        for p in picked:
+            counts = {}
+            for t in normalize(p["text"]).split():
+                counts[t] = counts.get(t, 0) + 1
+            tfs.append((tuple(counts), list(counts.values())))
+        ref = SparseBM25.from_term_freqs(tfs, stats=stats)
+        got = index.bm25_for(rows)
+        assert np.allclose(got.get_score_matrix(queries), ref.get_score_matrix(queries))
+        for q in queries:
+            assert np.allclose(got.get_scores(q), ref.get_scores(q))
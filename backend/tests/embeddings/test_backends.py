@@ -0,0 +1,91 @@
+import os
+import zlib
+import numpy as np
+import pytest
+
+import app.embeddings as embeddings
+import app.truth as truth
+from app.embedding_backends import EmbeddingBackend, pack_vector, stored_nbytes, unpack_vector
+from app.embeddings import EmbeddingCache
+from app.text_utils import tokens
+from tests.benchmark_cases import CASES
+
+
+class HashingBackend(EmbeddingBackend):
+    """Deterministic bag-of-words projection; stands in for a model in storage tests."""
+    name = "hashing"
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), 384), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for t in tokens(text):
+                rng = np.random.default_rng(zlib.crc32(t.encode()))
+                out[row] += rng.standard_normal(384)
+        return out
+
+
+def _semantic_scores(monkeypatch, backend, store_dtype):
+    monkeypatch.setattr(embeddings, "_backend", backend)
+    monkeypatch.setattr(embeddings, "EMBEDDER_MODE", "local")
+    monkeypatch.setattr(embeddings, "_embedding_cache", EmbeddingCache(store_dtype=store_dtype))
+    monkeypatch.setattr(truth, "USE_SEMANTIC_FAITHFULNESS", True)
+    return np.array([truth.blended_faithfulness_score(answer, passages, use_semantic=True)
+                     for _, answer, passages in CASES])
+
+
+@pytest.mark.parametrize("dtype,max_bytes", [("float16", 768), ("int8", 388)])
+def test_compact_storage_preserves_cosine(dtype, max_bytes):
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((200, 384)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    stored = [pack_vector(v, dtype) for v in vecs]
+    restored = np.stack([unpack_vector(s) for s in stored])
+    assert all(stored_nbytes(s) <= max_bytes for s in stored)
+    assert np.abs(restored @ vecs.T - vecs @ vecs.T).max() < 0.01
+
+
+@pytest.mark.parametrize("vec,codes,scale", [
+    ([0.6, -0.8, 0.0, 0.0], [95, -127, 0, 0], 0.8 / 127),
+    ([0.5, -0.5, 0.5, -0.5], [127, -127, 127, -127], 0.5 / 127),
+    ([0.0, 0.0, 0.0, 0.0], [0, 0, 0, 0], 1.0),  # no max to scale by
+])
+def test_int8_round_trip_on_fixed_vectors(vec, codes, scale):
+    vec = np.array(vec, dtype=np.float32)
+    q, got_scale = pack_vector(vec, "int8")
+    assert q.dtype == np.int8 and q.tolist() == codes
+    assert got_scale == np.float32(scale)
+    restored = unpack_vector((q, got_scale))
+    assert restored.dtype == np.float32
+    # rounding to the nearest code is off by at most half a step
+    assert np.abs(restored - vec).max() <= scale / 2
+    assert np.array_equal(unpack_vector(pack_vector(vec, "float32")), vec)
+    assert np.abs(unpack_vector(pack_vector(vec, "float16")) - vec).max() <= 2 ** -11
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_blended_score_within_tolerance_of_float32(monkeypatch, dtype):
+    backend = HashingBackend()
+    reference = _semantic_scores(monkeypatch, backend, "float32")
+    compact = _semantic_scores(monkeypatch, backend, dtype)
+    assert np.abs(compact - reference).max() < 0.01
+
+
+def test_onnx_backend_matches_sentence_transformers(monkeypatch):
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    onnx_dir = os.getenv("EMBEDDING_ONNX_PATH")
+    if not onnx_dir:
+        pytest.skip("EMBEDDING_ONNX_PATH not set")
+    from app.embedding_backends import OnnxBackend, SentenceTransformerBackend
+
+    reference = SentenceTransformerBackend(embeddings.EMBEDDING_MODEL)
+    onnx = OnnxBackend(onnx_dir)
+    texts = [answer for _, answer, _ in CASES] + [p["text"] for _, _, ps in CASES for p in ps]
+    a, b = reference.encode(texts), onnx.encode(texts)
+    cos = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    assert cos.min() > 0.98
+
+    base = _semantic_scores(monkeypatch, reference, "float32")
+    fast = _semantic_scores(monkeypatch, onnx, "int8")
+    assert np.abs(fast - base).max() < 0.02
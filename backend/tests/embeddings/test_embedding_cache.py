@@ -0,0 +1,42 @@
+import numpy as np
+
+from app.embeddings import EmbeddingCache
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), t.count("a") + 1.0, 3.0] for t in texts])
+
+
+def test_only_misses_are_encoded():
+    cache, enc = EmbeddingCache(max_entries=10, store_dtype="float32"), CountingEncoder()
+    first = cache.get_many(["alpha", "beta", "alpha"], enc)
+    assert enc.calls == [["alpha", "beta"]]
+    assert np.allclose(first[0], first[2])
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+
+    again = cache.get_many(["beta", "gamma", "alpha"], enc)
+    assert enc.calls[-1] == ["gamma"]
+    assert np.allclose(again[0], first[1]) and np.allclose(again[2], first[0])
+
+
+def test_lru_eviction():
+    cache, enc = EmbeddingCache(max_entries=2, store_dtype="float32"), CountingEncoder()
+    cache.get_many(["a", "b"], enc)
+    cache.get_many(["a"], enc)        # refresh a, so b is least recent
+    cache.get_many(["c"], enc)
+    assert len(cache) == 2
+    cache.get_many(["a", "b"], enc)
+    assert enc.calls[-1] == ["b"]
+
+
+def test_prefix_rides_along_uncached():
+    cache, enc = EmbeddingCache(max_entries=10, store_dtype="float32"), CountingEncoder()
+    cache.get_many(["alpha"], enc)
+    vecs = cache.get_many(["alpha", "beta"], enc, prefix=["the answer"])
+    assert enc.calls[-1] == ["the answer", "beta"]
+    assert vecs.shape == (3, 3) and len(cache) == 2
@@ -0,0 +1,90 @@
+import threading
+import numpy as np
+import pytest
+
+from app.embeddings import RemoteEncoder
+from app.microbatch import MicroBatcher
+
+
+def fake_encode(texts):
+    return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_concurrent_submissions_share_a_batch():
+    sizes = []
+
+    def fn(items):
+        sizes.append(len(items))
+        return [i * 10 for i in items]
+
+    batcher = MicroBatcher(fn, max_batch=100, max_wait_ms=200)
+    barrier = threading.Barrier(8)
+    results = {}
+
+    def job(k):
+        barrier.wait()
+        results[k] = batcher.submit([k, k + 100]).result(timeout=5)
+
+    threads = [threading.Thread(target=job, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert results == {k: [k * 10, (k + 100) * 10] for k in range(8)}
+    assert sum(sizes) == 16 and len(sizes) < 8
+
+
+def test_max_batch_and_errors():
+    sizes = []
+
+    def fn(items):
+        sizes.append(len(items))
+        if "boom" in items:
+            raise ValueError("boom")
+        return items
+
+    batcher = MicroBatcher(fn, max_batch=3, max_wait_ms=50)
+    futures = [batcher.submit([i]) for i in range(7)]
+    assert [f.result(timeout=5) for f in futures] == [[i] for i in range(7)]
+    assert max(sizes) <= 3
+
+    bad = batcher.submit(["boom"])
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    batcher.close()
+
+
+def test_remote_encoder_round_trip():
+    fakeredis = pytest.importorskip("fakeredis")
+    from worker.embedder import serve
+
+    r = fakeredis.FakeRedis()
+    batcher = MicroBatcher(fake_encode, max_batch=16, max_wait_ms=20)
+    server = threading.Thread(target=serve, args=(r, batcher), kwargs={"max_requests": 2}, daemon=True)
+    server.start()
+
+    encoder = RemoteEncoder(r, timeout=5)
+    assert np.allclose(encoder(["ab", "abcd"]), fake_encode(["ab", "abcd"]))
+    assert encoder(["xyz"]).dtype == np.float32
+    server.join(timeout=5)
+    batcher.close()
+
+
+def test_malformed_requests_do_not_stop_the_sidecar():
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.embeddings import EMBED_REQUEST_KEY
+    from worker.embedder import serve
+
+    r = fakeredis.FakeRedis()
+    for bad in ('{"texts": ["no id"]}', '["not", "a", "dict"]', '"text"', "not json"):
+        r.rpush(EMBED_REQUEST_KEY, bad)
+    batcher = MicroBatcher(fake_encode, max_batch=16, max_wait_ms=20)
+    server = threading.Thread(target=serve, args=(r, batcher), kwargs={"max_requests": 1}, daemon=True)
+    server.start()
+    encoder = RemoteEncoder(r, timeout=5)
+    assert np.allclose(encoder(["ab"]), fake_encode(["ab"]))
+    server.join(timeout=5)
+    assert not server.is_alive()
+    batcher.close()
@@ -0,0 +1,64 @@
+import random
+import numpy as np
+
+from app.automaton import SuffixAutomaton
+from app.index import build_index
+from app.passage_cache import PassageCache
+from app.repair import repair_answer
+from app.truth import sentence_support
+
+PASSAGES = [
+    {"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "med-guide"},
+    {"id": "p2", "text": "Rare adverse events include lactic acidosis.", "source": "safety-note"},
+]
+
+
+def _occurs(docs, seg):
+    return [d for d, doc in enumerate(docs)
+            if any(list(doc[s:s + len(seg)]) == seg for s in range(len(doc) - len(seg) + 1))]
+
+
+def test_matching_statistics_match_brute_force():
+    rng = random.Random(3)
+    docs = [np.array([rng.randrange(4) for _ in range(rng.randint(0, 30))]) for _ in range(4)]
+    sam = SuffixAutomaton(docs)
+    for _ in range(200):
+        q = [rng.randrange(5) for _ in range(rng.randint(1, 12))]
+        lens, where = sam.match(q)
+        for i in range(len(q)):
+            best = 0
+            while best <= i and _occurs(docs, q[i - best:i + 1]):
+                best += 1
+            assert lens[i] == best
+            if best:
+                assert where[i] in _occurs(docs, q[i - best + 1:i + 1])
+            else:
+                assert where[i] == -1
+
+
+def test_spans_do_not_cross_passages():
+    sam = SuffixAutomaton([np.array([1, 2]), np.array([3, 4])])
+    lens, where = sam.match([1, 2, 3, 4])
+    assert list(lens) == [1, 2, 1, 2]
+    assert list(where) == [0, 0, 1, 1]
+
+
+def test_sentence_support():
+    index = build_index(PASSAGES, cache=PassageCache())
+    answer = ("Common side-effects are nausea and diarrhea. "
+              "It also cures baldness overnight. Rare adverse events include lactic acidosis in some patients.")
+    got = sentence_support(answer, PASSAGES, index)
+    assert [s.support for s in got[:2]] == [1.0, 0.0]
+    assert got[0].longest_span == 7 and got[0].passage_id == "p1"
+    assert got[1].passage_id is None
+    assert got[2].passage_id == "p2" and got[2].support == round(6 / 9, 4)
+
+
+def test_repair_lists_unsupported_claims():
+    answer = "Common side-effects are nausea and diarrhea. It also cures baldness overnight."
+    repaired = repair_answer("What are the side-effects?", answer, PASSAGES, retriever_mode="hybrid_sparse",
+                             top_k=2, target_unsupported=True, add_missing_parts=False)
+    assert "**Unsupported claims:**\n  • It also cures baldness overnight." in repaired
+    plain = repair_answer("What are the side-effects?", answer, PASSAGES, retriever_mode="hybrid_sparse",
+                          top_k=2, add_missing_parts=False)
+    assert "Unsupported claims" not in plain
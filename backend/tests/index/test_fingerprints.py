@@ -0,0 +1,40 @@
+import random
+
+from app.fingerprint import ngram_fingerprints, query_ids
+from app.index import build_index
+from app.passage_cache import PassageCache
+from app.text_utils import ngrams, tokens
+from app.truth import concat_passages, ngram_overlap_score
+from app.vocab import Vocabulary
+from tests.benchmark_cases import CASES, MULTI_PASSAGE
+
+
+def test_fingerprints_count_distinct_ngrams():
+    passages = MULTI_PASSAGE + [{"id": "x", "text": "a b a b a b. a b c a b c!"}]
+    index = build_index(passages, cache=PassageCache())
+    ctx = tokens(concat_passages(passages))
+    for n in (1, 2, 3, 4):
+        assert len(index.context_fingerprints(n)) == len(set(ngrams(ctx, n)))
+
+
+def test_unknown_answer_tokens_stay_distinct():
+    vocab = Vocabulary()
+    vocab.ids(["known"])
+    ids = query_ids(vocab, ["zzq-unseen-1", "known", "zzq-unseen-2", "zzq-unseen-1"])
+    assert ids[0] == ids[3] != ids[2]
+    assert len(ngram_fingerprints(ids, 2)) == 3
+
+
+def test_fingerprint_scores_match_string_ngrams():
+    rng = random.Random(7)
+    words = "nausea diarrhea rare lactic acidosis dose daily food take with the a of mg".split()
+    cases = [(answer, passages) for _, answer, passages in CASES]
+    for _ in range(200):
+        passages = [{"id": str(i), "text": " ".join(rng.choices(words, k=rng.randint(0, 12)))}
+                    for i in range(rng.randint(1, 4))]
+        answer = " ".join(rng.choices(words + ["novel", "unseen"], k=rng.randint(0, 10)))
+        cases.append((answer, passages))
+    for answer, passages in cases:
+        index = build_index(passages, cache=PassageCache())
+        assert (ngram_overlap_score(answer, passages, index=index, fingerprints=True)
+                == ngram_overlap_score(answer, passages, index=index, fingerprints=False))
@@ -0,0 +1,62 @@
+from app.index import build_index
+from app.passage_cache import PassageCache, analyze_text
+from app.text_utils import ngrams, tokens
+from app.truth import concat_passages
+
+PASSAGES = [
+    {"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "med-guide"},
+    {"id": "p2", "text": "Rare."},
+    {"id": "p3", "text": "Rare adverse events include lactic acidosis."},
+    {"id": "p4", "text": "Common side-effects are nausea and diarrhea.", "source": "dup"},
+    {"id": "p5", "text": ""},
+]
+
+
+def test_context_ngrams_match_concatenated_text():
+    index = build_index(PASSAGES, cache=PassageCache())
+    ctx = tokens(concat_passages(PASSAGES))
+    assert list(index.ctx_tokens) == ctx
+    for n in (1, 2, 3, 4):
+        assert index.context_ngrams(n) == frozenset(ngrams(ctx, n))
+
+
+def test_duplicate_passages_share_one_entry():
+    cache = PassageCache()
+    index = build_index(PASSAGES, cache=cache)
+    assert len(cache) == 4
+    assert index.analyses[0] is index.analyses[3]
+    build_index(PASSAGES, cache=cache)
+    assert len(cache) == 4
+
+
+def test_cache_evicts_least_recently_used():
+    texts = [p["text"] for p in PASSAGES[:3]]
+    sizes = [analyze_text(t).nbytes for t in texts]
+    cache = PassageCache(max_bytes=sizes[0] + max(sizes[1], sizes[2]), max_entries=100)
+    first = cache.get(texts[0])
+    second = cache.get(texts[1])
+    assert cache.get(texts[0]) is first
+    cache.get(texts[2])
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.get(texts[0]) is first
+    assert cache.get(texts[1]) is not second
+
+
+def test_cache_entry_cap():
+    cache = PassageCache(max_bytes=10**9, max_entries=2)
+    for p in PASSAGES[:3]:
+        cache.get(p["text"])
+    assert len(cache) == 2
+
+
+def test_vocab_cap_starts_over():
+    cache = PassageCache(max_bytes=10**9, max_entries=100, max_vocab=8)
+    first = cache.get("alpha beta gamma delta")
+    assert len(cache) == 1
+    cache.get("epsilon zeta eta theta iota kappa")
+    assert len(cache) == 0 and len(cache.vocab) == 0
+    again = cache.get("alpha beta gamma delta")
+    assert again is not first and len(cache) == 1
+    index = build_index([{"id": "a", "text": "alpha beta gamma delta"}], cache=cache)
+    assert index.vocab is cache.vocab
+    assert list(index.ctx_token_ids) == [0, 1, 2, 3]
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+import httpx
+
+import app.auth as auth
+import app.main as main
+import app.single_flight as single_flight
+from app.async_queue import _PipelineRecorder, enqueue_async
+from app.queue import notify_success
+from app.single_flight import SingleFlight
+from rq import Queue
+from rq.job import Job
+from tests.conftest import API_KEY, PAYLOAD, RESULT
+
+
+def test_thousand_pending_evaluations_share_one_loop(redis, monkeypatch):
+    # far beyond the threadpool (40 threads) that bounded the sync handler
+    n = 1000
+    monkeypatch.setattr(auth, "RATE_LIMIT_REQUESTS", n + 1)
+    # identical payloads; every request here must be its own job
+    monkeypatch.setattr(single_flight, "_single_flight", SingleFlight(enabled=False))
+
+    def finish_all():
+        queue = Queue("eval", connection=redis)
+        while len(queue) < n:
+            threading.Event().wait(0.01)
+        for job_id in queue.get_job_ids():
+            notify_success(Job.fetch(job_id, connection=redis), redis, RESULT)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            finisher = threading.Thread(target=finish_all)
+            finisher.start()
+            resps = await asyncio.gather(*(client.post("/evaluate", json=PAYLOAD, headers=API_KEY)
+                                           for _ in range(n)))
+            finisher.join()
+            return resps
+
+    resps = asyncio.run(run())
+    assert [r.status_code for r in resps] == [200] * n
+    assert all(r.json()["decision"] == "allow" for r in resps)
+
+
+def test_async_rate_limit_matches_sync(redis, monkeypatch):
+    monkeypatch.setattr(auth, "RATE_LIMIT_REQUESTS", 2)
+    monkeypatch.setattr(auth.Redis, "from_url", lambda *a, **kw: redis)
+
+    async def run():
+        return [await auth.rate_limit_async("10.0.0.1") for _ in range(3)]
+
+    sync = [auth.rate_limit("10.0.0.2") for _ in range(3)]
+    got = asyncio.run(run())
+    assert got[:2] == sync[:2] == [None, None]
+    assert got[2].status_code == sync[2].status_code == 429
+    assert got[2].body == sync[2].body
+    assert set(got[2].headers) == set(sync[2].headers)
+
+
+def test_enqueue_replays_every_write_rq_makes(redis):
+    # _PipelineRecorder replays RQ's private pipeline calls (see the rq pin in requirements.txt)
+    queue = Queue("eval", connection=redis)
+    queue.get_redis_server_version()
+    recorder = _PipelineRecorder()
+    queue.enqueue_job(queue.create_job("worker.worker.evaluate_payload", args=(PAYLOAD,)), pipeline=recorder)
+    assert not redis.keys()  # every write went to the pipeline, none to the connection
+    assert sorted({name for name, _, _ in recorder.calls}) == ["hset", "rpush", "sadd"]
+
+    replayed = asyncio.run(enqueue_async(queue, "worker.worker.evaluate_payload", PAYLOAD))
+    direct = queue.enqueue("worker.worker.evaluate_payload", PAYLOAD)
+    assert queue.get_job_ids() == [replayed.id, direct.id]
+    assert set(redis.hkeys(replayed.key)) == set(redis.hkeys(direct.key))
+    assert Job.fetch(replayed.id, connection=redis).get_status() == direct.get_status() == "queued"
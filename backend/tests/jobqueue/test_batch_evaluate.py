@@ -0,0 +1,88 @@
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import app.auth as auth
+import app.main as main
+import app.validation as validation
+from app.codec import decode
+from rq import Queue, SimpleWorker
+from tests.conftest import API_KEY
+from worker import worker
+
+GOLDENS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "goldens", "*.json")))
+PAYLOADS = [json.load(open(path))["input"] for path in GOLDENS]
+
+
+def _post_batch_while_working(r, items, n_jobs):
+    out = {}
+    t = threading.Thread(target=lambda: out.update(resp=TestClient(main.app).post(
+        "/evaluate/batch", json={"items": items}, headers=API_KEY)))
+    t.start()
+    queue = Queue("eval", connection=r)
+    deadline = time.time() + 10
+    while len(queue) < n_jobs and time.time() < deadline:
+        time.sleep(0.005)
+    out["jobs"] = len(queue)
+    SimpleWorker([queue], connection=r).work(burst=True)
+    t.join(10)
+    return out
+
+
+def test_batch_results_in_order_with_item_errors(redis, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_CHUNK_SIZE", 2)
+    items = [PAYLOADS[0], {"question": "no answer"}, PAYLOADS[1],
+             {**PAYLOADS[2], "callback_url": "http://example.com/hook"}] + PAYLOADS[2:]
+    out = _post_batch_while_working(redis, items, n_jobs=3)
+    assert out["resp"].status_code == 200
+    assert out["jobs"] == 3  # 5 valid items in chunks of 2
+
+    results = out["resp"].json()["results"]
+    assert [r["status"] for r in results] == [200, 422, 200, 422, 200, 200, 200]
+    assert results[3]["detail"] == "callback_url requires defer_repair"
+    for item, res in zip(items, results):
+        if res["status"] == 200:
+            expected = json.loads(json.dumps(worker.evaluate_payload(item)))
+            assert {k: res["result"][k] for k in expected} == expected
+
+
+def test_deferred_repair_in_chunk_uses_its_own_payload(redis):
+    repair = {"question": "What are side-effects of metformin?",
+              "answer": "It improves vision and strengthens hair.",
+              "passages": [{"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "m"}]}
+    eval_job = Queue("eval", connection=redis).enqueue(
+        "worker.worker.evaluate_batch", [PAYLOADS[0], {**repair, "defer_repair": True}])
+    SimpleWorker(["eval"], connection=redis).work(burst=True)
+    first, second = eval_job.return_value()
+    assert first["decision"] == "allow" and second["meta"]["repair"] == "deferred"
+    repair_job = Queue("repair", connection=redis).fetch_job(second["meta"]["repair_id"])
+    assert decode(repair_job.kwargs["payload"]) == {**repair, "defer_repair": True}
+    SimpleWorker(["repair"], connection=redis).work(burst=True)
+    assert repair_job.return_value()["repaired_answer"] == worker.evaluate_payload(repair)["repaired_answer"]
+
+
+def test_batch_rate_limit_counts_items(redis, monkeypatch):
+    monkeypatch.setattr(auth, "RATE_LIMIT_REQUESTS", 3)
+
+    async def run():
+        return [await auth.rate_limit_async("10.0.0.3", cost=c) for c in (2, 2, 1, 4)]
+
+    first, over, last, too_big = asyncio.run(run())
+    assert first is None and last is None
+    assert over.status_code == 429 and too_big.status_code == 429
+
+
+def test_batch_limits(redis, monkeypatch):
+    client = TestClient(main.app)
+    assert client.post("/evaluate/batch", json={"items": []}, headers=API_KEY).status_code == 422
+    resp = client.post("/evaluate/batch", json={"items": [{"question": "q"}]}, headers=API_KEY)
+    assert resp.json() == {"results": [{"status": 422, "result": None, "detail": [
+        {"type": "missing", "loc": ["answer"], "msg": "Field required", "input": {"question": "q"}}]}]}
+    monkeypatch.setattr(validation, "MAX_BATCH_ITEMS", 2)
+    resp = client.post("/evaluate/batch", json={"items": PAYLOADS[:3]}, headers=API_KEY)
+    assert resp.status_code == 413
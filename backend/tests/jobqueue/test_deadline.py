@@ -0,0 +1,101 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import app.main as main
+import app.result_cache as result_cache
+from app.codec import decode, encode
+from app.config import settings
+from tests.conftest import API_KEY, REPAIR_PAYLOAD as PAYLOAD
+from worker import worker
+
+
+def _shed(action):
+    return REGISTRY.get_sample_value("guardrail_worker_deadline_actions_total", {"action": action}) or 0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(worker, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_ladder_sheds_semantic_then_repair(clock, monkeypatch):
+    seen = []
+    blended = worker.blended_faithfulness_score
+
+    def recording(answer, passages, use_semantic, index):
+        seen.append(use_semantic)
+        return blended(answer, passages, use_semantic=False, index=index)
+
+    monkeypatch.setattr(worker, "USE_SEMANTIC_FAITHFULNESS", True)
+    monkeypatch.setattr(worker, "blended_faithfulness_score", recording)
+    full = worker.evaluate_payload(PAYLOAD, deadline=clock[0] + 30)
+    no_semantic = worker.evaluate_payload(PAYLOAD, deadline=clock[0] + 1.5)
+    no_repair = worker.evaluate_payload(PAYLOAD, deadline=clock[0] + 0.5)
+
+    assert seen == [True, False, False]
+    assert full["decision"] == no_semantic["decision"] == no_repair["decision"] == "repair"
+    assert "skipped" not in full["meta"]
+    assert no_semantic["meta"]["skipped"] == "semantic_faithfulness"
+    assert no_semantic["repaired_answer"] == full["repaired_answer"] is not None
+    assert no_repair["meta"]["skipped"] == "semantic_faithfulness,repair"
+    assert no_repair["repaired_answer"] is None
+
+
+def test_expired_jobs_are_dropped_or_abandoned(clock, monkeypatch):
+    dropped, abandoned = _shed("dropped"), _shed("abandoned")
+    # past its deadline at dequeue: the payload is not even decoded
+    assert decode(worker.evaluate_encoded(b"not a frame", deadline=clock[0] - 1)) is None
+    assert decode(worker.evaluate_batch_encoded(b"not a frame", deadline=clock[0] - 1)) is None
+
+    prepare = worker._prepare
+
+    def slow_prepare(payload):
+        clock[0] += 10
+        return prepare(payload)
+
+    monkeypatch.setattr(worker, "_prepare", slow_prepare)
+    assert worker.evaluate_payload(PAYLOAD, deadline=clock[0] + 5) is None
+    assert decode(worker.evaluate_batch_encoded(encode([PAYLOAD, PAYLOAD]), deadline=clock[0] + 5)) == [None, None]
+    # the first batch item ran out during _prepare; the second never started
+    assert _shed("dropped") - dropped == 3 and _shed("abandoned") - abandoned == 2
+
+
+@pytest.fixture
+def eager_queue():
+    return True
+
+
+@pytest.fixture
+def api(redis, monkeypatch):
+    # degraded results must stay out of the cache even when it is on
+    monkeypatch.setattr(result_cache, "_result_cache", result_cache.ResultCache(ttl=3600))
+    return TestClient(main.app)
+
+
+def test_api_sends_deadline_and_skips_caching_degraded_results(api, monkeypatch):
+    sent = []
+    evaluate_encoded = worker.evaluate_encoded
+
+    def recording(blob, deadline=None):
+        sent.append(deadline)
+        return evaluate_encoded(blob, deadline)
+
+    monkeypatch.setattr(worker, "evaluate_encoded", recording)
+    monkeypatch.setattr(settings, "EVAL_TIMEOUT_SEC", 0.5)
+    before = time.time()
+    first = api.post("/evaluate", json=PAYLOAD, headers=API_KEY).json()
+    assert before + 0.5 <= sent[0] <= time.time() + 0.5
+    assert first["meta"]["skipped"] == "repair"
+    second = api.post("/evaluate", json=PAYLOAD, headers=API_KEY).json()
+    assert len(sent) == 2 and "cache" not in second["meta"]
+
+    # the queue ran the job on the spot, so it only expires if the deadline already has
+    monkeypatch.setattr(settings, "EVAL_TIMEOUT_SEC", -1)
+    resp = api.post("/evaluate", json={**PAYLOAD, "answer": "Nausea."}, headers=API_KEY)
+    assert resp.status_code == 504
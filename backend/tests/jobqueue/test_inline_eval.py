@@ -0,0 +1,74 @@
+import glob
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import app.main as main
+import app.result_cache as result_cache
+from app.inline import InlineEvaluator
+from app.result_cache import ResultCache
+from app.schemas import EvaluateRequest
+from tests.conftest import API_KEY
+from worker import worker
+
+GOLDENS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "goldens", "*.json")))
+
+
+def _subquestions():
+    return sum(REGISTRY.get_sample_value("guardrail_coverage_subquestions_total", {"decided": d}) or 0
+               for d in ("prefilter", "ranked"))
+
+
+def _payload(path):
+    with open(path) as f:
+        return json.load(f)["input"]
+
+
+@pytest.fixture
+def inline(redis, monkeypatch):
+    # two goldens share an input; every request here must reach the pool
+    monkeypatch.setattr(result_cache, "_result_cache", ResultCache(ttl=0))
+    evaluator = InlineEvaluator(workers=1, max_bytes=16384, max_passages=5, max_pending=2)
+    monkeypatch.setattr(main, "get_inline_evaluator", lambda: evaluator)
+    yield evaluator
+    if evaluator._pool is not None:
+        evaluator._pool.shutdown()
+
+
+def test_inline_decisions_match_worker(inline):
+    client = TestClient(main.app)
+    for path in GOLDENS:
+        payload = _payload(path)
+        resp = client.post("/evaluate", json=payload, headers=API_KEY)
+        assert resp.status_code == 200
+        # the queue path returns the worker's result through JSON
+        expected = json.loads(json.dumps(worker.evaluate_payload(payload)))
+        assert {k: resp.json()[k] for k in expected} == expected
+    assert len(main.q) == 0
+    assert inline.pending == 0
+
+
+def test_large_or_busy_requests_go_to_queue(inline):
+    small = EvaluateRequest(**_payload(GOLDENS[0]))
+    assert inline.accepts(small)
+    many = small.model_copy(update={"passages": small.passages * 6})
+    assert not inline.accepts(many)
+    big = small.model_copy(update={"answer": "x" * 20000})
+    assert not inline.accepts(big)
+    by_ref = small.model_copy(update={"passages": [], "corpus_id": "c1", "passage_ids": ["p1"]})
+    assert not inline.accepts(by_ref)
+    inline.pending = inline.max_pending
+    assert not inline.accepts(small)
+
+
+def test_pool_counters_reach_api_metrics(inline):
+    client = TestClient(main.app)
+    payload = _payload(GOLDENS[0])
+    before = _subquestions()
+    assert client.post("/evaluate", json=payload, headers=API_KEY).status_code == 200
+    assert len(main.q) == 0
+    # only the pool process scored it
+    assert _subquestions() - before == len(worker.coverage_plan(payload["question"], payload["passages"]).subquestions)
@@ -0,0 +1,61 @@
+import glob
+import json
+import os
+
+import pytest
+
+import app.codec as codec
+from app.codec import CODEC_VERSION, decode, encode
+from app.queue import done_key, job_outcome, notify_success, read_notice
+from rq import Queue, SimpleWorker
+from rq.job import Callback
+from worker import worker
+
+GOLDENS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "goldens", "*.json")))
+PAYLOADS = [json.load(open(path))["input"] for path in GOLDENS]
+
+
+def test_round_trip_is_exact():
+    for payload in PAYLOADS:
+        result = worker.evaluate_payload(payload)
+        for obj in (payload, result, [result, None]):
+            blob = encode(obj)
+            assert blob[0] == CODEC_VERSION
+            assert decode(blob) == obj
+    with pytest.raises(ValueError):
+        decode(bytes((CODEC_VERSION + 1, 0)) + encode(PAYLOADS[0])[2:])
+
+
+def test_large_frames_are_compressed(monkeypatch):
+    pytest.importorskip("zstandard")
+    monkeypatch.setattr(codec, "JOB_CODEC_COMPRESS_MIN_BYTES", 1024)
+    big = {**PAYLOADS[0], "passages": PAYLOADS[0]["passages"] * 200}
+    blob = encode(big)
+    assert blob[1] & codec._FLAG_ZSTD and len(blob) < len(encode(big, compress=False)) / 4
+    assert decode(blob) == big
+    assert not encode(PAYLOADS[0])[1] & codec._FLAG_ZSTD
+
+
+def test_encoded_job_result_and_notice(redis):
+    payload = PAYLOADS[0]
+    job = Queue("eval", connection=redis).enqueue(
+        "worker.worker.evaluate_encoded", encode(payload), on_success=Callback(notify_success))
+    SimpleWorker(["eval"], connection=redis).work(burst=True)
+    expected = worker.evaluate_payload(payload)
+    # RQ stores the frame as is; the API decodes it once, from the notice or the job
+    assert isinstance(job.return_value(), bytes)
+    assert read_notice(redis.lpop(done_key(job.id))) == {"status": "finished", "result": expected}
+    assert job_outcome(job) == {"status": "finished", "result": expected}
+
+
+def test_deferred_repair_reads_encoded_payload(redis):
+    repair = {"question": "What are side-effects of metformin?",
+              "answer": "It improves vision and strengthens hair.",
+              "passages": [{"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "m"}]}
+    eval_job = Queue("eval", connection=redis).enqueue(
+        "worker.worker.evaluate_batch_encoded", encode([PAYLOADS[0], {**repair, "defer_repair": True}]))
+    SimpleWorker(["eval"], connection=redis).work(burst=True)
+    _, deferred = decode(eval_job.return_value())
+    repair_job = Queue("repair", connection=redis).fetch_job(deferred["meta"]["repair_id"])
+    SimpleWorker(["repair"], connection=redis).work(burst=True)
+    assert repair_job.return_value()["repaired_answer"] == worker.evaluate_payload(repair)["repaired_answer"]
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.async_queue import wait_for_job_async
+from app.queue import done_key, notify_failure, notify_success
+from rq import Queue, SimpleWorker
+from rq.job import Callback
+from tests.conftest import API_KEY, PAYLOAD
+from worker import worker
+
+
+def _boom(payload):
+    raise RuntimeError("boom")
+
+
+def _post_while_working(r, payload):
+    # RQ installs signal handlers, so the worker runs here and the request in a thread
+    out = {}
+    t = threading.Thread(target=lambda: out.update(resp=TestClient(main.app).post(
+        "/evaluate", json=payload, headers=API_KEY)))
+    t.start()
+    queue = Queue("eval", connection=r)
+    while not len(queue):
+        time.sleep(0.005)
+    SimpleWorker([queue], connection=r).work(burst=True)
+    t.join(10)
+    return out["resp"]
+
+
+def test_api_gets_result_from_worker_notification(redis):
+    resp = _post_while_working(redis, PAYLOAD)
+    assert resp.status_code == 200
+    expected = worker.evaluate_payload(PAYLOAD)
+    assert {k: resp.json()[k] for k in expected} == expected
+    # the notice was consumed, nothing left behind
+    assert not redis.keys(done_key("*"))
+
+
+def test_failed_job_is_reported(redis):
+    job = Queue("eval", connection=redis).enqueue(
+        _boom, PAYLOAD, on_success=Callback(notify_success), on_failure=Callback(notify_failure))
+    SimpleWorker(["eval"], connection=redis).work(burst=True)
+    assert redis.ttl(done_key(job.id)) > 0
+    assert asyncio.run(wait_for_job_async(job, timeout=1)) == {"status": "failed"}
+    assert not redis.exists(done_key(job.id))
+
+
+def test_wait_falls_back_to_job_state(redis):
+    job = Queue("eval", connection=redis).enqueue("worker.worker.evaluate_payload", PAYLOAD)
+    SimpleWorker(["eval"], connection=redis).work(burst=True)
+    # no callbacks, so no notice: the wait times out and reads the job instead
+    got = asyncio.run(wait_for_job_async(job, timeout=0.2))
+    assert got == {"status": "finished", "result": worker.evaluate_payload(PAYLOAD)}
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+
+import app.main as main
+import app.result_cache as result_cache
+from app.async_queue import enqueue_async, wait_for_job_async
+from app.queue import done_key, notify_success
+from app.result_cache import ResultCache
+from app.single_flight import INFLIGHT_KEY_PREFIX, SingleFlight
+from rq import Queue
+from rq.job import Job
+from tests.conftest import API_KEY, PAYLOAD, RESULT
+
+
+def _coalesced(scope):
+    return REGISTRY.get_sample_value("guardrail_coalesced_requests_total", {"scope": scope}) or 0
+
+
+@pytest.fixture(autouse=True)
+def no_result_cache(monkeypatch):
+    # coalescing must not depend on the result cache
+    monkeypatch.setattr(result_cache, "_result_cache", ResultCache(ttl=0))
+
+
+def test_identical_requests_share_one_job(redis):
+    n = 20
+    before = _coalesced("process")
+
+    def finish_when_all_attached():
+        queue = Queue("eval", connection=redis)
+        deadline = time.time() + 10
+        while (_coalesced("process") - before < n - 1 or len(queue) < 2) and time.time() < deadline:
+            time.sleep(0.005)
+        for job_id in queue.get_job_ids():
+            notify_success(Job.fetch(job_id, connection=redis), redis, RESULT)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            finisher = threading.Thread(target=finish_when_all_attached)
+            finisher.start()
+            other = {**PAYLOAD, "answer": "Nausea."}
+            resps = await asyncio.gather(*(client.post("/evaluate", json=p, headers=API_KEY)
+                                           for p in [PAYLOAD] * n + [other]))
+            finisher.join()
+            return resps
+
+    resps = asyncio.run(run())
+    assert [r.status_code for r in resps] == [200] * (n + 1)
+    assert len(Queue("eval", connection=redis).get_job_ids()) == 2
+    assert _coalesced("process") - before == n - 1
+    # nobody else waited on the notices or markers, so nothing is left behind
+    assert not redis.keys(done_key("*")) and not redis.keys(INFLIGHT_KEY_PREFIX + "*")
+
+
+def test_processes_share_a_job_through_redis(redis):
+    queue = Queue("eval", connection=redis)
+    leader, follower = SingleFlight(grace=5), SingleFlight(grace=5)
+    calls = []
+
+    async def evaluate(job_id):
+        calls.append(job_id)
+        job = await enqueue_async(queue, "worker.worker.evaluate_payload", PAYLOAD, job_id=job_id)
+        return await wait_for_job_async(job, 5, consume=False)
+
+    async def run():
+        a = asyncio.create_task(leader.run("k", 5, evaluate, queue))
+        while not queue.get_job_ids():
+            await asyncio.sleep(0.005)
+        b = asyncio.create_task(follower.run("k", 5, evaluate, queue))
+        await asyncio.sleep(0.05)
+        notify_success(Job.fetch(calls[0], connection=redis), redis, RESULT)
+        return await a, await b
+
+    led, followed = asyncio.run(run())
+    assert led == (False, {"status": "finished", "result": RESULT})
+    assert followed == (True, {"status": "finished", "result": RESULT})
+    assert len(calls) == 1
+    assert not redis.keys(INFLIGHT_KEY_PREFIX + "*")
+    assert 0 < redis.ttl(done_key(calls[0])) <= 5
+
+
+def test_failed_leader_releases_followers(redis):
+    queue = Queue("eval", connection=redis)
+    leader, follower = SingleFlight(), SingleFlight()
+    claimed = asyncio.Event()
+
+    async def enqueue_fails(job_id):
+        claimed.set()
+        await asyncio.sleep(0.05)
+        raise HTTPException(status_code=500, detail="Failed to enqueue")
+
+    async def run():
+        a = asyncio.create_task(leader.run("k", 30, enqueue_fails, queue))
+        await claimed.wait()
+        b = asyncio.create_task(follower.run("k", 30, enqueue_fails, queue))
+        with pytest.raises(HTTPException):
+            await a
+        return await asyncio.wait_for(b, 5)
+
+    assert asyncio.run(run()) == (True, {"status": "failed"})
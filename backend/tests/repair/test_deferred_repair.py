@@ -0,0 +1,119 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+import app.validation as validation
+from app.codec import decode
+from rq import Queue, SimpleWorker
+from tests.conftest import API_KEY, REPAIR_PAYLOAD as PAYLOAD
+from worker import worker
+
+
+def _run_repairs(r):
+    SimpleWorker(["repair"], connection=r).work(burst=True)
+
+
+def test_deferred_repair_matches_inline(redis):
+    inline = worker.evaluate_payload(PAYLOAD)
+    deferred = worker.evaluate_payload({**PAYLOAD, "defer_repair": True})
+    assert inline["decision"] == deferred["decision"] == "repair"
+    assert {k: deferred[k] for k in ("scores", "explanations")} == \
+           {k: inline[k] for k in ("scores", "explanations")}
+    assert deferred["repaired_answer"] is None
+    repair_id = deferred["meta"]["repair_id"]
+    assert deferred["meta"]["repair"] == "deferred"
+
+    client = TestClient(main.app)
+    pending = client.get(f"/repairs/{repair_id}", headers=API_KEY)
+    assert pending.status_code == 202 and pending.json()["status"] == "pending"
+
+    _run_repairs(redis)
+    done = client.get(f"/repairs/{repair_id}", headers=API_KEY).json()
+    assert done == {"repair_id": repair_id, "status": "done", "repaired_answer": inline["repaired_answer"]}
+
+
+def test_allow_is_not_deferred(redis):
+    payload = {**PAYLOAD, "answer": "Common side-effects are nausea and diarrhea.", "defer_repair": True}
+    result = worker.evaluate_payload(payload)
+    assert result["decision"] == "allow" and "repair_id" not in result["meta"]
+    assert len(Queue("repair", connection=redis)) == 0
+
+
+def test_callback_receives_result(redis, monkeypatch):
+    monkeypatch.setattr(validation, "REPAIR_CALLBACK_ALLOWED_HOSTS", {"127.0.0.1"})
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/hook"
+    result = worker.evaluate_payload({**PAYLOAD, "defer_repair": True, "callback_url": url})
+    _run_repairs(redis)
+    server.server_close()
+    assert received == [{"repair_id": result["meta"]["repair_id"], "status": "done",
+                         "repaired_answer": worker.evaluate_payload(PAYLOAD)["repaired_answer"]}]
+
+
+def test_repairs_endpoint_hides_other_jobs(redis):
+    client = TestClient(main.app)
+    assert client.get("/repairs/nope", headers=API_KEY).status_code == 404
+    eval_job = Queue("eval", connection=redis).enqueue("worker.worker.evaluate_payload", PAYLOAD)
+    assert client.get(f"/repairs/{eval_job.id}", headers=API_KEY).status_code == 404
+
+
+def test_callback_requires_defer(redis):
+    client = TestClient(main.app)
+    resp = client.post("/evaluate", json={**PAYLOAD, "callback_url": "http://example.com/hook"}, headers=API_KEY)
+    assert resp.status_code == 422
+    resp = client.post("/evaluate", json={**PAYLOAD, "defer_repair": True, "callback_url": "file:///etc/passwd"},
+                       headers=API_KEY)
+    assert resp.status_code == 422
+
+
+def test_callback_must_be_public_or_allowed(redis, monkeypatch):
+    client = TestClient(main.app)
+    for url in ("http://169.254.169.254/latest/meta-data", "http://10.0.0.7/hook", "http://localhost:8000/",
+                "http://[::ffff:127.0.0.1]/hook", "http://100.64.0.1/hook"):
+        resp = client.post("/evaluate", json={**PAYLOAD, "defer_repair": True, "callback_url": url},
+                           headers=API_KEY)
+        assert resp.status_code == 422, url
+    assert validation.callback_url_error("https://8.8.8.8/hook") is None
+
+    # a public-looking name is resolved by the worker right before the POST
+    monkeypatch.setattr(validation.socket, "getaddrinfo",
+                        lambda host, *a, **kw: [(None, None, None, "", ("10.1.2.3", 443))])
+    assert validation.callback_url_error("https://hooks.example.com/x") is None
+    assert validation.callback_url_error("https://hooks.example.com/x", resolve=True) is not None
+    opened = []
+    monkeypatch.setattr(worker._CALLBACK_OPENER, "open", lambda *a, **kw: opened.append(a))
+    worker._post_callback("https://hooks.example.com/x", {})
+    assert opened == []
+
+    monkeypatch.setattr(validation, "REPAIR_CALLBACK_ALLOWED_HOSTS", {"hooks.internal"})
+    assert validation.callback_url_error("http://hooks.internal/x", resolve=True) is None
+    assert validation.callback_url_error("https://8.8.8.8/hook") == "callback_url host is not allowed"
+
+
+def test_deferred_repair_outlives_its_eval_job(redis):
+    payload = {**PAYLOAD, "defer_repair": True}
+    eval_job = Queue("eval", connection=redis).enqueue("worker.worker.evaluate_payload", payload)
+    SimpleWorker(["eval"], connection=redis).work(burst=True)
+    repair_id = eval_job.latest_result().return_value["meta"]["repair_id"]
+    repair_job = Queue("repair", connection=redis).fetch_job(repair_id)
+    assert decode(repair_job.kwargs["payload"]) == payload
+    # RQ drops finished eval jobs after their result_ttl, possibly before a queued repair runs
+    eval_job.delete()
+    _run_repairs(redis)
+    assert repair_job.latest_result().return_value["repaired_answer"] == \
+           worker.evaluate_payload(PAYLOAD)["repaired_answer"]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+from app.bm25 import SparseBM25
+from app.coverage import decompose
+from app.index import build_index
+from app.retrieval import bm25_scores, top_ids
+from app.text_utils import tokens
+from tests.benchmark_cases import CASES, MULTI_PASSAGE
+
+
+def _queries(question, answer):
+    return [question, answer] + decompose(question)
+
+
+@pytest.mark.parametrize("question,answer,passages", CASES + [
+    (q, a, MULTI_PASSAGE) for q, a, _ in CASES
+])
+def test_sparse_bm25_matches_okapi(question, answer, passages):
+    okapi = build_index(passages, bm25_engine="okapi")
+    sparse = build_index(passages, bm25_engine="sparse")
+    for query in _queries(question, answer):
+        expected = BM25Okapi(list(okapi.tok_docs)).get_scores(tokens(query))
+        np.testing.assert_allclose(sparse.bm25.get_scores(tokens(query)), expected, rtol=1e-9, atol=1e-12)
+        assert [i for i, _ in bm25_scores(query, passages, sparse)] == \
+            [i for i, _ in bm25_scores(query, passages, okapi)]
+        assert top_ids(query, passages, "hybrid_sparse", 3, sparse) == top_ids(query, passages, "hybrid", 3, okapi)
+
+
+def test_sparse_bm25_idf_floor():
+    # every term in every doc -> negative idf replaced by epsilon * average idf
+    bm = SparseBM25([["a", "b"], ["a", "b"], ["a"]])
+    ref = BM25Okapi([["a", "b"], ["a", "b"], ["a"]])
+    np.testing.assert_allclose(bm.get_scores(["a", "b", "b", "zzz"]), ref.get_scores(["a", "b", "b", "zzz"]))
@@ -0,0 +1,67 @@
+import app.repair as repair
+from app.coverage import coverage_plan, coverage_score, decompose
+from app.index import build_index
+from app.passage_cache import PassageCache
+from app.repair import _fused_support, repair_answer
+from app.retrieval import top_ids
+from tests.retrieval.test_coverage_prefilter import _random_cases
+
+
+def test_plan_matches_coverage_score():
+    for question, passages in _random_cases(100, seed=5):
+        index = build_index(passages, bm25_engine="sparse", cache=PassageCache())
+        plan = coverage_plan(question, passages, index)
+        assert (plan.score, plan.missing) == coverage_score(question, passages, index)
+        assert [sq.text for sq in plan.subquestions] == decompose(question)
+
+
+def test_fused_support_reuses_plan_without_changing_ids():
+    reused = 0
+    for question, passages in _random_cases(300, seed=9):
+        index = build_index(passages, bm25_engine="sparse", cache=PassageCache())
+        plan = coverage_plan(question, passages, index)
+        gaps = [sq.text for sq in plan.subquestions]
+        reused += sum(sq.top_ids is not None for sq in plan.subquestions)
+        for top_k, sub_k in ((4, 2), (3, 1), (1, 3)):
+            expected = [top_ids(question, passages, "hybrid", top_k, index)] + \
+                       [top_ids(g, passages, "hybrid", sub_k, index) for g in gaps]
+            assert _fused_support(question, gaps, index, top_k, sub_k, plan)[0] == expected
+    assert reused
+
+
+def test_repair_with_plan_skips_decomposition(monkeypatch):
+    question, passages = "dose daily and kidney risk and liver test", [
+        {"id": "a", "text": "Take one dose daily with food."},
+        {"id": "b", "text": "Kidney risk rises with age."},
+        {"id": "c", "text": "A liver test is advised yearly."},
+    ]
+    index = build_index(passages, bm25_engine="sparse", cache=PassageCache())
+    plan = coverage_plan(question, passages, index)
+    expected = repair_answer(question, "Take it.", passages, "hybrid_sparse", 4,
+                             missing_parts=list(plan.missing), index=index)
+
+    def no_decompose(_):
+        raise AssertionError("repair should reuse the coverage plan")
+
+    monkeypatch.setattr(repair, "decompose", no_decompose)
+    got = repair_answer(question, "Take it.", passages, "hybrid_sparse", 4, index=index, plan=plan)
+    assert got == expected
+    assert "Missing parts identified" in got
+
+
+def test_fused_support_reuses_returned_rankings(monkeypatch):
+    question, passages = next(_random_cases(1, seed=7))
+    index = build_index(passages, bm25_engine="sparse", cache=PassageCache())
+    plan = coverage_plan(question, passages, index)
+    gaps = [sq.text for sq in plan.subquestions]
+    assert any(sq.top_ids is None for sq in plan.subquestions)
+    first, fresh = _fused_support(question, gaps, index, 3, 2, plan)
+    assert set(fresh) == {sq.text for sq in plan.subquestions if sq.top_ids is None}
+    ranked = []
+    fused_rank_many = repair.fused_rank_many
+    monkeypatch.setattr(repair, "fused_rank_many",
+                        lambda queries, *a, **kw: ranked.extend(queries) or fused_rank_many(queries, *a, **kw))
+    assert _fused_support(question, gaps, index, 3, 2, plan, known=fresh) == (first, {})
+    assert ranked == [question]
+    # the plan itself is left as coverage built it
+    assert plan == coverage_plan(question, passages, index)
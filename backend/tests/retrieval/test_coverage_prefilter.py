@@ -0,0 +1,56 @@
+import random
+
+from app.coverage import _prefilter, _ranked_support, coverage_score, decompose, subq_supported
+from app.index import build_index
+from app.passage_cache import PassageCache
+from app.retrieval import fused_rank, fused_rank_many
+from tests.benchmark_cases import CASES, MULTI_PASSAGE
+
+
+def _ranked_coverage(question, passages, index):
+    subs = decompose(question)
+    ranked = fused_rank_many(subs, index, top_k=3)
+    ok = [_ranked_support(s, ids, index)[0] for s, ids in zip(subs, ranked)]
+    return round(sum(ok) / max(1, len(subs)), 4), [s for s, k in zip(subs, ok) if not k]
+
+
+def _random_cases(n, seed=11):
+    rng = random.Random(seed)
+    words = "metformin nausea dose daily rare risk kidney food liver test blood sugar".split()
+    for _ in range(n):
+        passages = [{"id": str(i), "text": " ".join(rng.choices(words, k=rng.randint(0, 6)))}
+                    for i in range(rng.randint(1, 8))]
+        question = " and ".join(" ".join(rng.choices(words + ["unseen"], k=rng.randint(2, 3)))
+                                for _ in range(rng.randint(1, 4)))
+        yield question, passages
+
+
+def test_prefilter_matches_ranked_coverage():
+    cases = [(q, ps) for q, _, ps in CASES] + [("side-effects and dosage of metformin", MULTI_PASSAGE)]
+    decided = ranked = 0
+    for question, passages in cases + list(_random_cases(400)):
+        index = build_index(passages, bm25_engine="sparse", cache=PassageCache())
+        assert coverage_score(question, passages, index) == _ranked_coverage(question, passages, index)
+        for s in decompose(question):
+            verdict = _prefilter(s, index)
+            if verdict is None:
+                ranked += 1
+            else:
+                decided += 1
+                assert verdict == _ranked_support(s, fused_rank(s, passages, 3, index), index)[0]
+            assert subq_supported(s, passages, index=index) == _ranked_support(
+                s, fused_rank(s, passages, 3, index), index)
+    # every branch exercised
+    assert decided and ranked
+
+
+def test_many_passages_rank_without_counting():
+    rng = random.Random(0)
+    vocab = [f"term{i}" for i in range(2000)]
+    passages = [{"id": str(i), "text": " ".join(rng.choices(vocab, k=600))} for i in range(50)]
+    question = " and ".join(" ".join(rng.choices(vocab, k=3)) for _ in range(4)) + " and unseen words"
+    index = build_index(passages, bm25_engine="sparse", cache=PassageCache())
+    assert [_prefilter(s, index) for s in decompose(question)] == [None] * 4 + [False]
+    assert coverage_score(question, passages, index) == _ranked_coverage(question, passages, index)
+    # the ranking fallback never built the per-passage overlap postings
+    assert "postings" not in index._derived
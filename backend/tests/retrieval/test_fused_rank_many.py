@@ -0,0 +1,28 @@
+import pytest
+from app.coverage import decompose
+from app.index import build_index
+from app.retrieval import fused_rank, fused_rank_many
+from tests.benchmark_cases import CASES, MULTI_PASSAGE
+
+
+@pytest.mark.parametrize("engine", ["okapi", "sparse"])
+@pytest.mark.parametrize("top_k", [1, 3, 10])
+def test_fused_rank_many_matches_fused_rank(engine, top_k):
+    for question, answer, passages in CASES + [(q, a, MULTI_PASSAGE) for q, a, _ in CASES]:
+        index = build_index(passages, bm25_engine=engine)
+        queries = decompose(question) + [answer, "zzz unknown terms"]
+        expected = [fused_rank(q, passages, top_k, index) for q in queries]
+        assert fused_rank_many(queries, index, top_k) == expected
+
+
+def test_fused_rank_many_ties_at_cutoff():
+    # identical passages tie on both retrievers; the BM25 order must decide
+    passages = [{"id": f"p{i}", "text": "nausea and diarrhea"} for i in range(6)]
+    index = build_index(passages, bm25_engine="sparse")
+    assert fused_rank_many(["nausea"], index, 2) == [fused_rank("nausea", passages, 2, index)]
+
+
+def test_fused_rank_many_empty():
+    index = build_index([])
+    assert fused_rank_many(["anything"], index, 3) == [[]]
+    assert fused_rank_many([], index, 3) == []
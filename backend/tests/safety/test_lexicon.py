@@ -0,0 +1,52 @@
+import random
+import re
+
+from app.lexicon import Lexicon
+from app.policy import load_policy
+from app.safety import get_lexicon, lexicon_matches, toxicity_score
+
+
+def _regex_matches(text, entries):
+    found = set()
+    for term, category in entries:
+        for m in re.finditer(r"(?<!\w)" + re.escape(term) + r"(?!\w)", text, re.I):
+            found.add((m.start(), m.end(), category))
+    return found
+
+
+def test_scan_matches_boundary_regex():
+    rng = random.Random(7)
+    alphabet = "ab c"
+    entries = list({("".join(rng.choices(alphabet, k=rng.randint(1, 4))).strip() or "a",
+                     rng.choice(["x", "y"])) for _ in range(30)})
+    lexicon = Lexicon(entries)
+    for _ in range(300):
+        text = "".join(rng.choices(alphabet + "AB.", k=rng.randint(0, 40)))
+        got = {(m.start, m.end, m.category) for m in lexicon.scan(text)}
+        assert got == _regex_matches(text, entries)
+
+
+def test_word_boundaries_and_spans():
+    lexicon = Lexicon([("damn", "profanity"), ("son of a", "insult")], {"profanity": 0.04, "insult": 0.1})
+    text = "Damnation, DAMN it, son of a gun; damn_it"
+    matches = lexicon.scan(text)
+    assert [(m.term, m.category) for m in matches] == [("DAMN", "profanity"), ("son of a", "insult")]
+    assert text[matches[0].start:matches[0].end] == "DAMN"
+    assert lexicon.categories(matches) == {"profanity": 0.04, "insult": 0.1}
+
+
+def test_spans_survive_length_changing_lowercase():
+    lexicon = Lexicon([("bad", "x")])
+    text = "İİ bad"
+    (m,) = lexicon.scan(text)
+    assert text[m.start:m.end] == "bad"
+
+
+def test_default_lexicon_from_policy():
+    cfg = load_policy().safety
+    assert cfg.lexicon.endswith("default.tsv") and cfg.category_weights == {"profanity": 0.04}
+    assert len(get_lexicon()) == 3
+    assert [m.term for m in lexicon_matches("well, shit.")] == ["shit"]
+    assert toxicity_score("damn damn bastard") == 0.04
+    assert toxicity_score("a clean answer") == 0.0
+    assert toxicity_score("mail x@y.com, damn", Lexicon([("damn", "p")], {"p": 0.5})) == 0.54
@@ -0,0 +1,39 @@
+import random
+
+from app.logging_utils import safe_log_data
+from app.pii import EMAIL_RE, KIND_RES, PHONE_RE, SSN_RE, pii_kinds, pii_spans, redact
+from app.safety import toxicity_score
+
+TOKENS = ["john@x.com", "a.b@c.org", "555-123-4567", "(555) 123-4567", "123-45-6789", "+1 555 123 4567",
+          "5551234567", "call", "me", "at", "-", "@", ".", "1", "22", "333", "4444", "x", "\n", "(", "+", "_"]
+
+
+def _texts(n, seed):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield rng.choice(["", " "]).join(rng.choices(TOKENS, k=rng.randint(1, 8)))
+
+
+def test_kinds_match_separate_searches():
+    for text in _texts(3000, seed=1):
+        assert pii_kinds(text) == {k for k, rx in KIND_RES.items() if rx.search(text)}
+
+
+def test_spans_are_ordered_and_redaction_leaves_no_pii():
+    for text in _texts(3000, seed=2):
+        spans = pii_spans(text)
+        assert all(a.end <= b.start for a, b in zip(spans, spans[1:]))
+        for s in spans:
+            assert KIND_RES[s.kind].match(text, s.start)
+        out = redact(text)
+        assert not any(rx.search(out) for rx in (EMAIL_RE, PHONE_RE, SSN_RE))
+
+
+def test_scoring_and_logging_share_the_detector():
+    text = "Reach john@x.com or 555-123-4567, SSN 123-45-6789."
+    assert {s.kind for s in pii_spans(text)} == {"email", "phone", "ssn"}
+    assert toxicity_score(text) == 0.16
+    assert safe_log_data({"nested": {"answer": text}, "items": [text, 3]}) == {
+        "nested": {"answer": "Reach [EMAIL_REDACTED] or [PHONE_REDACTED], SSN [SSN_REDACTED]."},
+        "items": ["Reach [EMAIL_REDACTED] or [PHONE_REDACTED], SSN [SSN_REDACTED].", 3],
+    }
@@ -0,0 +1,124 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.index import build_index
+from app.passage_cache import PassageCache
+from app.policy import load_policy
+from app.safety import get_lexicon, toxicity_score
+from app.stream import StreamState
+from app.truth import ngram_overlap_score
+from tests.conftest import API_KEY
+from worker import worker
+
+PASSAGES = [
+    {"id": "p1", "text": "Common side-effects are nausea and diarrhea.", "source": "med-guide"},
+    {"id": "p2", "text": "Rare adverse events include lactic acidosis.", "source": "safety-note"},
+]
+QUESTION = "What are the side-effects and rare risks?"
+ANSWERS = [
+    "Common side-effects are nausea and diarrhea. Rare adverse events include lactic acidosis.",
+    "Nausea is common. Email john.doe@example.com or call 555-123-4567 for help.",
+    "Damnation is a strong word, but nausea is common.",
+    "It is damn rare. SSN 123-45-6789 was found. Lactic acidosis can occur.",
+    "Call 555-123-45678 maybe; nausea and diarrhea are common side-effects.",
+]
+
+
+def _chunks(text, rng):
+    out, i = [], 0
+    while i < len(text):
+        j = i + rng.randint(1, 6)
+        out.append(text[i:j])
+        i = j
+    return out
+
+
+def test_running_scores_bound_and_converge():
+    rng = random.Random(4)
+    index = build_index(PASSAGES, cache=PassageCache())
+    for answer in ANSWERS:
+        final_tox = toxicity_score(answer)
+        for window in (256, 12):
+            state = StreamState(index, get_lexicon(), window=window)
+            last = 0.0
+            for chunk in _chunks(answer, rng):
+                state.feed(chunk)
+                assert last <= state.toxicity() <= final_tox
+                last = state.toxicity()
+            assert state.finish() == answer
+            assert state.faithfulness() == ngram_overlap_score(answer, PASSAGES, index=index, fingerprints=False)
+            # a trailing space settles every match, so the bound reaches the final score
+            state.feed(" ")
+            assert state.toxicity() == toxicity_score(answer + " ") == final_tox
+
+
+def test_stream_index_skips_the_rankers():
+    req = main.EvaluateRequest(question=QUESTION, answer="", passages=PASSAGES)
+    state = main._open_stream(req)
+    assert state.index.bm25 is None and state.index.tfidf is None
+    full = build_index(PASSAGES, cache=PassageCache())
+    for n in (1, 3):
+        assert state.index.context_ngrams(n) == full.context_ngrams(n)
+
+
+def test_early_block_is_confirmed_by_final_decision():
+    rng = random.Random(5)
+    policy = load_policy()
+    index = build_index(PASSAGES, cache=PassageCache())
+    blocked = 0
+    for answer in ANSWERS:
+        state = StreamState(index, get_lexicon())
+        for chunk in _chunks(answer, rng):
+            state.feed(chunk)
+            if state.should_block(policy):
+                blocked += 1
+                full = worker.evaluate_payload({"question": QUESTION, "answer": answer, "passages": PASSAGES})
+                assert full["decision"] == "block"
+                break
+    assert blocked == 2  # "damnation" and the 5-digit tail never block early
+
+
+@pytest.fixture
+def eager_queue():
+    return True
+
+
+@pytest.fixture
+def client(redis):
+    return TestClient(main.app)
+
+
+def test_websocket_final_matches_evaluate_payload(client):
+    answer = ANSWERS[0]
+    with client.websocket_connect("/evaluate/stream", headers=API_KEY) as ws:
+        ws.send_json({"question": QUESTION, "answer": "", "passages": PASSAGES})
+        assert ws.receive_json()["event"] == "progress"
+        parts = answer.split(" ")
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            ws.send_json({"chunk": part + ("" if last else " "), "done": last})
+            event = ws.receive_json()
+            assert event["event"] == "progress"
+        final = ws.receive_json()
+    expected = worker.evaluate_payload({"question": QUESTION, "answer": answer, "passages": PASSAGES})
+    assert final["event"] == "final"
+    assert {k: final[k] for k in expected} == expected
+
+
+def test_websocket_blocks_early(client):
+    with client.websocket_connect("/evaluate/stream", headers=API_KEY) as ws:
+        ws.send_json({"question": QUESTION, "answer": "Write to jane@", "passages": PASSAGES})
+        assert ws.receive_json()["event"] == "progress"
+        ws.send_json({"chunk": "example.com for "})
+        event = ws.receive_json()
+    assert event["event"] == "block"
+    assert event["explanations"] == ["Toxic/PII content detected"]
+
+
+def test_websocket_rejects_bad_key(client):
+    with pytest.raises(Exception):
+        with client.websocket_connect("/evaluate/stream", headers={"X-API-Key": "nope"}) as ws:
+            ws.receive_json()
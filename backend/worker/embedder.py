@@ -0,0 +1,58 @@
+# Batching embedding sidecar (python -m worker.embedder). Workers with
+# EMBEDDER_MODE=redis push encode requests onto EMBED_REQUEST_KEY; this process
+# collects them for up to EMBED_MAX_WAIT_MS (or EMBED_MAX_BATCH texts), runs one
+# model call and pushes each caller's vectors to its reply key.
+import json
+import logging
+import os
+import sys
+from functools import partial
+
+from app.embeddings import (EMBED_REPLY_TTL_SEC, EMBED_REQUEST_KEY, encode_local, pack_error,
+                            pack_vectors, reply_key, warm_up)
+from app.metrics import start_worker_metrics_server
+from app.microbatch import MicroBatcher
+from app.queue import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _reply(redis, request_id: str, future) -> None:
+    err = future.exception()
+    payload = pack_error(str(err)) if err is not None else pack_vectors(future.result())
+    pipe = redis.pipeline()
+    pipe.rpush(reply_key(request_id), payload)
+    pipe.expire(reply_key(request_id), EMBED_REPLY_TTL_SEC)
+    pipe.execute()
+
+
+def serve(redis, batcher: MicroBatcher, poll_timeout: int = 1, max_requests: int = None) -> int:
+    handled = 0
+    while max_requests is None or handled < max_requests:
+        item = redis.blpop(EMBED_REQUEST_KEY, timeout=poll_timeout)
+        if item is None:
+            continue
+        try:
+            msg = json.loads(item[1])
+            reply = partial(_reply, redis, msg["id"])
+            future = batcher.submit(msg["texts"], enqueued_at=msg.get("ts"))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Dropping malformed embed request: {e!r}")
+            continue
+        future.add_done_callback(reply)
+        handled += 1
+    return handled
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    start_worker_metrics_server(int(os.getenv("EMBEDDER_METRICS_PORT", "0")))
+    if not warm_up():
+        logger.error("Embedding model unavailable; install the semantic extra")
+        return 1
+    serve(get_redis(), MicroBatcher(encode_local))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
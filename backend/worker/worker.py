@@ -1,25 +1,142 @@
-from app.truth import ngram_overlap_score
-from app.safety import toxicity_score
-from app.coverage import coverage_score
+import json
+import logging
+import os
+import time
+import urllib.request
+from typing import Optional
+from rq import Queue, get_current_job
+from app.codec import decode, encode
+from app.corpus import CorpusStore, get_corpus
+from app.embeddings import EMBEDDER_MODE, USE_SEMANTIC_FAITHFULNESS, warm_up
+from app.index import build_index
+from app.metrics import WORKER_DEADLINE_ACTIONS, start_worker_metrics_server
+from app.truth import blended_faithfulness_score
+from app.validation import callback_url_error
+from app.safety import load_lexicon, toxicity_score
+from app.coverage import coverage_plan
 from app.policy import load_policy, route_decision
+from app.queue import REPAIR_QUEUE, get_redis
 from app.repair import repair_answer
+from app.retrieval import split_mode
 from app.tracing import setup_tracer
 
 tracer = setup_tracer("guardrail-worker")
+start_worker_metrics_server(int(os.getenv("WORKER_METRICS_PORT", "0")))
+
+
+def _bm25_engine(policy) -> str:
+    engine = split_mode(policy.repair.retriever_mode)[1]
+    if policy.corpus.idf == "corpus" and engine != "sparse":
+        logging.warning(f"corpus.idf: corpus has no effect with retriever_mode "
+                        f"{policy.repair.retriever_mode}; use a *_sparse mode for corpus-wide IDF")
+    return engine
+
 
 _POLICY = load_policy()
+_BM25_ENGINE = _bm25_engine(_POLICY)
+_LEXICON = load_lexicon(_POLICY.safety)
+
+REPAIR_RESULT_TTL_SEC = int(os.getenv("REPAIR_RESULT_TTL_SEC", "3600"))
+REPAIR_CALLBACK_TIMEOUT_SEC = float(os.getenv("REPAIR_CALLBACK_TIMEOUT_SEC", "5"))
+
+# Jobs carry the epoch time the API stops waiting for them. Nearing it, evaluate_payload
+# sheds work in this order: semantic faithfulness, then the inline repair, then (past it)
+# the whole job, whose result nobody would read. Assumes API and worker clocks agree.
+DEADLINE_SEMANTIC_MIN_SEC = float(os.getenv("DEADLINE_SEMANTIC_MIN_SEC", "2"))
+DEADLINE_REPAIR_MIN_SEC = float(os.getenv("DEADLINE_REPAIR_MIN_SEC", "1"))
+
+if USE_SEMANTIC_FAITHFULNESS and EMBEDDER_MODE == "local":
+    # load at startup: a lazy first load takes seconds and blows the job timeout
+    warm_up()
+
+
+def _resolve_corpus(payload: dict):
+    corpus_id = payload.get("corpus_id")
+    if not corpus_id:
+        return None
+    with tracer.start_as_current_span("worker.corpus") as s:
+        s.set_attribute("corpus.id", corpus_id)
+        return get_corpus(corpus_id, CorpusStore(get_redis()))
+
+
+def _prepare(payload: dict):
+    passages = payload.get("passages", []) or []
+
+    corpus = _resolve_corpus(payload)
+    corpus_stats = None
+    corpus_bm25 = None
+    if corpus is not None:
+        passage_ids = payload.get("passage_ids") or []
+        passages = corpus.pick(passage_ids)
+        if _POLICY.corpus.idf == "corpus" and _BM25_ENGINE == "sparse":
+            if corpus.index is not None:
+                # rows of the mmapped corpus matrix; nothing to refit
+                corpus_bm25 = corpus.index.bm25_for(corpus.rows(passage_ids))
+            else:
+                corpus_stats = corpus.stats
+
+    with tracer.start_as_current_span("worker.index"):
+        index = build_index(passages, bm25_engine=_BM25_ENGINE,
+                            corpus_stats=corpus_stats, bm25=corpus_bm25)
+    return passages, index
+
+
+def _repair(question: str, answer: str, passages: list, index, plan) -> str:
+    with tracer.start_as_current_span("worker.repair") as s3:
+        s3.set_attribute("repair.retriever_mode",
+                         _POLICY.repair.retriever_mode)
+        return repair_answer(
+            question=question,
+            answer=answer,
+            passages=passages,
+            retriever_mode=_POLICY.repair.retriever_mode,
+            top_k=_POLICY.repair.top_k,
+            max_sentences=_POLICY.repair.max_sentences,
+            add_missing_parts=_POLICY.repair.add_missing_parts,
+            add_citations=_POLICY.repair.add_citations,
+            missing_parts=list(plan.missing),  # Pass missing parts for checklist
+            index=index,
+            plan=plan,
+            target_unsupported=_POLICY.repair.target_unsupported,
+            min_sentence_support=_POLICY.repair.min_sentence_support,
+        )
+
+
+def _time_left(deadline: Optional[float]) -> float:
+    return float("inf") if deadline is None else deadline - time.time()
+
 
+def _shed(action: str) -> None:
+    WORKER_DEADLINE_ACTIONS.labels(action=action).inc()
 
-def evaluate_payload(payload: dict) -> dict:
+
+def evaluate_payload(payload: dict, deadline: float = None) -> Optional[dict]:
+    """The /evaluate result for payload; None once `deadline` has passed."""
+    if _time_left(deadline) <= 0:
+        _shed("dropped")
+        return None
     question = payload.get("question", "")
     answer = payload.get("answer", "")
-    passages = payload.get("passages", []) or []
+    passages, index = _prepare(payload)
+
+    skipped = []
+    left = _time_left(deadline)
+    if left <= 0:
+        _shed("abandoned")
+        return None
+    use_semantic = USE_SEMANTIC_FAITHFULNESS
+    if use_semantic and left < DEADLINE_SEMANTIC_MIN_SEC:
+        use_semantic = False
+        skipped.append("semantic_faithfulness")
+        _shed("semantic_skipped")
 
     with tracer.start_as_current_span("worker.score") as s:
         s.set_attribute("passages.count", len(passages))
-        faith = ngram_overlap_score(answer, passages, n=3)
-        cov, missing = coverage_score(question, passages)
-        tox = toxicity_score(answer)
+        faith = blended_faithfulness_score(
+            answer, passages, use_semantic=use_semantic, index=index)
+        plan = coverage_plan(question, passages, index=index)
+        cov, missing = plan.score, list(plan.missing)
+        tox = toxicity_score(answer, _LEXICON)
 
     scores = {
         "faithfulness": round(float(faith), 2),
@@ -31,27 +148,99 @@ def evaluate_payload(payload: dict) -> dict:
         decision, reasons = route_decision(scores, _POLICY, missing)
         s2.set_attribute("decision", decision)
 
+    left = _time_left(deadline)
+    if left <= 0:
+        _shed("abandoned")
+        return None
     repaired = None
-    if decision == "repair":
-        with tracer.start_as_current_span("worker.repair") as s3:
-            s3.set_attribute("repair.retriever_mode",
-                             _POLICY.repair.retriever_mode)
-            repaired = repair_answer(
-                question=question,
-                answer=answer,
-                passages=passages,
-                retriever_mode=_POLICY.repair.retriever_mode,
-                top_k=_POLICY.repair.top_k,
-                max_sentences=_POLICY.repair.max_sentences,
-                add_missing_parts=_POLICY.repair.add_missing_parts,
-                add_citations=_POLICY.repair.add_citations,
-                missing_parts=missing,  # Pass missing parts for checklist
-            )
+    meta = {"engine": "day6", "v": "day6"}
+    if decision == "repair" and payload.get("defer_repair"):
+        # answer now; the repair runs as its own job and is fetched from /repairs/{id}.
+        # It carries its own copy of the payload: the repair queue only runs when eval is
+        # empty, so under load it can outlive the eval job (gone 500 s after it finishes).
+        job = Queue(REPAIR_QUEUE, connection=get_redis()).enqueue(
+            "worker.worker.repair_payload", plan, payload=encode(payload), result_ttl=REPAIR_RESULT_TTL_SEC)
+        meta.update(repair="deferred", repair_id=job.id)
+    elif decision == "repair" and left < DEADLINE_REPAIR_MIN_SEC:
+        # the decision still stands; only the repaired answer is missing
+        skipped.append("repair")
+        _shed("repair_skipped")
+    elif decision == "repair":
+        repaired = _repair(question, answer, passages, index, plan)
+    if skipped:
+        meta["skipped"] = ",".join(skipped)
 
     return {
         "decision": decision,
         "scores": scores,
         "repaired_answer": repaired,
         "explanations": reasons,
-        "meta": {"engine": "day6", "v": "day6"},
+        "meta": meta,
     }
+
+
+def evaluate_batch(payloads: list, deadline: float = None) -> list:
+    """evaluate_payload for each payload of an /evaluate/batch chunk; None where it raised or ran out of time."""
+    results = []
+    for i, payload in enumerate(payloads):
+        try:
+            results.append(evaluate_payload(payload, deadline=deadline))
+        except Exception as e:
+            logging.warning(f"Batch item {i} failed: {e}")
+            results.append(None)
+    return results
+
+
+def evaluate_encoded(blob: bytes, deadline: float = None) -> bytes:
+    """RQ entry point for /evaluate: the payload and the result are app.codec frames."""
+    if _time_left(deadline) <= 0:
+        # expired while queued: not even worth decoding
+        _shed("dropped")
+        return encode(None)
+    return encode(evaluate_payload(decode(blob), deadline=deadline))
+
+
+def evaluate_batch_encoded(blob: bytes, deadline: float = None) -> bytes:
+    if _time_left(deadline) <= 0:
+        _shed("dropped")
+        return encode(None)
+    return encode(evaluate_batch(decode(blob), deadline))
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # a redirect would skip the address check below
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_CALLBACK_OPENER = urllib.request.build_opener(_NoRedirect)
+
+
+def _post_callback(url: str, body: dict) -> None:
+    error = callback_url_error(url, resolve=True)
+    if error:
+        logging.warning(f"Repair callback to {url} refused: {error}")
+        return
+    req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), method="POST",
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with _CALLBACK_OPENER.open(req, timeout=REPAIR_CALLBACK_TIMEOUT_SEC):
+            pass
+    except Exception as e:
+        # the result stays available from /repairs/{id}
+        logging.warning(f"Repair callback to {url} failed: {e}")
+
+
+def repair_payload(plan, payload: bytes) -> dict:
+    """Deferred repair for evaluate_payload; plan is the CoveragePlan it routed on.
+
+    payload is the evaluated payload as an app.codec frame.
+    """
+    payload = decode(payload)
+    passages, index = _prepare(payload)
+    repaired = _repair(payload.get("question", ""), payload.get("answer", ""), passages, index, plan)
+    job = get_current_job()
+    result = {"repair_id": job.id if job else None, "status": "done", "repaired_answer": repaired}
+    if payload.get("callback_url"):
+        _post_callback(payload["callback_url"], result)
+    return result